@@ -107,6 +107,16 @@ class RetryConfig:
     MAX_ATTEMPTS = 3
     INITIAL_DELAY = 1.0  # seconds
     BACKOFF_MULTIPLIER = 2.0
+    JITTER = 0.5  # each delay is scaled by a random factor in [1 - JITTER, 1 + JITTER]
+
+
+class CircuitBreakerConfig:
+    """Per broker/endpoint circuit breaker thresholds"""
+    FAILURE_RATE_THRESHOLD = 0.5  # open when this share of recent calls failed...
+    MIN_CALLS = 10                # ...out of at least this many
+    WINDOW_SECONDS = 30.0         # how far back "recent" goes
+    OPEN_SECONDS = 15.0           # fail fast this long before letting probes through
+    HALF_OPEN_PROBES = 3          # successful probes needed to close again
 
 
 # ==================== VALIDATION CONSTANTS ====================
@@ -42,6 +42,79 @@ API_DESCRIPTION = "Trading Platform API for Options Trading"
 # ==================== CORS ====================
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
 
+# ==================== Tick Write Buffer ====================
+TICK_BUFFER_FLUSH_INTERVAL_MS = int(os.getenv("TICK_BUFFER_FLUSH_INTERVAL_MS", "200"))
+TICK_BUFFER_MAX_BATCH = int(os.getenv("TICK_BUFFER_MAX_BATCH", "1000"))
+TICK_BUFFER_MAX_QUEUE = int(os.getenv("TICK_BUFFER_MAX_QUEUE", "100000"))
+TICK_BUFFER_RETRY_BACKOFF_S = float(os.getenv("TICK_BUFFER_RETRY_BACKOFF_S", "1"))
+TICK_BUFFER_RETRY_MAX_S = float(os.getenv("TICK_BUFFER_RETRY_MAX_S", "300"))   # then failed rows are dropped
+
+# ==================== AngelOne Scrip Master ====================
+ANGELONE_SCRIP_MASTER_PATH = os.getenv("ANGELONE_SCRIP_MASTER_PATH", "OpenAPIScripMaster.csv")
+SCRIP_MASTER_CHECK_INTERVAL_S = float(os.getenv("SCRIP_MASTER_CHECK_INTERVAL_S", "60"))
+
+# ==================== Broker Sessions ====================
+DHAN_SESSION_TTL_S = float(os.getenv("DHAN_SESSION_TTL_S", "3600"))
+ANGELONE_SESSION_TTL_S = float(os.getenv("ANGELONE_SESSION_TTL_S", "21600"))
+ANGELONE_ORDERS_ENABLED = os.getenv("ANGELONE_ORDERS_ENABLED", "false").lower() == "true"
+BROKER_WARMUP_TIME = os.getenv("BROKER_WARMUP_TIME", "08:45")   # IST, weekdays
+BROKER_WARMUP_WORKERS = int(os.getenv("BROKER_WARMUP_WORKERS", "16"))
+
+# ==================== Broker Dispatch ====================
+BROKER_DISPATCH_WORKERS = int(os.getenv("BROKER_DISPATCH_WORKERS", "32"))
+BROKER_DISPATCH_LIMITS = {
+    "dhan": int(os.getenv("BROKER_DISPATCH_DHAN_LIMIT", "16")),
+    "angelone": int(os.getenv("BROKER_DISPATCH_ANGELONE_LIMIT", "8")),
+}
+BROKER_DISPATCH_DRAIN_TIMEOUT_S = float(os.getenv("BROKER_DISPATCH_DRAIN_TIMEOUT_S", "30"))
+FILL_PRICE_TIMEOUT_S = float(os.getenv("FILL_PRICE_TIMEOUT_S", "5"))
+ORDER_BATCH_FLUSH_TIMEOUT_S = float(os.getenv("ORDER_BATCH_FLUSH_TIMEOUT_S", "15"))
+
+# ==================== Instrument Assignment ====================
+INSTRUMENT_ASSIGN_ACK_TIMEOUT_S = float(os.getenv("INSTRUMENT_ASSIGN_ACK_TIMEOUT_S", "5"))
+INSTRUMENT_ASSIGN_RECHECK_S = float(os.getenv("INSTRUMENT_ASSIGN_RECHECK_S", "30"))
+
+# ==================== Broker Simulator ====================
+# e.g. http://127.0.0.1:8900 to send every broker call to broker_simulator_server.py (load testing)
+BROKER_SIMULATOR_URL = os.getenv("BROKER_SIMULATOR_URL", "")
+
+# ==================== Paper Trading ====================
+# true: every trader is paper-traded; otherwise per user via user_trading_settings.paper_trading
+PAPER_TRADING_ENABLED = os.getenv("PAPER_TRADING_ENABLED", "false").lower() == "true"
+PAPER_SLIPPAGE_BPS = float(os.getenv("PAPER_SLIPPAGE_BPS", "5"))      # against the trader, per fill
+PAPER_LATENCY_MS = float(os.getenv("PAPER_LATENCY_MS", "0"))        # signal fanout fills only
+PAPER_LATENCY_JITTER_MS = float(os.getenv("PAPER_LATENCY_JITTER_MS", "0"))
+PAPER_TRADERS_REFRESH_S = float(os.getenv("PAPER_TRADERS_REFRESH_S", "30"))
+PAPER_TRADERS_RETRY_S = float(os.getenv("PAPER_TRADERS_RETRY_S", "5"))     # after a failed load
+
+# ==================== Signal Outbox ====================
+# "inline": fanout runs in the API process; "outbox": in signal_outbox_worker.py, which must be running
+SIGNAL_DISPATCH_MODE = os.getenv("SIGNAL_DISPATCH_MODE", "inline").lower()
+SIGNAL_OUTBOX_LEASE_S = float(os.getenv("SIGNAL_OUTBOX_LEASE_S", "120"))
+SIGNAL_OUTBOX_BATCH_SIZE = int(os.getenv("SIGNAL_OUTBOX_BATCH_SIZE", "10"))
+SIGNAL_OUTBOX_POLL_S = float(os.getenv("SIGNAL_OUTBOX_POLL_S", "0.2"))
+SIGNAL_SEEN_MAX_KEYS = int(os.getenv("SIGNAL_SEEN_MAX_KEYS", "100000"))
+SIGNAL_SEEN_TTL_S = float(os.getenv("SIGNAL_SEEN_TTL_S", "86400"))
+SIGNAL_SEEN_WAIT_S = float(os.getenv("SIGNAL_SEEN_WAIT_S", "10"))
+
+# ==================== Strategy Subscriptions ====================
+# true: entry signals go to the strategy's subscribers; false: to every TRADER, as before.
+# Backfill user_strategy_subscriptions before turning it on (see README), or no entries are placed
+STRATEGY_SUBSCRIPTIONS_ENABLED = os.getenv("STRATEGY_SUBSCRIPTIONS_ENABLED", "false").lower() == "true"
+STRATEGY_SUBSCRIPTIONS_REFRESH_S = float(os.getenv("STRATEGY_SUBSCRIPTIONS_REFRESH_S", "30"))
+
+# ==================== Order Reconciliation ====================
+ORDER_RECONCILE_INTERVAL_S = float(os.getenv("ORDER_RECONCILE_INTERVAL_S", "30"))
+ORDER_RECONCILE_LOOKBACK_H = float(os.getenv("ORDER_RECONCILE_LOOKBACK_H", "24"))
+ORDER_RECONCILE_WORKERS = int(os.getenv("ORDER_RECONCILE_WORKERS", "8"))
+BROKER_ORDER_LEDGER_FLUSH_S = float(os.getenv("BROKER_ORDER_LEDGER_FLUSH_S", "2"))
+BROKER_ORDER_LEDGER_MAX_QUEUE = int(os.getenv("BROKER_ORDER_LEDGER_MAX_QUEUE", "200000"))
+
+# ==================== Latency Tracing ====================
+LATENCY_TRACE_ENABLED = os.getenv("LATENCY_TRACE_ENABLED", "true").lower() == "true"
+LATENCY_TRACE_FLUSH_S = float(os.getenv("LATENCY_TRACE_FLUSH_S", "2"))
+LATENCY_TRACE_MAX_QUEUE = int(os.getenv("LATENCY_TRACE_MAX_QUEUE", "200000"))
+
 # ==================== Pagination ====================
 DEFAULT_PAGE_SIZE = 10
 MAX_PAGE_SIZE = 100
@@ -2,16 +2,24 @@
 Market controller - Market data endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.schemas.signal_schema import AdminSignalEntryRequest, AdminSignalExitRequest ,InstrumentEditRequest 
-from app.schemas.schema import BrokerDetailsUpdateSchema,SymbolTokenFileSchema,ManualTradeRequest
+from app.schemas.schema import BrokerDetailsUpdateSchema,SymbolTokenFileSchema,ManualTradeRequest,StrategySubscriptionSchema
 from app.db.db import get_db
 from app.models.models import User
 from app.utils.security import get_current_user
 from app.services.admin_services import AdminService
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.scrip_master import scrip_master_index
+from app.services.session_warmup import BrokerWarmupService
+from app.services.latency_trace import latency_percentiles
+from app.services.circuit_breaker import broker_breakers
+from app.services.paper_trading import paper_fill_model, paper_traders
+from app.services.strategy_subscriptions import strategy_subscription_index
 import logging
+import asyncio
 from fastapi import UploadFile, File
 
 logger = logging.getLogger(__name__)
@@ -208,6 +216,50 @@ async def update_user_broker_details_v1(broker_details:BrokerDetailsUpdateSchema
 
 
 
+@router.get("/strategy-subscriptions/v1", status_code=status.HTTP_200_OK)
+async def list_strategy_subscriptions_v1(
+  strategy_code: Optional[str] = Query(None, description="Only this strategy's subscriptions"),
+  db: Session = Depends(get_db)
+):
+  try:
+    return {
+      "subscriptions": AdminService.list_strategy_subscriptions_v1(db=db, strategy_code=strategy_code),
+      "index": strategy_subscription_index.stats(),
+    }
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.put("/strategy-subscriptions/v1", status_code=status.HTTP_200_OK)
+async def upsert_strategy_subscription_v1(subscription:StrategySubscriptionSchema,db: Session = Depends(get_db)):
+  """Subscribe a trader to a strategy, or change their multiplier / pause it"""
+  try:
+    if not AdminService.upsert_strategy_subscription_v1(subscription=subscription, db=db):
+      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return True
+  except HTTPException:
+    raise
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.delete("/strategy-subscriptions/v1", status_code=status.HTTP_200_OK)
+async def delete_strategy_subscription_v1(
+  user_id: int = Query(..., description="Trader"),
+  strategy_code: str = Query(..., description="Strategy code"),
+  db: Session = Depends(get_db)
+):
+  try:
+    if not AdminService.delete_strategy_subscription_v1(db=db, user_id=user_id, strategy_code=strategy_code):
+      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subscription not found")
+    return True
+  except HTTPException:
+    raise
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+
 @router.get("/get-scripts-info/v1", status_code=status.HTTP_200_OK)
 async def get_scripts_info_v1(db: Session = Depends(get_db)):
   try:
@@ -290,4 +342,104 @@ async def add_manual_trade(manual_trade:ManualTradeRequest,db: Session = Depends
   try:
     return AdminService.import_trades(file=manual_trade.file,user_id=manual_trade.user_id,strategy_code=manual_trade.strategy_code,db=db)
   except Exception as e:
-    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
\ No newline at end of file
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/broker-dispatch-stats/v1", status_code=status.HTTP_200_OK)
+async def get_broker_dispatch_stats():
+  """Broker fanout executor metrics: queue depth, worker usage, per-broker slots"""
+  try:
+    return broker_dispatcher.stats()
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/signal-latency/v1", status_code=status.HTTP_200_OK)
+async def get_signal_latency(
+  window_minutes: int = Query(60, ge=1, le=60 * 24 * 30),
+  signal_category: Optional[str] = Query(None, description="ENTRY or EXIT"),
+  db: Session = Depends(get_db)):
+  """p50/p95/p99 (ms) of each signal processing stage per broker over the last window_minutes"""
+  try:
+    return {
+      "window_minutes": window_minutes,
+      "stages": latency_percentiles(db, window_minutes=window_minutes, signal_category=signal_category),
+    }
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/broker-breakers/v1", status_code=status.HTTP_200_OK)
+async def get_broker_breakers():
+  """Circuit breaker state per broker and endpoint"""
+  try:
+    return broker_breakers.snapshot()
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.post("/broker-breakers/reset/v1", status_code=status.HTTP_200_OK)
+async def reset_broker_breakers(broker: Optional[str] = Query(None, description="dhan or angelone; all if omitted")):
+  """Close circuit breakers by hand, e.g. after a broker confirms recovery"""
+  try:
+    broker_breakers.reset(broker)
+    return broker_breakers.snapshot()
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/paper-trading/v1", status_code=status.HTTP_200_OK)
+async def get_paper_trading():
+  """Paper-traded users and simulated fill counts"""
+  try:
+    return {**paper_traders.stats(), "fills": paper_fill_model.stats()}
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.post("/paper-trading/v1", status_code=status.HTTP_200_OK)
+async def set_paper_trading(
+  user_id: int = Query(..., description="User to switch"),
+  enabled: bool = Query(..., description="true: simulated fills, no broker calls"),
+  db: Session = Depends(get_db)
+):
+  """Switch a user between paper and live trading"""
+  try:
+    if not AdminService.set_paper_trading_v1(db, user_id, enabled):
+      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return {"user_id": user_id, "paper_trading": enabled}
+  except HTTPException:
+    raise
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.post("/reload-scrip-master/v1", status_code=status.HTTP_200_OK)
+async def reload_scrip_master():
+  """Rebuild the AngelOne token -> symbol index from OpenAPIScripMaster.csv"""
+  try:
+    count = await asyncio.to_thread(scrip_master_index.load)
+    return {"tokens": count}
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.post("/broker-warmup/v1", status_code=status.HTTP_200_OK)
+async def run_broker_warmup():
+  """Log every trader into their brokers now (also runs each weekday before the open)"""
+  try:
+    return await asyncio.to_thread(BrokerWarmupService.run_scheduled)
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/broker-warmup/v1", status_code=status.HTTP_200_OK)
+async def get_broker_warmup_report():
+  """Result of the last warm-up run and when the next one is due"""
+  try:
+    return {
+      "last_report": BrokerWarmupService.last_report,
+      "next_run_at": BrokerWarmupService.next_run_at().isoformat(),
+    }
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
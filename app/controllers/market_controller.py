@@ -188,8 +188,9 @@ async def create_pnl(
 
 
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from app.services.ltp_ws_service import get_ltp, start_ltp_websocket
+from app.services.ltp_store import latest_ltp_store
 import asyncio
 
 router = APIRouter()
@@ -216,11 +217,23 @@ async def start_ltp(token: str, app=Depends(lambda: app)):
     return {"status": "LTP WebSocket started", "token": token}
 
 @router.get("/ltp/{token}")
-async def read_ltp(token: str, app=Depends(lambda: app)):
-    ltp = await get_ltp(app, token)
+async def read_ltp(token: str, request: Request, db: Session = Depends(get_db)):
+    ltp = await get_ltp(request.app, token)
     if ltp is None:
-        return {"token": token, "ltp": None, "status": "waiting for first tick"}
-    return {"token": token, "ltp": ltp}
+        # Not seen since startup; fall back to the newest persisted tick
+        from app.models.models import StrikePriceTickData
+        ltp = (
+            db.query(StrikePriceTickData.ltp)
+            .filter(StrikePriceTickData.token == token)
+            .order_by(StrikePriceTickData.id.desc())
+            .limit(1)
+            .scalar()
+        )
+        if ltp is None:
+            return {"token": token, "ltp": None, "status": "waiting for first tick"}
+        return {"token": token, "ltp": float(ltp)}
+    entry = latest_ltp_store.get_by_token(token)
+    return {"token": token, "ltp": ltp, "timestamp": entry.timestamp.isoformat() if entry else None}
 
 
 
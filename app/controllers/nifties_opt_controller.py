@@ -5,6 +5,7 @@ from app.db.db import get_db
 from app.services.market_services import MarketService
 from app.schemas.schema import MarketIndexSchema, PnLSchema
 from app.models.models import HistoricalData, SpotTickData, SymbolMaster
+from app.services.symbol_cache import symbol_master_cache
 import pandas as pd
 
 from datetime import timezone, timedelta
@@ -165,12 +166,10 @@ def load_historical_ohlc(
 def fetch_ltp(stock_token: str, db: Session = Depends(get_db)):
     try:
         print('stock_token:::', stock_token)
-        symbol = db.query(SymbolMaster).filter(
-            SymbolMaster.token == stock_token,
-            SymbolMaster.is_active == True,
-            SymbolMaster.is_deleted == False
-        ).first()
+        symbol = symbol_master_cache.get_active(stock_token, db)
         print('flag2',symbol)
+        if not symbol:
+            raise HTTPException(status_code=404, detail="Token not found")
         idx = (
             db.query(SpotTickData)
             .filter(SpotTickData.symbol_id == symbol.id)
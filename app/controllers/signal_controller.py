@@ -14,6 +14,8 @@ from app.db.db import get_db
 from app.schemas.signal_schema import SignalEntryRequest, SignalExitRequest, SignalResponse, LTPInsertRequest
 from app.services.signal_service import SignalService
 from app.services.enhanced_signal_services import EnhancedSignalService
+from app.services.ltp_store import latest_ltp_store
+from app.services.latency_trace import SignalTrace
 import asyncio
 router = APIRouter(
     prefix="/db/signals",
@@ -328,6 +330,7 @@ async def send_entry_signal_v3(
     background_tasks: BackgroundTasks=None,
     
 ):
+    trace = SignalTrace.start("ENTRY")
     try:
         # try:
         #     from app.services.ltp_ws_service import start_ltp_websocket
@@ -343,12 +346,12 @@ async def send_entry_signal_v3(
         #     print('Exception',e)
         #     logger.error(f"Failed to start LTP WebSocket: {str(e)}")    
 
-        SignalService.process_entry_signal_v3(db=db, signal_data=signal_data,request=request)
+        result = SignalService.process_entry_signal_v3(db=db, signal_data=signal_data,request=request, trace=trace)
 
         return SignalResponse(
             success=True,
             message="Entry signal v3 processed successfully",
-            data={}
+            data=result
         )
     except Exception as e:
         print('Exception',e)
@@ -363,12 +366,13 @@ async def send_exit_signal_v3(
     signal_data: SignalExitRequest,
     db: Session = Depends(get_db)
 ):
+    trace = SignalTrace.start("EXIT")
     try:
-        SignalService.process_exit_signal_v3(db=db, signal_data=signal_data)
+        result = SignalService.process_exit_signal_v3(db=db, signal_data=signal_data, trace=trace)
         return SignalResponse(
             success=True,
             message="Exit signal v3 processed successfully",
-            data={}
+            data=result
         )
     except Exception as e:
         print('Exception',e)
@@ -391,28 +395,13 @@ async def insert_strike_ltp(
     """
     try:
         print('ltp_data',ltp_data,'qwe123')
-        # 1. Persist to Database
+        # 1. Persist to Database (tick row + strike_latest_ltp upsert)
         from app.services.tick_service import TickLTPService
-        # from app.schemas.schema import StrikePriceLTPInsert
-        import datetime
         from app.models import StrikePriceTickData
-        
-        # # Prepare data for service
-        # db_insert_data = StrikePriceLTPInsert(
-        #     token=ltp_data.token,
-        #     symbol=ltp_data.symbol,
-        #     ltp=ltp_data.ltp,
-        #     timestamp=datetime.datetime.now().isoformat()
-        # )
-        db_insert_data = StrikePriceTickData(
-            token=ltp_data.token,
-            symbol=ltp_data.symbol,
-            ltp=ltp_data.ltp,
-            created_at=datetime.datetime.now().isoformat()
-        )
-        db.add(db_insert_data)
-        db.commit()
-        # TickLTPService.insert_strike_ltp(db, db_insert_data)
+
+        row = TickLTPService.build_strike_ltp_row(ltp_data)
+        TickLTPService.bulk_insert_rows(db, StrikePriceTickData, [row])
+        TickLTPService.publish_strike_ltp(row)
 
         # logger.info(f"Manual LTP insertion for token {ltp_data.token}: {ltp_data.ltp}")
         
@@ -437,12 +426,17 @@ async def multiple_strike_price_entry(
     db: Session = Depends(get_db)
                                     ):
     try:
-        for ltp_data in signal_data:
-            await insert_strike_ltp(ltp_data=ltp_data, db=db)
+        from app.services.tick_service import TickLTPService
+        from app.schemas.schema import StrikePriceLTPInsert
+
+        inserted = TickLTPService.insert_strike_ltp_batch(db, [
+            StrikePriceLTPInsert(token=ltp_data.token, symbol=ltp_data.symbol, ltp=ltp_data.ltp)
+            for ltp_data in signal_data
+        ])
         return SignalResponse(
             success=True,
             message="Multiple strike price entry processed successfully",
-            data={}
+            data={"inserted": inserted}
         )
     except Exception as e:
         raise HTTPException(
@@ -513,6 +507,30 @@ def get_admin_dhan_creds(
         "access_token": admin_dhan_creds.access_token
     }
 
+
+@router.get("/get-all-admin-dhan-creds")
+def get_all_admin_dhan_creds(db: Session = Depends(get_db)):
+    """All active admin Dhan credentials; the feed opens one market connection per row"""
+    admin_dhan_creds = (
+        db.query(
+            AdminDhanCreds.id,
+            AdminDhanCreds.client_id,
+            AdminDhanCreds.access_token
+        )
+        .filter(AdminDhanCreds.is_deleted == False)
+        .order_by(AdminDhanCreds.id)
+        .all()
+    )
+
+    return [
+        {
+            "id": cred.id,
+            "client_id": cred.client_id,
+            "access_token": cred.access_token
+        }
+        for cred in admin_dhan_creds
+    ]
+
         # 
 
 @router.put("/update-stop-loss-target/v1", status_code=status.HTTP_200_OK)
@@ -557,18 +575,20 @@ async def get_strike_price_close_trade_signal(
         if not signal:
             return {"data":False}   # No entry signal found
 
-        # Fetch only LTP value (not a tuple)
-        ltp_row = (
-            db.query(StrikePriceTickData.ltp)
-            .filter(StrikePriceTickData.token == signal.strike_price_token)
-            .first()
-        )
+        # Latest LTP from the in-process store, falling back to the newest tick row
+        ltp = latest_ltp_store.get_ltp(signal.strike_price_token)
+        if ltp is None:
+            ltp = (
+                db.query(StrikePriceTickData.ltp)
+                .filter(StrikePriceTickData.token == signal.strike_price_token)
+                .order_by(StrikePriceTickData.id.desc())
+                .limit(1)
+                .scalar()
+            )
 
-        if not ltp_row:
+        if ltp is None:
             return {"data":False}   # No live price found
 
-        ltp = ltp_row[0]  # ✅ IMPORTANT FIX
-
         sl = signal.strike_price_stop_loss
         target = signal.strike_price_target
 
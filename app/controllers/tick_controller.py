@@ -4,7 +4,7 @@ Controller for Tick Data Insert API
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import Any, Optional
+from typing import Any, Optional, List
 from pydantic import BaseModel
 from app.models.models import StrikeInstrument
 from app.db.db import get_db
@@ -12,6 +12,7 @@ from app.db.db import get_db
 from app.schemas.schema import TickDataInsert,StrikePriceLTPInsert,OHLCDataInsert
 from app.schemas.schema import ApiResponse
 from app.services.tick_service import TickLTPService
+from app.services.tick_buffer import tick_write_buffer, TickBufferFullError
 
 router = APIRouter(
     prefix="/api/tick",
@@ -19,7 +20,7 @@ router = APIRouter(
 )
 
 
-@router.post("/insert-spot-ltp", response_model=ApiResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/insert-spot-ltp", response_model=ApiResponse, status_code=status.HTTP_202_ACCEPTED)
 async def insert_spot_ltp(
     tick_data: TickDataInsert,
     db: Session = Depends(get_db)
@@ -37,22 +38,35 @@ async def insert_spot_ltp(
     }
     ```
     
+    The tick is queued on the write-behind buffer and bulk-inserted by the
+    background flusher.
+
     **Response:**
-    - 201: Tick data inserted successfully
-    - 400: Invalid data (e.g., token not found)
-    - 500: Server error
+    - 202: Tick data queued successfully
+    - 503: Write buffer full
+    - 500: Server error (e.g., token not found)
     """
     try:
-        print('check123',tick_data)
-        # Delegate to service layer
-        db_tick = TickLTPService.insert_spot_ltp(db, tick_data)
-        
+        symbol = TickLTPService.resolve_spot_symbol(db, tick_data.token)
+        row = TickLTPService.build_spot_ltp_row(symbol.id, tick_data)
+        tick_write_buffer.enqueue_spot(row)
+        TickLTPService.publish_spot_ltp(symbol, row)
+
         return ApiResponse(
             success=True,
-            message="Spot LTP data inserted successfully",
-            data=TickLTPService.format_spot_ltp_response(db_tick)
+            message="Spot LTP data queued successfully",
+            data={
+                "symbol_id": symbol.id,
+                "ltp": float(tick_data.ltp),
+                "timestamp": row["timestamp"].isoformat()
+            }
+        )
+
+    except TickBufferFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
         )
-    
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -61,7 +75,7 @@ async def insert_spot_ltp(
 
 
 
-@router.post("/insert-strike-ltp", response_model=ApiResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/insert-strike-ltp", response_model=ApiResponse, status_code=status.HTTP_202_ACCEPTED)
 async def insert_strike_price_ltp(
     strike_ltp_data: StrikePriceLTPInsert,
     db: Session = Depends(get_db)
@@ -78,21 +92,107 @@ async def insert_strike_price_ltp(
     }
     ```
     
+    The tick is queued on the write-behind buffer and bulk-inserted by the
+    background flusher.
+
     **Response:**
-    - 201: Strike price LTP data inserted successfully
-    - 400: Invalid data
+    - 202: Strike price LTP data queued successfully
+    - 503: Write buffer full
     - 500: Server error
     """
     try:
-        # Delegate to service layer
-        db_strike_ltp = TickLTPService.insert_strike_ltp(db, strike_ltp_data)
-        
+        row = TickLTPService.build_strike_ltp_row(strike_ltp_data)
+        tick_write_buffer.enqueue_strike(row)
+        TickLTPService.publish_strike_ltp(row)
+
         return ApiResponse(
             success=True,
-            message="Strike price LTP data inserted successfully",
-            data=TickLTPService.format_strike_ltp_response(db_strike_ltp)
+            message="Strike price LTP data queued successfully",
+            data={
+                "token": strike_ltp_data.token,
+                "symbol": strike_ltp_data.symbol,
+                "ltp": float(strike_ltp_data.ltp),
+                "created_at": row["created_at"].isoformat()
+            }
         )
-    
+
+    except TickBufferFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+@router.post("/insert-spot-ltp/batch", response_model=ApiResponse, status_code=status.HTTP_201_CREATED)
+async def insert_spot_ltp_batch(
+    tick_data: List[TickDataInsert],
+    db: Session = Depends(get_db)
+):
+    """
+    Insert a batch of spot ticks in one multi-row INSERT
+
+    **Request Body Example:**
+    ```json
+    [
+        {"token": "25", "timestamp": "2025-11-25T14:30:45", "ltp": 18500.50},
+        {"token": "13", "timestamp": "2025-11-25T14:30:45", "ltp": 46500.25}
+    ]
+    ```
+
+    **Response:**
+    - 201: Batch inserted successfully
+    - 500: Server error (e.g., token not found); no rows are inserted
+    """
+    try:
+        inserted = TickLTPService.insert_spot_ltp_batch(db, tick_data)
+
+        return ApiResponse(
+            success=True,
+            message="Spot LTP batch inserted successfully",
+            data={"inserted": inserted}
+        )
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+@router.post("/insert-strike-ltp/batch", response_model=ApiResponse, status_code=status.HTTP_201_CREATED)
+async def insert_strike_price_ltp_batch(
+    strike_ltp_data: List[StrikePriceLTPInsert],
+    db: Session = Depends(get_db)
+):
+    """
+    Insert a batch of strike price ticks in one multi-row INSERT
+
+    **Request Body Example:**
+    ```json
+    [
+        {"token": "59200", "symbol": "NIFTY23DEC18500CE", "ltp": 125.50},
+        {"token": "59201", "symbol": "NIFTY23DEC18500PE", "ltp": 98.25}
+    ]
+    ```
+
+    **Response:**
+    - 201: Batch inserted successfully
+    - 500: Server error
+    """
+    try:
+        inserted = TickLTPService.insert_strike_ltp_batch(db, strike_ltp_data)
+
+        return ApiResponse(
+            success=True,
+            message="Strike price LTP batch inserted successfully",
+            data={"inserted": inserted}
+        )
+
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -209,3 +309,53 @@ async def get_active_strike_instruments(db: Session = Depends(get_db)):
         data=data
     )
 
+
+@router.get("/buffer-stats", response_model=ApiResponse)
+async def get_tick_buffer_stats():
+    """
+    Write-behind tick buffer metrics (queue depth, flush latency, row counters)
+    """
+    return ApiResponse(
+        success=True,
+        message="Tick buffer stats retrieved successfully",
+        data=tick_write_buffer.stats()
+    )
+
+
+@router.get("/get-live-strike-instruments", response_model=ApiResponse)
+async def get_live_strike_instruments(db: Session = Depends(get_db)):
+    """
+    Strike instruments that should currently be subscribed: not closed and
+    created today. Feed processes unsubscribe any strike not in this list.
+    """
+    from datetime import datetime
+    from zoneinfo import ZoneInfo
+
+    start_of_day = datetime.now(ZoneInfo("Asia/Kolkata")).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    records = (
+        db.query(
+            StrikeInstrument.exchange,
+            StrikeInstrument.token,
+            StrikeInstrument.symbol
+        )
+        .filter(
+            StrikeInstrument.is_deleted.is_(False),
+            StrikeInstrument.created_at >= start_of_day
+        )
+        .distinct()
+        .all()
+    )
+
+    return ApiResponse(
+        success=True,
+        message="Live strike instruments retrieved successfully",
+        data=[
+            {
+                "exchange": r.exchange,
+                "token": r.token,
+                "symbol": r.symbol
+            }
+            for r in records
+        ]
+    )
@@ -0,0 +1,211 @@
+"""
+WebSocket channels for feed processes: tick ingestion and instrument assignment
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from app.constants.const import INSTRUMENT_ASSIGN_ACK_TIMEOUT_S, INSTRUMENT_ASSIGN_RECHECK_S
+from app.db.db import SessionLocal
+from app.models.models import StrikeInstrument, StrikePriceTickData
+from app.schemas.schema import StrikePriceLTPInsert
+from app.services.instrument_hub import instrument_hub
+from app.services.tick_service import TickLTPService
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/ws/ticks",
+    tags=["Tick Data"]
+)
+
+
+def _parse_exchange_ts(value: Any) -> Optional[datetime]:
+    """Exchange timestamp as epoch seconds or ISO string; None stamps with server time"""
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=ZoneInfo("Asia/Kolkata"))
+    return datetime.fromisoformat(str(value))
+
+
+def _persist_strike_rows(rows: List[Dict[str, Any]]) -> int:
+    db = SessionLocal()
+    try:
+        return TickLTPService.bulk_insert_rows(db, StrikePriceTickData, rows)
+    finally:
+        db.close()
+
+
+def _unstarted_instruments() -> List[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        records = (
+            db.query(
+                StrikeInstrument.id,
+                StrikeInstrument.exchange,
+                StrikeInstrument.token,
+                StrikeInstrument.symbol
+            )
+            .filter(
+                StrikeInstrument.is_deleted.is_(False),
+                StrikeInstrument.is_started.is_(False)
+            )
+            .all()
+        )
+        return [
+            {"id": r.id, "exchange": r.exchange, "token": r.token, "symbol": r.symbol}
+            for r in records
+        ]
+    finally:
+        db.close()
+
+
+def _mark_started(record_ids: List[int]):
+    db = SessionLocal()
+    try:
+        (
+            db.query(StrikeInstrument)
+            .filter(
+                StrikeInstrument.id.in_(record_ids),
+                StrikeInstrument.is_started.is_(False)
+            )
+            .update({StrikeInstrument.is_started: True}, synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+@router.websocket("/instruments")
+async def assign_instruments(websocket: WebSocket):
+    """
+    Push channel for new strike instruments
+
+    **Frames (server → client):**
+    ```json
+    {"type": "instruments", "seq": 3, "instruments": [{"exchange": "NSE_FNO", "token": "49774", "symbol": "NIFTY03FEB2624800CE"}]}
+    ```
+    Sent on connect with every unstarted instrument, then whenever the
+    signal path inserts a new one.
+
+    **Frames (client → server):**
+    ```json
+    {"type": "ack", "seq": 3}
+    ```
+    Rows are marked `is_started` only once the feed acks; an unacked frame
+    is re-sent, so nothing is lost if the feed drops mid-assignment.
+    """
+    await websocket.accept()
+    wakeup = instrument_hub.register()
+    client = websocket.client.host if websocket.client else "unknown"
+    logger.info(f"Instrument channel opened from {client}")
+    seq = 0
+
+    try:
+        while True:
+            records = await asyncio.to_thread(_unstarted_instruments)
+
+            if records:
+                seq += 1
+                await websocket.send_json({
+                    "type": "instruments",
+                    "seq": seq,
+                    "instruments": [
+                        {"exchange": r["exchange"], "token": r["token"], "symbol": r["symbol"]}
+                        for r in records
+                    ]
+                })
+                try:
+                    message = await asyncio.wait_for(websocket.receive_json(), timeout=INSTRUMENT_ASSIGN_ACK_TIMEOUT_S)
+                except asyncio.TimeoutError:
+                    logger.warning(f"Instrument assignment {seq} not acked by {client}, re-sending")
+                    continue
+
+                if message.get("type") == "ack" and message.get("seq") == seq:
+                    await asyncio.to_thread(_mark_started, [r["id"] for r in records])
+                continue
+
+            # Nothing pending: sleep until the signal path inserts a strike
+            try:
+                await asyncio.wait_for(wakeup.get(), timeout=INSTRUMENT_ASSIGN_RECHECK_S)
+            except asyncio.TimeoutError:
+                pass
+            while not wakeup.empty():
+                wakeup.get_nowait()
+
+    except WebSocketDisconnect:
+        logger.info(f"Instrument channel closed from {client}")
+    finally:
+        instrument_hub.unregister(wakeup)
+
+
+@router.websocket("/ingest")
+async def ingest_ticks(websocket: WebSocket):
+    """
+    Long-lived strike tick ingest channel
+
+    **Frames (client → server):**
+    ```json
+    {"type": "symbols", "symbols": {"49774": "NIFTY03FEB2624800CE"}}
+    {"type": "ticks", "seq": 17, "ticks": [["49774", 120.5, "2026-02-03T10:15:02", "NIFTY03FEB2624800CE"], ...]}
+    ```
+    Each tick is `[token, ltp, exchange_timestamp, symbol]`; the timestamp
+    may be epoch seconds, an ISO string or null. The symbol may be null or
+    left out, in which case the one declared for the token in a symbols
+    frame on this connection is used.
+
+    **Frames (server → client):**
+    ```json
+    {"type": "ack", "seq": 17, "inserted": 250}
+    {"type": "nack", "seq": 17, "error": "..."}
+    ```
+    An ack is sent only after the batch is committed, so the feed can drop
+    everything up to `seq` from its local spool.
+    """
+    await websocket.accept()
+    symbols: Dict[str, str] = {}
+    client = websocket.client.host if websocket.client else "unknown"
+    logger.info(f"Tick ingest channel opened from {client}")
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+            frame_type = message.get("type")
+
+            if frame_type == "symbols":
+                symbols.update({str(token): symbol for token, symbol in message.get("symbols", {}).items()})
+                continue
+
+            if frame_type != "ticks":
+                await websocket.send_json({"type": "error", "error": f"Unknown frame type '{frame_type}'"})
+                continue
+
+            seq = message.get("seq")
+            try:
+                rows = []
+                for token, ltp, exchange_ts, *rest in message.get("ticks", []):
+                    token = str(token)
+                    symbol = (rest[0] if rest else None) or symbols.get(token, token)
+                    rows.append(TickLTPService.build_strike_ltp_row(
+                        StrikePriceLTPInsert(token=token, symbol=symbol, ltp=ltp),
+                        timestamp=_parse_exchange_ts(exchange_ts),
+                    ))
+
+                inserted = await asyncio.to_thread(_persist_strike_rows, rows)
+                for row in rows:
+                    TickLTPService.publish_strike_ltp(row)
+
+                await websocket.send_json({"type": "ack", "seq": seq, "inserted": inserted})
+
+            except Exception as e:
+                logger.error(f"Tick ingest batch {seq} failed: {str(e)}")
+                await websocket.send_json({"type": "nack", "seq": seq, "error": str(e)})
+
+    except WebSocketDisconnect:
+        logger.info(f"Tick ingest channel closed from {client}")
@@ -8,7 +8,16 @@ from logging.handlers import RotatingFileHandler
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.models.models import Base
-from app.db.db import engine
+from app.db.db import engine, SessionLocal
+from app.services.symbol_cache import symbol_master_cache
+from app.services.strategy_subscriptions import strategy_subscription_index
+from app.services.tick_buffer import tick_write_buffer
+from app.services.ltp_store import latest_ltp_store
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.scrip_master import scrip_master_index
+from app.services.latency_trace import latency_trace_buffer
+from app.services.order_reconciliation import broker_order_ledger
+from app.services.session_warmup import run_broker_warmup_scheduler
 from app.middleware.middleware import TimerMiddleware, LoggingMiddleware, AuthMiddleware, ErrorHandlingMiddleware
 from app.constants.const import API_TITLE, API_DESCRIPTION, API_VERSION, CORS_ORIGINS
 import asyncio
@@ -26,6 +35,7 @@ from app.controllers import (
     log_controller,
     alert_controller,
     tick_controller,
+    tick_ws_controller,
     signal_controller,
     admin_controllers
 )
@@ -108,6 +118,7 @@ def create_app():
     app.include_router(log_controller.router)
     app.include_router(alert_controller.router)
     app.include_router(tick_controller.router)
+    app.include_router(tick_ws_controller.router)
     app.include_router(signal_controller.router)
     app.include_router(admin_controllers.router)
     
@@ -126,12 +137,40 @@ create_app()
 async def startup_event():
     """Execute on application startup"""
     logger.info("Application startup")
-    app.state.ltp = {}
+    app.state.ltp = latest_ltp_store
     app.state.ltp_lock = asyncio.Lock()
 
+    db = SessionLocal()
+    try:
+        symbol_master_cache.load(db)
+    except Exception as e:
+        # Lookups fall back to a lazy load on first use
+        logger.error(f"Error loading SymbolMaster cache: {str(e)}")
+    try:
+        strategy_subscription_index.load(db)
+    except Exception as e:
+        logger.error(f"Error loading strategy subscriptions: {str(e)}")
+    finally:
+        db.close()
+
+    try:
+        await asyncio.to_thread(scrip_master_index.load)
+    except Exception as e:
+        # get_angelone_symbol loads it on first use instead
+        logger.error(f"Error loading scrip master index: {str(e)}")
+
+    tick_write_buffer.start()
+    app.state.broker_warmup_task = asyncio.create_task(run_broker_warmup_scheduler())
+
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     """Execute on application shutdown"""
     logger.info("Application shutdown")
+    app.state.broker_warmup_task.cancel()
+    await tick_write_buffer.stop()
+    # Let in-flight broker orders finish before the process exits
+    await asyncio.to_thread(broker_dispatcher.drain)
+    await asyncio.to_thread(latency_trace_buffer.stop)
+    await asyncio.to_thread(broker_order_ledger.stop)
@@ -13,7 +13,12 @@ from app.models.models import (
     Analytics,
     MarketIndex,
     PnLSnapshot,
-    StrikePriceTickData
+    StrikePriceTickData,
+    StrikeLatestLTP,
+    SignalOutbox,
+    SignalOutboxDelivery,
+    SignalLatencyTrace,
+    UserStrategySubscription
 )
 
 __all__ = [
@@ -27,4 +32,9 @@ __all__ = [
     "MarketIndex",
     "PnLSnapshot",
     "StrikePriceTickData",
+    "StrikeLatestLTP",
+    "SignalOutbox",
+    "SignalOutboxDelivery",
+    "SignalLatencyTrace",
+    "UserStrategySubscription",
 ]
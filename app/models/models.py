@@ -209,6 +209,7 @@ class User(Base):
     trading_settings = relationship("UserTradingSettings", back_populates="user", uselist=False, cascade="all, delete-orphan")
     risk_settings = relationship("UserRiskSettings", back_populates="user", uselist=False, cascade="all, delete-orphan")
     ui_settings = relationship("UserUISettings", back_populates="user", uselist=False, cascade="all, delete-orphan")
+    strategy_subscriptions = relationship("UserStrategySubscription", back_populates="user", cascade="all, delete-orphan")
     
     # positions = relationship("Position", back_populates="user", cascade="all, delete-orphan")
     orders = relationship("Order", back_populates="user", cascade="all, delete-orphan")
@@ -346,7 +347,8 @@ class UserTradingSettings(Base):
     default_qty = Column(Integer, default=1)
     default_product_type = Column(String(20), default="NRML")  # MIS, NRML, CNC
     default_order_type = Column(String(20), default="MARKET")  # MARKET, LIMIT
-    
+    paper_trading = Column(Boolean, default=False, nullable=False)  # simulated fills, no broker calls
+
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -429,6 +431,32 @@ class UserUISettings(Base):
         return f"<UserUISettings(user_id={self.user_id}, theme={self.theme})>"
 
 
+class UserStrategySubscription(Base):
+    """Strategies a trader receives signals for, and how many lots per signal"""
+    __tablename__ = "user_strategy_subscriptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete='CASCADE'), nullable=False, index=True)
+    strategy_code = Column(String(100), nullable=False, index=True)  # signal strategy_code
+
+    qty_multiplier = Column(Integer, nullable=False, default=1)  # lots per signal lot
+    is_active = Column(Boolean, nullable=False, default=True)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Relationships
+    user = relationship("User", back_populates="strategy_subscriptions")
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'strategy_code', name='uq_user_strategy_subscription'),
+    )
+
+    def __repr__(self):
+        return f"<UserStrategySubscription(user_id={self.user_id}, strategy_code={self.strategy_code})>"
+
+
 # ==================== MARKET DATA ====================
 
 class MarketIndex(Base):
@@ -630,7 +658,7 @@ class Order(Base):
     user = relationship("User", back_populates="orders")
     signal_log = relationship("SignalLog", back_populates="orders")
     strategy = relationship("Strategy", back_populates="orders")
-    broker_order = relationship("BrokerOrder", back_populates="order", uselist=False)
+    broker_orders = relationship("BrokerOrder", back_populates="order")
     __table_args__ = (
         Index('idx_order_user_status', 'user_id', 'status'),
         
@@ -1155,11 +1183,23 @@ class BrokerOrder(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
-    order_id = Column(Integer, ForeignKey('orders.id', ondelete='SET NULL'), unique=True)
+    # An order has an entry and an exit leg, each possibly on several brokers
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete='SET NULL'), index=True)
     
     # Broker Details
+    broker = Column(String(20), nullable=False)  # dhan, angelone
     broker_order_id = Column(String(100), unique=True, index=True)
     exchange_order_id = Column(String(100))
+
+    # Which orders row this fills: orders.signal_log_id (the ENTRY signal) and the leg
+    signal_log_id = Column(BigInteger, index=True)
+    leg = Column(String(10))  # ENTRY, EXIT
+
+    # Reconciliation
+    status = Column(String(20), default='PENDING', index=True)  # PENDING, FILLED, REJECTED, CANCELLED
+    fill_price = Column(Numeric(10, 2))
+    price_applied = Column(Boolean, default=False, nullable=False)  # fill written to the orders row
+    reconciled_at = Column(DateTime(timezone=True))
     
     # Raw Response
     raw_response = Column(JSON)  # Complete broker API response
@@ -1169,10 +1209,11 @@ class BrokerOrder(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
-    order = relationship("Order", back_populates="broker_order")
+    order = relationship("Order", back_populates="broker_orders")
     
     __table_args__ = (
         Index('idx_broker_order_user', 'user_id', 'broker_order_id'),
+        Index('idx_broker_order_status_time', 'status', 'created_at'),
     )
     
     def __repr__(self):
@@ -1547,6 +1588,33 @@ class StrikePriceTickData(Base):
         return f"<StrikePriceTickData(id={self.id}, token={self.token}, symbol={self.symbol}, ltp={self.ltp})>"
 
 
+class StrikeLatestLTP(Base):
+    """Latest strike price LTP per instrument, upserted by tick ingestion"""
+    __tablename__ = 'strike_latest_ltp'
+
+    token = Column(Text, primary_key=True)
+    symbol = Column(Text, primary_key=True)
+
+    ltp = Column(
+        Numeric(10, 2),
+        nullable=False
+    )
+
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_strike_latest_ltp_symbol', 'symbol'),
+    )
+
+    def __repr__(self):
+        return f"<StrikeLatestLTP(token={self.token}, symbol={self.symbol}, ltp={self.ltp})>"
+
+
 class SignalLog(Base):
     """Trading signal logs for entry and exit signals"""
     __tablename__ = 'signal_logs'
@@ -1581,6 +1649,8 @@ class SignalLog(Base):
         Index('idx_signal_log_token_time', 'token', 'timestamp'),
         Index('idx_signal_log_strategy', 'strategy_code', 'timestamp'),
         Index('idx_signal_log_category', 'signal_category', 'timestamp'),
+        # A retried signal must not be logged (or fanned out) twice
+        UniqueConstraint('unique_id', 'signal_category', name='uq_signal_log_unique_id_category'),
     )
     
     def __repr__(self):
@@ -1601,6 +1671,78 @@ class StrikeInstrument(Base):
 
 
 
+class SignalOutbox(Base):
+    """Broker fanout work for a signal, written in the same transaction as its SignalLog"""
+    __tablename__ = 'signal_outbox'
+
+    id = Column(BigInteger, primary_key=True, index=True)
+    signal_log_id = Column(BigInteger, ForeignKey('signal_logs.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Orders are keyed by the ENTRY signal log id, for exits too
+    order_signal_log_id = Column(BigInteger, ForeignKey('signal_logs.id', ondelete='SET NULL'), nullable=True)
+    signal_category = Column(String(20), nullable=False)  # ENTRY or EXIT
+    payload = Column(JSONB, nullable=False)
+    received_at = Column(DateTime(timezone=True), nullable=True)  # when the API received the signal
+
+    status = Column(String(20), nullable=False, default='PENDING')  # PENDING, CLAIMED, DONE
+    attempts = Column(Integer, nullable=False, default=0)
+    claimed_by = Column(String(100), nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index('idx_signal_outbox_status', 'status', 'id'),
+    )
+
+    def __repr__(self):
+        return f"<SignalOutbox(id={self.id}, signal_log_id={self.signal_log_id}, status={self.status})>"
+
+
+class SignalOutboxDelivery(Base):
+    """Per-trader outcome of an outbox row's broker fanout"""
+    __tablename__ = 'signal_outbox_deliveries'
+
+    id = Column(BigInteger, primary_key=True, index=True)
+    outbox_id = Column(BigInteger, ForeignKey('signal_outbox.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    # PENDING, SENDING, PLACED, SKIPPED, FAILED, UNKNOWN (worker died before the order was recorded)
+    status = Column(String(20), nullable=False, default='PENDING')
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('outbox_id', 'user_id', name='uq_signal_outbox_delivery'),
+    )
+
+    def __repr__(self):
+        return f"<SignalOutboxDelivery(outbox_id={self.outbox_id}, user_id={self.user_id}, status={self.status})>"
+
+
+class SignalLatencyTrace(Base):
+    """One timestamped stage of a signal's processing, signal-wide or for one trader"""
+    __tablename__ = 'signal_latency_traces'
+
+    id = Column(BigInteger, primary_key=True, index=True)
+    signal_log_id = Column(BigInteger, ForeignKey('signal_logs.id', ondelete='CASCADE'), nullable=False, index=True)
+    signal_category = Column(String(20), nullable=False)  # ENTRY or EXIT
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=True)  # NULL for signal-wide stages
+    broker = Column(String(20), nullable=True)
+    # receipt, signal_log_commit, symbol_resolution, dispatch, credential_fetch,
+    # broker_call_start, broker_call_end, db_persist
+    stage = Column(String(30), nullable=False)
+    recorded_at = Column(DateTime(timezone=True), nullable=False)
+    elapsed_ms = Column(Float, nullable=False)   # since receipt
+    duration_ms = Column(Float, nullable=False)  # since the previous stage (of the trader, or signal-wide)
+
+    __table_args__ = (
+        Index('idx_signal_latency_stage_time', 'recorded_at', 'stage'),
+    )
+
+    def __repr__(self):
+        return f"<SignalLatencyTrace(signal_log_id={self.signal_log_id}, user_id={self.user_id}, stage={self.stage})>"
+
+
 class AdminDhanCreds(Base):
     __tablename__ = "admin_dhan_creds"
 
@@ -550,6 +550,16 @@ class BrokerDetailsUpdateSchema(BaseModel):
         orm_mode = True
 
 
+class StrategySubscriptionSchema(BaseModel):
+    user_id: int = Field(..., gt=0, description="User ID")
+    strategy_code: str = Field(..., min_length=1, description="Strategy code sent with signals")
+    qty_multiplier: int = Field(1, ge=1, description="Lots per signal lot")
+    is_active: bool = Field(True, description="Is Active")
+
+    class Config:
+        orm_mode = True
+
+
 class UserInformationSchema(BaseModel):
     """Schema for user information"""
 
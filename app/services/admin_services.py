@@ -2,15 +2,22 @@
 
 
 from app.schemas.signal_schema import SignalEntryRequest, SignalExitRequest ,StrikeData
-from app.models.models import SignalLog, StrikeInstrument, Strategy , Order , StrikePriceTickData ,SymbolMaster,User,DhanCredentials,AngelOneCredentials , ScriptsInfo , AdminDhanCreds,SymbolTokenFile
+from app.models.models import SignalLog, StrikeInstrument, Strategy , Order , StrikePriceTickData ,SymbolMaster,User,DhanCredentials,AngelOneCredentials , ScriptsInfo , AdminDhanCreds,SymbolTokenFile,UserTradingSettings,UserStrategySubscription
 import threading
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from app.services.order_service_utils import get_all_traders_id
+from app.services.order_service_utils import get_all_traders_id, get_angelone_symbol, call_broker_api
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.order_batch import OrderBatch
+from app.services.broker_sessions import broker_session_cache
+from app.services.paper_trading import paper_traders
+from app.services.strategy_subscriptions import strategy_subscription_index
 from datetime import date, timedelta
 from app.services.signal_service import SignalService
+from app.services.symbol_cache import symbol_master_cache
+from app.services.ltp_store import latest_ltp_store
 from typing import List
 import os
 from io import BytesIO
@@ -56,8 +63,10 @@ class AdminService:
         ))
         db.commit()
 
+        angelone_symbol = get_angelone_symbol(token=int(signal_data.strike_data.token))
+        order_batch = OrderBatch(signal_log_id, OrderBatch.ENTRY, traders_ids)
         for trader_id in traders_ids:
-            threading.Thread(target=call_broker_dhan_api, args=(trader_id,signal_log_id,signal_data,)).start()
+            broker_dispatcher.submit(call_broker_api, trader_id, signal_log_id, angelone_symbol, signal_data, order_batch=order_batch)
         return True
 
 
@@ -93,8 +102,10 @@ class AdminService:
         ))
         db.commit()
 
+        angelone_symbol = get_angelone_symbol(token=int(signal_data.strike_data.token))
+        order_batch = OrderBatch(signal_log_id, OrderBatch.ENTRY, user_ids)
         for trader_id in user_ids:
-            threading.Thread(target=call_broker_dhan_api, args=(trader_id,signal_log_id,signal_data,)).start()
+            broker_dispatcher.submit(call_broker_api, trader_id, signal_log_id, angelone_symbol, signal_data, order_batch=order_batch)
 
 
     @staticmethod
@@ -113,8 +124,10 @@ class AdminService:
 
         traders_ids = get_all_traders_id(db=db)
 
+        angelone_symbol = get_angelone_symbol(token=int(signal_data.strike_data.token))
+        order_batch = OrderBatch(signal_log_id, OrderBatch.EXIT, traders_ids)
         for trader_id in traders_ids:
-            threading.Thread(target=call_broker_dhan_api, args=(trader_id,signal_log_id,signal_data)).start()
+            broker_dispatcher.submit(call_broker_api, trader_id, signal_log_id, angelone_symbol, signal_data, order_batch=order_batch)
 
     @staticmethod
     def close_live_trade_for_user_v1(signal_data:SignalExitRequest,user_ids:List[int],db:Session):
@@ -131,8 +144,10 @@ class AdminService:
         db.commit()
 
 
+        angelone_symbol = get_angelone_symbol(token=int(signal_data.strike_data.token))
+        order_batch = OrderBatch(signal_log_id, OrderBatch.EXIT, user_ids)
         for trader_id in user_ids:
-            threading.Thread(target=call_broker_dhan_api, args=(trader_id,signal_log_id,signal_data)).start()
+            broker_dispatcher.submit(call_broker_api, trader_id, signal_log_id, angelone_symbol, signal_data, order_batch=order_batch)
 
     @staticmethod
     def update_stop_loss_target_v1(unique_id:str,stop_loss:float,target:float,strike_price_stop_loss:float,strike_price_target:float,db:Session):
@@ -284,6 +299,8 @@ class AdminService:
                 current_price = exit_price
                 print('123')
             else:
+                current_price = latest_ltp_store.get_ltp(payload["strike_data"]["token"])
+            if current_price is None:
                 current_price = (
                     db.query(StrikePriceTickData.ltp)
                     .filter(
@@ -410,6 +427,7 @@ class AdminService:
             return False  # token not found
 
         db.commit()
+        symbol_master_cache.refresh(db)
         return True
 
 
@@ -533,6 +551,7 @@ class AdminService:
                 AngelOneCredentials.is_active: angelone_info.is_active,
             })
         db.commit()
+        broker_session_cache.invalidate(user_id)
 
         return True
 
@@ -635,7 +654,65 @@ class AdminService:
         user_dhan_creds.client_id = client_id
         db.commit()
         db.refresh(user_dhan_creds)
+        broker_session_cache.invalidate(user_id, "dhan")
         return True
+
+    @staticmethod
+    def set_paper_trading_v1(db:Session,user_id:int,enabled:bool):
+        if not db.query(User.id).filter(User.id == user_id).first():
+            return False
+        settings = db.query(UserTradingSettings).filter(UserTradingSettings.user_id == user_id).first()
+        if not settings:
+            settings = UserTradingSettings(user_id=user_id)
+            db.add(settings)
+        settings.paper_trading = enabled
+        db.commit()
+        # Other processes pick the change up within PAPER_TRADERS_REFRESH_S
+        paper_traders.invalidate()
+        return True
+
+    @staticmethod
+    def list_strategy_subscriptions_v1(db:Session,strategy_code:str=None):
+        query = db.query(UserStrategySubscription)
+        if strategy_code:
+            query = query.filter(UserStrategySubscription.strategy_code == strategy_code)
+        return [
+            {
+                "user_id": sub.user_id,
+                "strategy_code": sub.strategy_code,
+                "qty_multiplier": sub.qty_multiplier,
+                "is_active": sub.is_active,
+            }
+            for sub in query.order_by(UserStrategySubscription.strategy_code, UserStrategySubscription.user_id).all()
+        ]
+
+    @staticmethod
+    def upsert_strategy_subscription_v1(subscription,db:Session):
+        if not db.query(User.id).filter(User.id == subscription.user_id).first():
+            return False
+        sub = db.query(UserStrategySubscription).filter(
+            UserStrategySubscription.user_id == subscription.user_id,
+            UserStrategySubscription.strategy_code == subscription.strategy_code
+        ).first()
+        if not sub:
+            sub = UserStrategySubscription(user_id=subscription.user_id, strategy_code=subscription.strategy_code)
+            db.add(sub)
+        sub.qty_multiplier = subscription.qty_multiplier
+        sub.is_active = subscription.is_active
+        db.commit()
+        # Other processes pick the change up within STRATEGY_SUBSCRIPTIONS_REFRESH_S
+        strategy_subscription_index.invalidate()
+        return True
+
+    @staticmethod
+    def delete_strategy_subscription_v1(db:Session,user_id:int,strategy_code:str):
+        deleted = db.query(UserStrategySubscription).filter(
+            UserStrategySubscription.user_id == user_id,
+            UserStrategySubscription.strategy_code == strategy_code
+        ).delete()
+        db.commit()
+        strategy_subscription_index.invalidate()
+        return deleted > 0
         
 
 
@@ -0,0 +1,301 @@
+"""
+Bounded executor for broker order fanout
+Signal paths submit one task per trader instead of starting a thread each;
+broker calls inside a task take a per-broker slot so one slow broker can't
+hold every worker
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.constants.const import (
+    BROKER_DISPATCH_WORKERS,
+    BROKER_DISPATCH_LIMITS,
+    BROKER_DISPATCH_DRAIN_TIMEOUT_S,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class DispatcherClosedError(Exception):
+    """Raised when submitting to a dispatcher that is draining or stopped"""
+    pass
+
+
+class BrokerDispatcher:
+    """Long-lived worker pool with per-broker concurrency limits and queue metrics"""
+
+    def __init__(
+        self,
+        max_workers: int = BROKER_DISPATCH_WORKERS,
+        broker_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.max_workers = max_workers
+        self.broker_limits = dict(BROKER_DISPATCH_LIMITS if broker_limits is None else broker_limits)
+        self._semaphores = {
+            broker: threading.BoundedSemaphore(limit)
+            for broker, limit in self.broker_limits.items()
+        }
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Side pool for the extra legs of run_concurrently; its tasks never wait on dispatcher work
+        self._legs: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._accepting = True
+        self._stopped = False   # pools shut down by drain(); never recreated
+
+        # Delayed tasks: (due, seq, side_pool, fn, args, kwargs), run by one timer thread
+        self._delayed: List[Tuple[float, int, bool, Callable, tuple, dict]] = []
+        self._delayed_ready = threading.Condition(threading.Lock())
+        self._delayed_seq = itertools.count()
+        self._timer: Optional[threading.Thread] = None
+
+        # Metrics
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.running = 0
+        self.broker_in_flight: Dict[str, int] = {broker: 0 for broker in self.broker_limits}
+        self.broker_waiting: Dict[str, int] = {broker: 0 for broker in self.broker_limits}
+        self.max_queue_depth = 0
+        self.max_queue_wait_ms = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self.submitted - self.completed - self.failed - self.running
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="broker-dispatch",
+            )
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Queue a task on the worker pool
+
+        Raises:
+            DispatcherClosedError: If the dispatcher is draining
+        """
+        with self._lock:
+            if not self._accepting:
+                raise DispatcherClosedError("Broker dispatcher is shutting down")
+            self._ensure_started()
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            return self._executor.submit(self._run, time.perf_counter(), fn, args, kwargs)
+
+    def submit_after(self, delay: float, fn: Callable, *args, **kwargs):
+        """Queue a task once `delay` seconds have passed, without holding a worker meanwhile"""
+        self._schedule(delay, False, fn, args, kwargs)
+
+    def retry_after(self, delay: float, fn: Callable, *args, **kwargs):
+        """
+        Like submit_after, but run on the side pool: for broker call retries
+        that a dispatch worker may be waiting on, so they can't be starved
+        """
+        self._schedule(delay, True, fn, args, kwargs)
+
+    def _schedule(self, delay: float, side_pool: bool, fn: Callable, args: tuple, kwargs: dict):
+        with self._delayed_ready:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._delayed_seq), side_pool, fn, args, kwargs))
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._run_timer, daemon=True, name="broker-dispatch-timer")
+                self._timer.start()
+            self._delayed_ready.notify()
+
+    def _side_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._legs is None:
+                if self._stopped:
+                    raise DispatcherClosedError("Broker dispatcher is stopped")
+                self._legs = ThreadPoolExecutor(
+                    max_workers=max(1, sum(self.broker_limits.values())),
+                    thread_name_prefix="broker-leg",
+                )
+            return self._legs
+
+    def _run_timer(self):
+        while True:
+            with self._delayed_ready:
+                while not self._delayed or self._delayed[0][0] > time.monotonic():
+                    timeout = self._delayed[0][0] - time.monotonic() if self._delayed else None
+                    self._delayed_ready.wait(timeout)
+                _, _, side_pool, fn, args, kwargs = heapq.heappop(self._delayed)
+                # drain() waits for due tasks to leave the heap
+                self._delayed_ready.notify_all()
+            self._dispatch_delayed(side_pool, fn, args, kwargs)
+
+    def _dispatch_delayed(self, side_pool: bool, fn: Callable, args: tuple, kwargs: dict):
+        """Hand a due delayed task to its pool, or run it on this thread once the pools are closed"""
+        try:
+            if side_pool:
+                self._side_pool().submit(fn, *args, **kwargs)
+            else:
+                self.submit(fn, *args, **kwargs)
+            return
+        except (DispatcherClosedError, RuntimeError):
+            pass
+
+        # Draining or stopped: run it here rather than drop it, counted like a submitted task
+        with self._lock:
+            self.submitted += 1
+        try:
+            self._run(time.perf_counter(), fn, args, kwargs)
+        except Exception:
+            # Already logged by _run; a failing task must not kill the timer thread
+            pass
+
+    def _run(self, queued_at: float, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        wait_ms = (time.perf_counter() - queued_at) * 1000
+        with self._lock:
+            self.running += 1
+            self.max_queue_wait_ms = max(self.max_queue_wait_ms, wait_ms)
+
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        except Exception as e:
+            logger.error(f"Broker dispatch task {getattr(fn, '__name__', fn)} failed: {str(e)}")
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._idle.notify_all()
+
+    def run_concurrently(self, calls: Dict[str, Callable[[], Any]]) -> Dict[str, Future]:
+        """
+        Run a task's independent calls (e.g. one trader's per-broker orders) at once
+
+        The first call runs on the calling thread and the rest on a side pool,
+        so a dispatch worker blocked here never waits on queued dispatcher tasks.
+
+        Args:
+            calls: Name -> zero-argument callable
+
+        Returns:
+            Name -> finished Future holding each call's result or exception
+        """
+        names = list(calls)
+        futures: Dict[str, Future] = {}
+        if len(names) > 1:
+            legs = self._side_pool()
+            for name in names[1:]:
+                futures[name] = legs.submit(calls[name])
+
+        if names:
+            first = Future()
+            try:
+                first.set_result(calls[names[0]]())
+            except Exception as e:
+                first.set_exception(e)
+            futures[names[0]] = first
+
+        wait(futures.values())
+        return {name: futures[name] for name in names}
+
+    @contextmanager
+    def limit(self, broker: str):
+        """Hold one of the broker's concurrency slots for the duration of a broker call"""
+        semaphore = self._semaphores.get(broker)
+        if semaphore is None:
+            yield
+            return
+
+        with self._lock:
+            self.broker_waiting[broker] += 1
+        semaphore.acquire()
+        with self._lock:
+            self.broker_waiting[broker] -= 1
+            self.broker_in_flight[broker] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.broker_in_flight[broker] -= 1
+            semaphore.release()
+
+    def drain(self, timeout: float = BROKER_DISPATCH_DRAIN_TIMEOUT_S) -> bool:
+        """
+        Stop accepting work and wait for queued and running tasks
+
+        Args:
+            timeout: Seconds to wait before giving up on stragglers
+
+        Returns:
+            True if everything finished within the timeout
+        """
+        deadline = time.monotonic() + timeout
+
+        # The timer keeps dispatching delayed tasks due before the deadline to their pools;
+        # those due later are dispatched now, early, rather than dropped
+        with self._delayed_ready:
+            while self._delayed and self._delayed[0][0] <= deadline:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._delayed_ready.wait(remaining)
+            pending_delayed, self._delayed = sorted(self._delayed, key=lambda task: task[:2]), []
+        for _, _, side_pool, fn, args, kwargs in pending_delayed:
+            self._dispatch_delayed(side_pool, fn, args, kwargs)
+
+        with self._lock:
+            self._accepting = False
+            while self.submitted > self.completed + self.failed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._idle.wait(remaining)
+            drained = self.submitted == self.completed + self.failed
+            executor, self._executor = self._executor, None
+            legs, self._legs = self._legs, None
+            self._stopped = True
+
+        if executor is not None:
+            executor.shutdown(wait=drained)
+        if legs is not None:
+            legs.shutdown(wait=drained)
+        if not drained:
+            logger.warning(f"Broker dispatcher drain timed out with {self.submitted - self.completed - self.failed} tasks unfinished")
+        return drained
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, worker usage and per-broker slot usage"""
+        with self._lock:
+            return {
+                "accepting": self._accepting,
+                "max_workers": self.max_workers,
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "max_queue_wait_ms": round(self.max_queue_wait_ms, 3),
+                "running": self.running,
+                "delayed": len(self._delayed),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "brokers": {
+                    broker: {
+                        "limit": limit,
+                        "in_flight": self.broker_in_flight[broker],
+                        "waiting": self.broker_waiting[broker],
+                    }
+                    for broker, limit in self.broker_limits.items()
+                },
+            }
+
+
+broker_dispatcher = BrokerDispatcher()
@@ -11,7 +11,8 @@ from dataclasses import dataclass, asdict
 
 import pyotp
 from functools import wraps
-import time
+from concurrent.futures import Future
+import random
 
 # Import broker constants
 from app.constants.broker_constants import (
@@ -31,6 +32,11 @@ from app.constants.broker_constants import (
     ANGELONE_REQUIRED_FIELDS,
     DHAN_REQUIRED_FIELDS
 )
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.circuit_breaker import CircuitOpenError, broker_breakers
+from app.services.broker_simulator import SimulatedDhan, SimulatedSmartConnect
+from app.services.paper_trading import PaperFillError, paper_fill_model
+from app.constants.const import BROKER_SIMULATOR_URL
 
 
 
@@ -84,14 +90,27 @@ class ValidationError(BrokerError):
 
 # ==================== RETRY DECORATOR ====================
 
-def retry_on_failure(max_attempts: int = None, delay: float = None, backoff: float = None):
+def retry_on_failure(max_attempts: int = None, delay: float = None, backoff: float = None,
+                     broker: str = None, endpoint: str = None):
     """
-    Retry decorator with exponential backoff
+    Retry decorator with exponential backoff and jitter
+    
+    Retries are scheduled on the broker dispatcher's timer, and with a broker
+    given every attempt goes through the (broker, endpoint) circuit breaker:
+    once the broker is failing, attempts (including retries already queued)
+    fail fast with CircuitOpenError.
+    
+    Calling the decorated function blocks the caller through every backoff
+    and retry until the final outcome, as a sleep between attempts would.
+    `func.submit(...)` returns a Future instead and leaves the calling thread
+    free while retries wait (see submit_angelone_order_standalone).
     
     Args:
         max_attempts: Maximum number of retry attempts (default from RetryConfig)
         delay: Initial delay between retries in seconds (default from RetryConfig)
         backoff: Multiplier for delay after each attempt (default from RetryConfig)
+        broker: Broker name for the circuit breaker (no breaker if None)
+        endpoint: Endpoint name for the circuit breaker (default: function name)
     """
     # Use defaults from RetryConfig if not provided
     max_attempts = max_attempts or RetryConfig.MAX_ATTEMPTS
@@ -99,23 +118,38 @@ def retry_on_failure(max_attempts: int = None, delay: float = None, backoff: flo
     backoff = backoff or RetryConfig.BACKOFF_MULTIPLIER
     
     def decorator(func):
+        breaker_endpoint = endpoint or func.__name__
+
+        def attempt(future: Future, attempt_no: int, current_delay: float, args: tuple, kwargs: dict):
+            try:
+                if broker:
+                    result = broker_breakers.call(broker, breaker_endpoint, func, *args, **kwargs)
+                else:
+                    result = func(*args, **kwargs)
+            except CircuitOpenError as e:
+                future.set_exception(e)
+                return
+            except Exception as e:
+                if attempt_no >= max_attempts:
+                    future.set_exception(e)
+                    return
+                jittered = current_delay * random.uniform(1 - RetryConfig.JITTER, 1 + RetryConfig.JITTER)
+                broker_dispatcher.retry_after(
+                    jittered, attempt, future, attempt_no + 1, current_delay * backoff, args, kwargs
+                )
+                return
+            future.set_result(result)
+
+        def submit(*args, **kwargs) -> Future:
+            future = Future()
+            attempt(future, 1, delay, args, kwargs)
+            return future
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            current_delay = delay
-            last_exception = None
-            
-            for attempt in range(1, max_attempts + 1):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    last_exception = e
-                    if attempt < max_attempts:
-
-                        time.sleep(current_delay)
-                        current_delay *= backoff
+            return submit(*args, **kwargs).result()
 
-            
-            raise last_exception
+        wrapper.submit = submit
         return wrapper
     return decorator
 
@@ -216,7 +250,7 @@ def angelone_get_auth(api_key: str, username: str, pwd: str, token: str) -> Auth
     """
     try:
 
-        obj = SmartConnect(api_key=api_key)
+        obj = SimulatedSmartConnect(api_key=api_key) if BROKER_SIMULATOR_URL else SmartConnect(api_key=api_key)
         
         # Generate TOTP and authenticate
         totp = pyotp.TOTP(token).now()
@@ -245,7 +279,7 @@ def angelone_get_auth(api_key: str, username: str, pwd: str, token: str) -> Auth
         raise AuthenticationError(f"Angel One authentication failed: {str(e)}") from e
 
 
-@retry_on_failure(max_attempts=3, delay=1.0, backoff=2.0)
+@retry_on_failure(max_attempts=3, delay=1.0, backoff=2.0, broker="angelone", endpoint="place_order")
 def angelone_place_order(smart_api_obj: SmartConnect, order_details: Dict[str, Any]) -> Dict[str, Any]:
     """
     Place an order using Angel One SmartAPI with retry logic
@@ -282,7 +316,8 @@ def place_angelone_order_standalone(
     username: str,
     pwd: str,
     token: str,
-    order_params: dict
+    order_params: dict,
+    paper: bool = False
 ) -> BrokerResponse:
     """
     Standalone function to place an order in Angel One account.
@@ -306,6 +341,7 @@ def place_angelone_order_standalone(
             - squareoff (str): Square off value (use "0" if not applicable)
             - stoploss (str): Stop loss value (use "0" if not applicable)
             - quantity (str): Number of shares/lots
+        paper (bool): Simulate the fill at the latest LTP instead of calling Angel One
     
     Returns:
         BrokerResponse: Standardized response object
@@ -333,77 +369,119 @@ def place_angelone_order_standalone(
         ... )
         >>> print(result.to_dict())
     """
+    return submit_angelone_order_standalone(api_key, username, pwd, token, order_params, paper=paper).result()
+
+
+def submit_angelone_order_standalone(
+    api_key: str,
+    username: str,
+    pwd: str,
+    token: str,
+    order_params: dict,
+    paper: bool = False
+) -> Future:
+    """
+    Place an order in Angel One account without waiting out retries
+    
+    Validation, authentication and the first placement attempt run on the
+    calling thread; retries are scheduled through `angelone_place_order.submit`,
+    so the caller is free while they back off.
+    
+    Args:
+        Same as place_angelone_order_standalone
+    
+    Returns:
+        Future: Resolves to a BrokerResponse (never to an exception)
+    """
+    response = Future()
     try:
         # Step 1: Validate order parameters
         is_valid, error_msg = validate_angelone_order_params(order_params)
         if not is_valid:
 
-            return BrokerResponse(
+            response.set_result(BrokerResponse(
                 success=False,
                 message=f"Validation error: {error_msg}",
                 broker=BrokerType.ANGEL_ONE.value
+            ))
+            return response
+
+        if paper:
+            fill = paper_fill_model.fill(
+                transaction_type=order_params['transactiontype'],
+                quantity=int(order_params['quantity']),
+                symbol=order_params['tradingsymbol'],
+                token=order_params['symboltoken'],
             )
+            response.set_result(BrokerResponse(
+                success=True,
+                message="Paper order filled",
+                data={"status": True, "message": "SUCCESS", "data": {"orderid": fill['data']['orderId'], **fill['data']}},
+                broker=BrokerType.ANGEL_ONE.value
+            ))
+            return response
         
         # Step 2: Authenticate with Angel One
 
         auth_response = angelone_get_auth(api_key, username, pwd, token)
         
-        # Step 3: Place the order
+        # Step 3: Place the order; retries continue on the dispatcher timer
 
-        result = angelone_place_order(
+        placed = angelone_place_order.submit(
             smart_api_obj=auth_response.smart_api_obj,
             order_details=order_params
         )
-        
-        # Step 4: Process response
+
+    except Exception as e:
+        response.set_result(_angelone_error_response(e))
+        return response
+
+    # Step 4: Process response
+    def on_placed(placed: Future):
+        try:
+            result = placed.result()
+        except Exception as e:
+            response.set_result(_angelone_error_response(e))
+            return
+
         if result and result.get('status'):
 
-            return BrokerResponse(
+            response.set_result(BrokerResponse(
                 success=True,
                 message="Order placed successfully",
                 data=result,
                 broker=BrokerType.ANGEL_ONE.value
-            )
+            ))
         else:
 
-            return BrokerResponse(
+            response.set_result(BrokerResponse(
                 success=False,
                 message=result.get('message', 'Order placement failed'),
                 data=result,
                 broker=BrokerType.ANGEL_ONE.value
-            )
-    
-    except ValidationError as e:
-
-        return BrokerResponse(
-            success=False,
-            message=f"Validation error: {str(e)}",
-            broker=BrokerType.ANGEL_ONE.value
-        )
-    
-    except AuthenticationError as e:
-
-        return BrokerResponse(
-            success=False,
-            message=f"Authentication failed: {str(e)}",
-            broker=BrokerType.ANGEL_ONE.value
-        )
-    
-    except OrderPlacementError as e:
-
-        return BrokerResponse(
-            success=False,
-            message=f"Order placement failed: {str(e)}",
-            broker=BrokerType.ANGEL_ONE.value
-        )
-    
-    except Exception as e:
-
-        return BrokerResponse(
-            success=False,
-            message=f"Unexpected error: {str(e)}",
-            broker=BrokerType.ANGEL_ONE.value
-        )
+            ))
+
+    placed.add_done_callback(on_placed)
+    return response
+
+
+def _angelone_error_response(e: Exception) -> BrokerResponse:
+    """Failed BrokerResponse for an exception raised while placing an Angel One order"""
+    if isinstance(e, ValidationError):
+        message = f"Validation error: {str(e)}"
+    elif isinstance(e, PaperFillError):
+        message = f"Paper order not filled: {str(e)}"
+    elif isinstance(e, AuthenticationError):
+        message = f"Authentication failed: {str(e)}"
+    elif isinstance(e, OrderPlacementError):
+        message = f"Order placement failed: {str(e)}"
+    else:
+        message = f"Unexpected error: {str(e)}"
+    return BrokerResponse(
+        success=False,
+        message=message,
+        broker=BrokerType.ANGEL_ONE.value
+    )
 
 
 # ==================== DHAN FUNCTIONS ====================
@@ -426,7 +504,8 @@ def dhan_place_order(dhan_client: dhanhq, order_params: dict) -> dict:
     try:
 
         
-        result = dhan_client.place_order(
+        result = broker_breakers.call(
+            "dhan", "place_order", dhan_client.place_order,
             security_id=order_params['security_id'],
             exchange_segment=order_params['exchange_segment'],
             transaction_type=order_params['transaction_type'],
@@ -439,6 +518,8 @@ def dhan_place_order(dhan_client: dhanhq, order_params: dict) -> dict:
 
         return result
         
+    except CircuitOpenError:
+        raise
     except Exception as e:
 
         raise OrderPlacementError(f"Dhan order placement failed: {str(e)}") from e
@@ -447,7 +528,8 @@ def dhan_place_order(dhan_client: dhanhq, order_params: dict) -> dict:
 def place_dhan_order_standalone(
     client_id: str,
     access_token: str,
-    order_params: dict
+    order_params: dict,
+    paper: bool = False
 ) -> BrokerResponse:
     """
     Standalone function to place an order in Dhan account.
@@ -471,6 +553,7 @@ def place_dhan_order_standalone(
                 * "BO" - Bracket Order
             - quantity (int): Number of shares/lots
             - price (float): Order price (use 0 for MARKET orders)
+        paper (bool): Simulate the fill at the latest LTP instead of calling Dhan
     
     Returns:
         BrokerResponse: Standardized response object
@@ -506,10 +589,25 @@ def place_dhan_order_standalone(
                 message=f"Validation error: {error_msg}",
                 broker=BrokerType.DHAN.value
             )
+
+        if paper:
+            return BrokerResponse(
+                success=True,
+                message="Paper order filled",
+                data=paper_fill_model.fill(
+                    transaction_type=order_params['transaction_type'],
+                    quantity=int(order_params['quantity']),
+                    token=order_params['security_id'],
+                ),
+                broker=BrokerType.DHAN.value
+            )
         
         # Step 2: Initialize Dhan client
 
-        dhan_client = dhanhq(client_id=client_id, access_token=access_token)
+        if BROKER_SIMULATOR_URL:
+            dhan_client = SimulatedDhan(client_id=client_id, access_token=access_token)
+        else:
+            dhan_client = dhanhq(client_id=client_id, access_token=access_token)
         
         # Step 3: Place the order
 
@@ -540,6 +638,14 @@ def place_dhan_order_standalone(
             message=f"Validation error: {str(e)}",
             broker=BrokerType.DHAN.value
         )
+
+    except PaperFillError as e:
+
+        return BrokerResponse(
+            success=False,
+            message=f"Paper order not filled: {str(e)}",
+            broker=BrokerType.DHAN.value
+        )
     
     except OrderPlacementError as e:
 
@@ -0,0 +1,188 @@
+"""
+Per-user cache of ready-to-use broker clients
+Keeps dhanhq clients and logged-in SmartConnect sessions out of the
+signal-to-order path; entries are dropped when credentials change and
+rebuilt when they expire or the broker rejects the token
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.constants.const import DHAN_SESSION_TTL_S, ANGELONE_SESSION_TTL_S, BROKER_SIMULATOR_URL
+from app.services.broker_simulator import SimulatedDhan
+
+logger = logging.getLogger(__name__)
+
+# Substrings of broker error payloads that mean the token/session is no longer valid
+AUTH_ERROR_MARKERS = (
+    "DH-901",            # Dhan: client ID or access token invalid/expired
+    "AG8001",            # AngelOne: invalid token
+    "AG8002",            # AngelOne: token expired
+    "AG8003",            # AngelOne: token missing
+    "invalid token",
+    "token expired",
+    "access token",
+)
+
+
+@dataclass
+class BrokerSession:
+    """A cached, authenticated broker client for one user"""
+    user_id: int
+    broker: str
+    client_id: str
+    client: Any
+    created_at: float = field(default_factory=time.time)
+    expires_at: float = 0.0
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+
+def is_auth_failure(response: Any) -> bool:
+    """True if a broker response or exception says the session/token is no longer valid"""
+    text = str(response).lower()
+    return any(marker.lower() in text for marker in AUTH_ERROR_MARKERS)
+
+
+class BrokerSessionCache:
+    """Thread-safe (user_id, broker) -> BrokerSession map"""
+
+    def __init__(self):
+        self._sessions: Dict[tuple, BrokerSession] = {}
+        self._lock = threading.Lock()
+        # One lock per key so concurrent signals for a user log in only once
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+
+    def _key_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _cached(self, key: tuple) -> Optional[BrokerSession]:
+        session = self._sessions.get(key)
+        if session is not None and not session.expired:
+            return session
+        return None
+
+    def get_dhan(self, user_id: int, db: Session) -> Optional[BrokerSession]:
+        """
+        Cached dhanhq client for a user, built from active DhanCredentials on a miss
+
+        Args:
+            user_id: Trader id
+            db: Database session used on a miss
+
+        Returns:
+            BrokerSession, or None if the user has no active Dhan credentials
+        """
+        key = (user_id, "dhan")
+        session = self._cached(key)
+        if session is not None:
+            return session
+
+        with self._key_lock(key):
+            session = self._cached(key)
+            if session is not None:
+                return session
+
+            from dhanhq import dhanhq, DhanContext
+            from app.services.order_service_utils import get_dhan_credentials
+
+            creds = get_dhan_credentials(trader_id=user_id, db=db)
+            if not creds:
+                return None
+
+            if BROKER_SIMULATOR_URL:
+                client = SimulatedDhan(client_id=creds.client_id, access_token=creds.access_token)
+            else:
+                client = dhanhq(DhanContext(client_id=creds.client_id, access_token=creds.access_token))
+            session = BrokerSession(
+                user_id=user_id,
+                broker="dhan",
+                client_id=creds.client_id,
+                client=client,
+                expires_at=time.time() + DHAN_SESSION_TTL_S,
+            )
+            with self._lock:
+                self._sessions[key] = session
+            return session
+
+    def get_angelone(self, user_id: int, db: Session) -> Optional[BrokerSession]:
+        """
+        Cached, logged-in SmartConnect for a user; logs in with TOTP on a miss
+
+        Args:
+            user_id: Trader id
+            db: Database session used on a miss
+
+        Returns:
+            BrokerSession, or None if the user has no active AngelOne credentials
+
+        Raises:
+            Exception: If the AngelOne login fails
+        """
+        key = (user_id, "angelone")
+        session = self._cached(key)
+        if session is not None:
+            return session
+
+        with self._key_lock(key):
+            session = self._cached(key)
+            if session is not None:
+                return session
+
+            from app.services.order_service_utils import get_angelone_credentials, smartapi_login
+
+            creds = get_angelone_credentials(trader_id=user_id, db=db)
+            if not creds:
+                return None
+
+            smart_api = smartapi_login(
+                api_key=creds["api_key"],
+                username=creds["username"],
+                password=creds["password"],
+                totp_token=creds["access_token"],
+            )
+            session = BrokerSession(
+                user_id=user_id,
+                broker="angelone",
+                client_id=creds["username"],
+                client=smart_api,
+                expires_at=time.time() + ANGELONE_SESSION_TTL_S,
+            )
+            with self._lock:
+                self._sessions[key] = session
+            logger.info(f"AngelOne session cached for user {user_id}")
+            return session
+
+    def invalidate(self, user_id: int, broker: Optional[str] = None):
+        """Drop a user's cached sessions (one broker, or all)"""
+        with self._lock:
+            for key in list(self._sessions):
+                if key[0] == user_id and (broker is None or key[1] == broker):
+                    del self._sessions[key]
+
+    def clear(self):
+        with self._lock:
+            self._sessions = {}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "sessions": len(sessions),
+            "expired": sum(1 for s in sessions if s.expired),
+            "by_broker": {
+                broker: sum(1 for s in sessions if s.broker == broker)
+                for broker in {s.broker for s in sessions}
+            },
+        }
+
+
+broker_session_cache = BrokerSessionCache()
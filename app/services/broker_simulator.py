@@ -0,0 +1,117 @@
+"""
+Clients for the local broker simulator (broker_simulator_server.py)
+Drop-in stand-ins for the parts of dhanhq and SmartConnect the order paths
+use; selected everywhere a broker client is built when BROKER_SIMULATOR_URL
+is set, so fanout can be load-tested without real broker accounts
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.constants.const import BROKER_SIMULATOR_URL
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+
+def _http() -> httpx.Client:
+    """One pooled HTTP client shared by every simulated broker session"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    base_url=BROKER_SIMULATOR_URL,
+                    timeout=30.0,
+                    limits=httpx.Limits(max_connections=256, max_keepalive_connections=256),
+                )
+    return _client
+
+
+class SimulatedDhan:
+    """Mimics the dhanhq client methods used by the order paths"""
+
+    NSE_FNO = "NSE_FNO"
+    BSE_FNO = "BSE_FNO"
+    NSE = "NSE_EQ"
+    BUY = "BUY"
+    SELL = "SELL"
+    MARKET = "MARKET"
+    LIMIT = "LIMIT"
+    INTRA = "INTRADAY"
+    CNC = "CNC"
+
+    def __init__(self, client_id: str, access_token: str):
+        self.client_id = client_id
+        self.access_token = access_token
+
+    def _request(self, method: str, path: str, json: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # dhanhq returns failures as a payload rather than raising
+        try:
+            response = _http().request(
+                method, f"/dhan{path}", json=json,
+                headers={"client-id": self.client_id, "access-token": self.access_token},
+            )
+            return response.json()
+        except Exception as e:
+            return {"status": "failure", "remarks": str(e), "data": ""}
+
+    def place_order(self, security_id, exchange_segment, transaction_type, quantity, order_type,
+                    product_type, price, **kwargs) -> Dict[str, Any]:
+        return self._request("POST", "/orders", {
+            "securityId": str(security_id),
+            "exchangeSegment": exchange_segment,
+            "transactionType": transaction_type,
+            "quantity": quantity,
+            "orderType": order_type,
+            "productType": product_type,
+            "price": price,
+        })
+
+    def get_order_by_id(self, order_id) -> Dict[str, Any]:
+        return self._request("GET", f"/orders/{order_id}")
+
+    def get_order_list(self) -> Dict[str, Any]:
+        return self._request("GET", "/orders")
+
+    def get_fund_limits(self) -> Dict[str, Any]:
+        return self._request("GET", "/fundlimit")
+
+
+class SimulatedSmartConnect:
+    """Mimics the SmartConnect methods used by the order paths"""
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self.jwt_token: Optional[str] = None
+
+    def _request(self, path: str, json: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        headers = {"X-PrivateKey": self.api_key}
+        if self.jwt_token:
+            headers["Authorization"] = f"Bearer {self.jwt_token}"
+        if json is None:
+            response = _http().get(f"/angelone{path}", headers=headers)
+        else:
+            response = _http().post(f"/angelone{path}", json=json, headers=headers)
+        payload = response.json()
+        if not payload.get("status"):
+            # SmartApi raises on error payloads
+            raise Exception(f"{payload.get('errorcode')}: {payload.get('message')}")
+        return payload
+
+    def generateSession(self, clientCode: str, password: str, totp: str) -> Dict[str, Any]:
+        payload = self._request("/login", {"clientcode": clientCode, "password": password, "totp": totp})
+        self.jwt_token = payload["data"]["jwtToken"]
+        return payload
+
+    def getProfile(self, refreshToken: str) -> Dict[str, Any]:
+        return {"status": True, "message": "SUCCESS", "errorcode": "", "data": {"clientcode": "SIMULATED"}}
+
+    def placeOrder(self, orderparams: Dict[str, Any]) -> str:
+        """Returns the order id, like SmartConnect.placeOrder"""
+        return self._request("/orders", orderparams)["data"]["orderid"]
+
+    def orderBook(self) -> Dict[str, Any]:
+        return self._request("/orders")
@@ -0,0 +1,232 @@
+"""
+Circuit breakers for broker API calls
+One breaker per (broker, endpoint): once enough recent calls fail it opens
+and calls fail fast without touching the broker; after a cool-off a few probe
+calls are let through and their outcome decides whether it closes again
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from app.constants.broker_constants import CircuitBreakerConfig
+
+logger = logging.getLogger(__name__)
+
+# Substrings of broker error payloads that mean the broker itself is failing,
+# as opposed to one account's order being rejected
+BROKER_FAULT_MARKERS = (
+    "DH-904",            # Dhan: rate limit
+    "DH-908",            # Dhan: internal server error
+    "DH-909",            # Dhan: network error
+    "AB1004",            # AngelOne: something went wrong
+    "AB2001",            # AngelOne: internal error
+    "timed out",
+    "timeout",
+    "connection",
+    "502",
+    "503",
+    "504",
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a broker endpoint whose breaker is open"""
+    pass
+
+
+def _has_fault_marker(text: str) -> bool:
+    text = text.lower()
+    return any(marker.lower() in text for marker in BROKER_FAULT_MARKERS)
+
+
+def is_broker_fault(outcome: Any) -> bool:
+    """
+    True if an exception or broker response counts against the breaker
+
+    Only broker-side faults count: errors specific to one account (bad TOTP,
+    expired token, validation, a rejected order) must not open the shared
+    breaker for every other trader on the broker.
+    """
+    if isinstance(outcome, (TimeoutError, ConnectionError)):
+        return True
+    if isinstance(outcome, Exception):
+        return _has_fault_marker(f"{type(outcome).__name__}: {outcome}")
+    if isinstance(outcome, dict) and str(outcome.get("status", "")).lower() in ("failure", "false"):
+        return _has_fault_marker(str(outcome))
+    return False
+
+
+class CircuitBreaker:
+    """Failure-rate breaker over a sliding time window: CLOSED -> OPEN -> HALF_OPEN -> CLOSED"""
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = CircuitBreakerConfig.FAILURE_RATE_THRESHOLD,
+        min_calls: int = CircuitBreakerConfig.MIN_CALLS,
+        window_s: float = CircuitBreakerConfig.WINDOW_SECONDS,
+        open_s: float = CircuitBreakerConfig.OPEN_SECONDS,
+        half_open_probes: int = CircuitBreakerConfig.HALF_OPEN_PROBES,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_s = window_s
+        self.open_s = open_s
+        self.half_open_probes = half_open_probes
+
+        self.state = self.CLOSED
+        self._calls: Deque[Tuple[float, bool]] = deque()  # (monotonic time, ok)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_failure: Optional[str] = None
+
+    def _trim(self, now: float):
+        while self._calls and self._calls[0][0] < now - self.window_s:
+            _, ok = self._calls.popleft()
+            if not ok:
+                self._failures -= 1
+
+    def _open(self, now: float):
+        self.state = self.OPEN
+        self._opened_at = now
+        self.times_opened += 1
+        logger.warning(f"Circuit breaker {self.name} opened: {self.last_failure}")
+
+    def allow(self) -> bool:
+        """Whether a call may go to the broker now; counts as a probe while half-open"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.OPEN and now >= self._opened_at + self.open_s:
+                self.state = self.HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+            if self.state == self.OPEN:
+                self.rejected += 1
+                return False
+            if self.state == self.HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self.rejected += 1
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def record(self, ok: bool, error: Optional[str] = None):
+        """Outcome of a call that allow() let through"""
+        now = time.monotonic()
+        with self._lock:
+            if not ok:
+                self.last_failure = error
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not ok:
+                    self._open(now)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self.state = self.CLOSED
+                    self._calls.clear()
+                    self._failures = 0
+                    logger.warning(f"Circuit breaker {self.name} closed")
+                return
+
+            self._calls.append((now, ok))
+            if not ok:
+                self._failures += 1
+            self._trim(now)
+            if (self.state == self.CLOSED and len(self._calls) >= self.min_calls
+                    and self._failures / len(self._calls) >= self.failure_rate):
+                self._open(now)
+
+    def call(self, fn: Callable, *args, is_failure: Callable[[Any], bool] = is_broker_fault, **kwargs) -> Any:
+        """
+        Call `fn` through the breaker
+
+        Raises:
+            CircuitOpenError: If the breaker is open (fn is not called)
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record(not is_failure(e), str(e))
+            raise
+        failed = is_failure(result)
+        self.record(not failed, str(result) if failed else None)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._calls.clear()
+            self._failures = 0
+            self._probes_in_flight = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            calls = len(self._calls)
+            return {
+                "state": self.state,
+                "recent_calls": calls,
+                "recent_failures": self._failures,
+                "failure_rate": round(self._failures / calls, 3) if calls else 0.0,
+                "open_for_s": round(max(0.0, self._opened_at + self.open_s - now), 3) if self.state == self.OPEN else 0.0,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+                "last_failure": self.last_failure,
+            }
+
+
+class BrokerBreakerRegistry:
+    """Lazily created breaker per (broker, endpoint)"""
+
+    def __init__(self):
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, broker: str, endpoint: str) -> CircuitBreaker:
+        key = (broker, endpoint)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(key, CircuitBreaker(f"{broker}:{endpoint}"))
+        return breaker
+
+    def call(self, broker: str, endpoint: str, fn: Callable, *args, **kwargs) -> Any:
+        """Call `fn` through the (broker, endpoint) breaker"""
+        return self.get(broker, endpoint).call(fn, *args, **kwargs)
+
+    def reset(self, broker: Optional[str] = None):
+        """Close every breaker, or one broker's"""
+        with self._lock:
+            breakers = [b for (name, _), b in self._breakers.items() if broker is None or name == broker]
+        for breaker in breakers:
+            breaker.reset()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        snapshot: Dict[str, Dict[str, Any]] = {}
+        for (broker, endpoint), breaker in sorted(breakers.items()):
+            snapshot.setdefault(broker, {})[endpoint] = breaker.snapshot()
+        return snapshot
+
+
+broker_breakers = BrokerBreakerRegistry()
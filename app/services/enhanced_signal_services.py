@@ -13,6 +13,9 @@ from app.models.models import (
     SignalLog, User, Position, Order, Trade, SymbolMaster,
     PositionStatus, OrderStatus, OrderType, UserRole
 )
+from app.services.symbol_cache import symbol_master_cache, SymbolInfo
+from app.services.strategy_subscriptions import strategy_subscription_index
+from app.constants.const import STRATEGY_SUBSCRIPTIONS_ENABLED
 
 
 class EnhancedSignalService:
@@ -42,22 +45,19 @@ class EnhancedSignalService:
             User.kyc_verified == True
         )
         
-        # TODO: Add strategy subscription filter if needed
-        # if strategy_code:
-        #     query = query.join(UserStrategySubscription).filter(
-        #         UserStrategySubscription.strategy_code == strategy_code
-        #     )
+        # Only the strategy's subscribers, resolved from the in-memory index
+        if strategy_code and STRATEGY_SUBSCRIPTIONS_ENABLED:
+            subscribers = strategy_subscription_index.subscribers(strategy_code)
+            if not subscribers:
+                return []
+            query = query.filter(User.id.in_(list(subscribers)))
         
         return query.all()
     
     @staticmethod
-    def _get_symbol_details(db: Session, token: str) -> Optional[SymbolMaster]:
-        """Get symbol details from token"""
-        return db.query(SymbolMaster).filter(
-            SymbolMaster.token == token,
-            SymbolMaster.is_active == True,
-            SymbolMaster.is_deleted == False
-        ).first()
+    def _get_symbol_details(db: Session, token: str) -> Optional[SymbolInfo]:
+        """Get symbol details from token (served from the in-process SymbolMaster cache)"""
+        return symbol_master_cache.get_active(token, db)
     
     @staticmethod
     def _get_strike_symbol_details(db: Session, strike_token: str) -> Optional[SymbolMaster]:
@@ -204,6 +204,10 @@ class EnhancedSignalService:
             
             # 3. Get active traders
             traders = EnhancedSignalService._get_active_traders(db, signal_data.strategy_code)
+            multipliers = (
+                strategy_subscription_index.subscribers(signal_data.strategy_code)
+                if STRATEGY_SUBSCRIPTIONS_ENABLED else {}
+            )
             
             # 4. Process for each trader
             trader_results = []
@@ -213,6 +217,7 @@ class EnhancedSignalService:
                 try:
                     # Get quantity for this trader
                     qty = EnhancedSignalService._get_default_qty(trader.id, db)
+                    qty *= multipliers.get(trader.id, 1)
                     
                     # Create position
                     position = EnhancedSignalService._create_position(
@@ -0,0 +1,65 @@
+"""
+Event-driven fill price resolution for entry and exit orders
+Uses the broker's fill price when it has one, otherwise the first tick of
+the strike at or after the order time, without parking a thread to wait
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Optional
+
+from app.constants.const import FILL_PRICE_TIMEOUT_S
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.ltp_store import latest_ltp_store
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_fill_price(
+    symbol: str,
+    order_time: datetime,
+    on_resolved: Callable[[Optional[float], str], None],
+    broker_price: Optional[float] = None,
+    timeout: float = FILL_PRICE_TIMEOUT_S,
+):
+    """
+    Call `on_resolved(price, source)` exactly once, on a dispatch worker
+
+    Sources, in order of preference:
+        "broker":  the broker's reported fill price
+        "tick":    the first tick of `symbol` at or after `order_time`
+        "timeout": no tick within `timeout` seconds; price is None and the
+                   caller falls back to the latest known LTP
+
+    Args:
+        symbol: Strike trading symbol
+        order_time: When the order was sent (IST)
+        on_resolved: Callback receiving (price, source)
+        broker_price: Fill price from the broker response, if any
+        timeout: Seconds to wait for a tick
+    """
+    if broker_price:
+        broker_dispatcher.submit(on_resolved, float(broker_price), "broker")
+        return
+
+    lock = threading.Lock()
+    state = {"resolved": False}
+
+    def resolve(price: Optional[float], source: str):
+        with lock:
+            if state["resolved"]:
+                return
+            state["resolved"] = True
+        broker_dispatcher.submit(on_resolved, price, source)
+
+    # Exchange tick times are whole seconds; don't skip the tick of the order's own second
+    after = order_time.replace(microsecond=0)
+    waiter = latest_ltp_store.when_tick(symbol, after, lambda entry: resolve(entry.ltp, "tick"))
+
+    def on_timeout():
+        if latest_ltp_store.cancel(waiter):
+            logger.warning(f"No tick for {symbol} within {timeout}s of the order; using latest LTP")
+            resolve(None, "timeout")
+
+    broker_dispatcher.submit_after(timeout, on_timeout)
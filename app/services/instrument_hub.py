@@ -0,0 +1,46 @@
+"""
+Wake-up hub for feed processes waiting on new StrikeInstrument rows
+The signal path notifies it right after inserting a strike; each connected
+instrument channel then reads unstarted rows and pushes them to its feed
+"""
+
+import asyncio
+import threading
+from typing import Optional, Set
+
+
+class InstrumentAssignmentHub:
+    """Fan-out of "new instruments available" notifications to channel waiters"""
+
+    def __init__(self):
+        self._waiters: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self) -> int:
+        return len(self._waiters)
+
+    def register(self) -> asyncio.Queue:
+        """Called by a channel on the event loop; returns its wake-up queue"""
+        waiter = asyncio.Queue()
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._waiters.add(waiter)
+        return waiter
+
+    def unregister(self, waiter: asyncio.Queue):
+        with self._lock:
+            self._waiters.discard(waiter)
+
+    def notify(self):
+        """Wake every channel; safe to call from the event loop or a worker thread"""
+        with self._lock:
+            loop, waiters = self._loop, list(self._waiters)
+        if loop is None or loop.is_closed():
+            return
+        for waiter in waiters:
+            loop.call_soon_threadsafe(waiter.put_nowait, None)
+
+
+instrument_hub = InstrumentAssignmentHub()
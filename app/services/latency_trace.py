@@ -0,0 +1,212 @@
+"""
+Per-stage latency tracing for signal processing
+Each signal carries a SignalTrace from receipt to the last trader's order
+write; stage rows are buffered in memory and bulk-inserted by a background
+thread so tracing stays off the order path
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.constants.const import LATENCY_TRACE_ENABLED, LATENCY_TRACE_FLUSH_S, LATENCY_TRACE_MAX_QUEUE
+from app.models.models import SignalLatencyTrace
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo("Asia/Kolkata")
+
+STAGES = (
+    "receipt",
+    "signal_log_commit",
+    "symbol_resolution",
+    "dispatch",
+    "credential_fetch",
+    "broker_call_start",
+    "broker_call_end",
+    "db_persist",
+)
+
+
+class LatencyTraceBuffer:
+    """Thread-safe write-behind queue of SignalLatencyTrace rows"""
+
+    def __init__(self, flush_interval: float = LATENCY_TRACE_FLUSH_S, max_queue: int = LATENCY_TRACE_MAX_QUEUE):
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        # Metrics
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+
+    def add(self, rows: List[Dict[str, Any]]):
+        with self._lock:
+            if len(self._rows) + len(rows) > self.max_queue:
+                self.dropped_rows += len(rows)
+                return
+            self._rows.extend(rows)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="latency-trace-flush", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> int:
+        """Insert everything queued in one statement; returns rows written"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+
+        from app.db.db import SessionLocal
+        db = SessionLocal()
+        try:
+            db.execute(insert(SignalLatencyTrace).values(rows))
+            db.commit()
+            self.flushed_rows += len(rows)
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            self.dropped_rows += len(rows)
+            logger.error(f"Failed to write {len(rows)} latency trace rows: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+    def stop(self):
+        """Stop the flusher and write out what is left"""
+        self._stop.set()
+        self.flush()
+
+
+latency_trace_buffer = LatencyTraceBuffer()
+
+
+class SignalTrace:
+    """
+    Stage timestamps for one signal
+
+    Signal-wide stages (user_id None) and each trader's stages form separate
+    lanes; a stage's duration is measured from the previous stage in its
+    lane, and a trader's lane starts from the last signal-wide stage. A
+    trader's per-broker stages (broker given) run in their own sub-lane so
+    concurrent broker calls don't skew each other; the trader's other stages
+    follow the latest of them and are tagged with every broker used.
+    """
+
+    def __init__(self, signal_category: str, received_at: Optional[float] = None):
+        self.signal_category = signal_category
+        self.signal_log_id: Optional[int] = None
+        # Wall clock anchored once, advanced with perf_counter for sub-microsecond steps
+        self._wall0 = time.time()
+        self._perf0 = time.perf_counter()
+        self.received_at = received_at if received_at is not None else self._wall0
+        self._last = self.received_at
+        self._lanes: Dict[int, Dict[Optional[str], float]] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls, signal_category: str) -> "SignalTrace":
+        """New trace with its receipt stage recorded"""
+        trace = cls(signal_category)
+        trace.mark("receipt")
+        return trace
+
+    def _now(self) -> float:
+        return self._wall0 + (time.perf_counter() - self._perf0)
+
+    def bind(self, signal_log_id: int):
+        """Attach the SignalLog id; stages recorded before this are written now"""
+        with self._lock:
+            self.signal_log_id = signal_log_id
+            pending, self._pending = self._pending, []
+            for row in pending:
+                row["signal_log_id"] = signal_log_id
+        if pending and LATENCY_TRACE_ENABLED:
+            latency_trace_buffer.add(pending)
+
+    def mark(self, stage: str, user_id: Optional[int] = None, broker: Optional[str] = None):
+        now = self._now()
+        with self._lock:
+            if user_id is None:
+                previous, self._last = self._last, now
+            else:
+                lanes = self._lanes.setdefault(user_id, {})
+                if broker is not None:
+                    previous = lanes.get(broker, lanes.get(None, self._last))
+                    lanes[broker] = now
+                else:
+                    previous = max(lanes.values(), default=self._last)
+                    broker = "+".join(sorted(b for b in lanes if b is not None)) or None
+                    lanes[None] = now
+            row = {
+                "signal_log_id": self.signal_log_id,
+                "signal_category": self.signal_category,
+                "user_id": user_id,
+                "broker": broker,
+                "stage": stage,
+                "recorded_at": datetime.fromtimestamp(now, IST),
+                "elapsed_ms": round((now - self.received_at) * 1000, 3),
+                "duration_ms": round((now - previous) * 1000, 3),
+            }
+            if self.signal_log_id is None:
+                self._pending.append(row)
+                return
+        if LATENCY_TRACE_ENABLED:
+            latency_trace_buffer.add([row])
+
+
+def trace_mark(trace: Optional[SignalTrace], stage: str, user_id: Optional[int] = None, broker: Optional[str] = None):
+    """SignalTrace.mark for code paths where tracing is optional"""
+    if trace is not None:
+        trace.mark(stage, user_id=user_id, broker=broker)
+
+
+def latency_percentiles(db: Session, window_minutes: int = 60,
+                        signal_category: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    p50/p95/p99 of each stage per broker over the last `window_minutes`
+
+    Args:
+        db: Database session
+        window_minutes: How far back to look
+        signal_category: Only ENTRY or EXIT signals, if given
+
+    Returns:
+        One row per (stage, broker), in pipeline order; `duration_*` is time
+        since the previous stage, `elapsed_*` time since receipt (ms)
+    """
+    since = datetime.now(IST) - timedelta(minutes=window_minutes)
+    broker = func.coalesce(SignalLatencyTrace.broker, "all").label("broker")
+
+    columns = [SignalLatencyTrace.stage, broker, func.count().label("count")]
+    for field in ("duration_ms", "elapsed_ms"):
+        column = getattr(SignalLatencyTrace, field)
+        for p in (50, 95, 99):
+            columns.append(func.percentile_cont(p / 100).within_group(column).label(f"{field[:-3]}_p{p}"))
+
+    query = db.query(*columns).filter(SignalLatencyTrace.recorded_at >= since)
+    if signal_category:
+        query = query.filter(SignalLatencyTrace.signal_category == signal_category.upper())
+    rows = query.group_by(SignalLatencyTrace.stage, broker).all()
+
+    order = {stage: i for i, stage in enumerate(STAGES)}
+    result = [
+        {key: (round(value, 3) if isinstance(value, float) else value) for key, value in row._mapping.items()}
+        for row in rows
+    ]
+    result.sort(key=lambda r: (order.get(r["stage"], len(STAGES)), r["broker"]))
+    return result
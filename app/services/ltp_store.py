@@ -0,0 +1,170 @@
+"""
+In-process latest-LTP store fed by tick ingestion
+Readers check it before falling back to strike_price_tick_data / spot_tick_data
+"""
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+IST = ZoneInfo("Asia/Kolkata")
+
+
+@dataclass(frozen=True)
+class LTPEntry:
+    """Latest traded price for one instrument"""
+    token: str
+    symbol: Optional[str]
+    ltp: float
+    timestamp: datetime
+
+    def to_dict(self) -> dict:
+        return {
+            "token": self.token,
+            "symbol": self.symbol,
+            "ltp": self.ltp,
+            "timestamp": self.timestamp.isoformat(),
+        }
+
+
+def _as_ist(timestamp: datetime) -> datetime:
+    return timestamp.replace(tzinfo=IST) if timestamp.tzinfo is None else timestamp
+
+
+class TickWaiter:
+    """A one-shot callback for the first tick of a symbol at or after a time"""
+
+    def __init__(self, symbol: str, after: datetime, callback: Callable[[LTPEntry], None]):
+        self.symbol = symbol
+        self.after = _as_ist(after)
+        self.callback = callback
+        self.done = False
+
+    def matches(self, entry: LTPEntry) -> bool:
+        return _as_ist(entry.timestamp) >= self.after
+
+
+class LatestLTPStore:
+    """Thread-safe latest-price map keyed by token and by symbol"""
+
+    def __init__(self):
+        self._by_token: Dict[str, LTPEntry] = {}
+        self._by_symbol: Dict[str, LTPEntry] = {}
+        self._waiters: Dict[str, List[TickWaiter]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, token: str, ltp: float, symbol: Optional[str] = None, timestamp: Optional[datetime] = None) -> LTPEntry:
+        """
+        Record a tick; ticks older than the stored one for the token are ignored
+
+        Args:
+            token: Instrument token
+            ltp: Last traded price
+            symbol: Trading symbol, if known
+            timestamp: Tick time (defaults to now, IST)
+
+        Returns:
+            The entry now stored for the token
+        """
+        entry = LTPEntry(
+            token=str(token),
+            symbol=symbol,
+            ltp=float(ltp),
+            timestamp=_as_ist(timestamp) if timestamp else datetime.now(IST),
+        )
+
+        fired: List[TickWaiter] = []
+        with self._lock:
+            current = self._by_token.get(entry.token)
+            if current is not None and current.timestamp > entry.timestamp:
+                return current
+
+            if entry.symbol is None and current is not None:
+                entry = LTPEntry(entry.token, current.symbol, entry.ltp, entry.timestamp)
+
+            self._by_token[entry.token] = entry
+            if entry.symbol:
+                self._by_symbol[entry.symbol] = entry
+
+                waiters = self._waiters.get(entry.symbol)
+                if waiters:
+                    fired = [w for w in waiters if w.matches(entry)]
+                    remaining = [w for w in waiters if not w.matches(entry)]
+                    if remaining:
+                        self._waiters[entry.symbol] = remaining
+                    else:
+                        del self._waiters[entry.symbol]
+                    for waiter in fired:
+                        waiter.done = True
+
+        # Callbacks run on the ingest path, outside the lock; they must not block
+        for waiter in fired:
+            waiter.callback(entry)
+
+        return entry
+
+    def when_tick(self, symbol: str, after: datetime, callback: Callable[[LTPEntry], None]) -> TickWaiter:
+        """
+        Call `callback(entry)` once with the first tick of `symbol` stamped at or
+        after `after`; immediately if the stored tick already qualifies
+
+        Returns:
+            The waiter, which can be passed to cancel()
+        """
+        waiter = TickWaiter(symbol, after, callback)
+        with self._lock:
+            current = self._by_symbol.get(symbol)
+            if current is not None and waiter.matches(current):
+                waiter.done = True
+            else:
+                self._waiters.setdefault(symbol, []).append(waiter)
+
+        if waiter.done:
+            callback(current)
+        return waiter
+
+    def cancel(self, waiter: TickWaiter) -> bool:
+        """Withdraw a waiter; False if it already fired"""
+        with self._lock:
+            if waiter.done:
+                return False
+            waiter.done = True
+            waiters = self._waiters.get(waiter.symbol, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[waiter.symbol]
+            return True
+
+    def get_by_token(self, token: str) -> Optional[LTPEntry]:
+        return self._by_token.get(str(token))
+
+    def get_by_symbol(self, symbol: str) -> Optional[LTPEntry]:
+        return self._by_symbol.get(symbol)
+
+    def get_ltp(self, token: str) -> Optional[float]:
+        entry = self._by_token.get(str(token))
+        return entry.ltp if entry else None
+
+    def get_ltp_by_symbol(self, symbol: str) -> Optional[float]:
+        entry = self._by_symbol.get(symbol)
+        return entry.ltp if entry else None
+
+    def get(self, token: str, default=None):
+        """dict-style access to the LTP value, kept for app.state.ltp readers"""
+        ltp = self.get_ltp(token)
+        return default if ltp is None else ltp
+
+    def snapshot(self) -> List[dict]:
+        return [entry.to_dict() for entry in list(self._by_token.values())]
+
+    def clear(self):
+        with self._lock:
+            self._by_token = {}
+            self._by_symbol = {}
+            self._waiters = {}
+
+
+latest_ltp_store = LatestLTPStore()
@@ -67,7 +67,7 @@ def start_ltp_websocket(token: str, app, callback=None):
 
 async def get_ltp(app, token: str):
     """
-    Safely read LTP from app.state
+    Safely read LTP from the in-process latest-LTP store (app.state.ltp)
     """
     ltp = app.state.ltp.get(token)
     return ltp  # returns None if not found
@@ -0,0 +1,254 @@
+"""
+Per-signal batch of fanout order writes
+Each trader's resolved fill is collected here and the whole signal is
+persisted in one transaction: a bulk INSERT for entries, one set-based
+UPDATE ... FROM (VALUES ...) for exits
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import DateTime, Integer, Numeric, column, insert, update, values
+
+from app.constants.const import ORDER_BATCH_FLUSH_TIMEOUT_S
+from app.models.models import Order
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.latency_trace import SignalTrace, trace_mark
+
+logger = logging.getLogger(__name__)
+
+
+class OrderBatch:
+    """
+    Collects one signal's per-trader order writes
+
+    Every trader in `trader_ids` must either add a row or be skipped; the
+    batch flushes as soon as none are outstanding, or after `flush_timeout`
+    for stragglers. Rows arriving after that deadline are flushed on arrival.
+    The batch is complete once no trader is outstanding and every row has
+    been written (or a write failed); `wait_complete` blocks until then and
+    `when_complete` runs a callback then.
+    """
+
+    ENTRY = "ENTRY"
+    EXIT = "EXIT"
+
+    # Entry batches of this process not yet complete, so an exit can wait for the rows it closes
+    _pending_entries: Dict[int, "OrderBatch"] = {}
+    _pending_lock = threading.Lock()
+
+    def __init__(self, signal_log_id: int, kind: str, trader_ids: Iterable[int],
+                 flush_timeout: float = ORDER_BATCH_FLUSH_TIMEOUT_S, trace: Optional[SignalTrace] = None):
+        self.signal_log_id = signal_log_id
+        self.kind = kind
+        self.trace = trace
+        self._outstanding: Set[int] = set(trader_ids)
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._deadline_passed = False
+        self._writing = 0
+        self._complete = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self.error: Optional[Exception] = None
+
+        if self._outstanding:
+            if kind == self.ENTRY:
+                with OrderBatch._pending_lock:
+                    OrderBatch._pending_entries[signal_log_id] = self
+            broker_dispatcher.submit_after(flush_timeout, self._on_deadline)
+        else:
+            self._complete.set()
+
+    @classmethod
+    def entry_pending(cls, signal_log_id: int) -> bool:
+        """Whether this process is still writing the entry signal's order rows"""
+        with cls._pending_lock:
+            return signal_log_id in cls._pending_entries
+
+    @classmethod
+    def after_entry(cls, signal_log_id: int, fn: Callable[[], None]):
+        """
+        Run `fn` once the entry signal's order rows are written
+
+        Runs it at once on the calling thread when this process has no
+        incomplete batch for the entry, else on a dispatch worker later.
+        """
+        with cls._pending_lock:
+            batch = cls._pending_entries.get(signal_log_id)
+        if batch is None:
+            fn()
+        else:
+            batch.when_complete(fn)
+
+    def add_entry(self, trader_id: int, strike_data, strategy_id: int = 1,
+                  entry_price: Optional[float] = None, entry_time: Optional[datetime] = None):
+        self._add(trader_id, {
+            "strategy_id": strategy_id,
+            "user_id": trader_id,
+            "signal_log_id": self.signal_log_id,
+            "symbol": strike_data.symbol,
+            "option_type": strike_data.position,
+            "qty": strike_data.lot_qty,
+            "entry_price": entry_price,
+            "status": "OPEN",
+            "entry_time": entry_time or datetime.now(ZoneInfo("Asia/Kolkata")),
+            "is_deleted": False,
+        })
+
+    def add_exit(self, trader_id: int, symbol: str,
+                 exit_price: Optional[float] = None, exit_time: Optional[datetime] = None):
+        self._add(trader_id, {
+            "user_id": trader_id,
+            "symbol": symbol,
+            "exit_price": exit_price,
+            "exit_time": exit_time or datetime.now(ZoneInfo("Asia/Kolkata")),
+        })
+
+    def skip(self, trader_id: int):
+        """The trader will not produce a row for this signal"""
+        with self._lock:
+            self._outstanding.discard(trader_id)
+            ready = not self._outstanding
+        if ready:
+            self.flush()
+
+    def when_complete(self, fn: Callable[[], None]):
+        """Run `fn` on a dispatch worker once the batch is complete (now, if it already is)"""
+        with self._lock:
+            if not self._complete.is_set():
+                self._callbacks.append(fn)
+                return
+        broker_dispatcher.submit(fn)
+
+    def _add(self, trader_id: int, row: Dict[str, Any]):
+        with self._lock:
+            self._rows.append(row)
+            self._outstanding.discard(trader_id)
+            ready = not self._outstanding or self._deadline_passed
+        if ready:
+            self.flush()
+
+    def _on_deadline(self):
+        with self._lock:
+            self._deadline_passed = True
+            outstanding = len(self._outstanding)
+        if outstanding:
+            logger.warning(
+                f"{self.kind} batch for signal {self.signal_log_id}: flushing with "
+                f"{outstanding} traders still pending"
+            )
+        self.flush()
+
+    def wait_complete(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every trader's row is written or skipped
+
+        Args:
+            timeout: Seconds to wait; None waits indefinitely
+
+        Returns:
+            True if the batch completed and every write succeeded
+        """
+        return self._complete.wait(timeout) and self.error is None
+
+    def _check_complete(self) -> bool:
+        """Called with the lock held; True only for the call that completes the batch"""
+        if self._complete.is_set() or self._outstanding or self._rows or self._writing:
+            return False
+        self._complete.set()
+        return True
+
+    def _on_complete(self):
+        if self.kind == self.ENTRY:
+            with OrderBatch._pending_lock:
+                if OrderBatch._pending_entries.get(self.signal_log_id) is self:
+                    del OrderBatch._pending_entries[self.signal_log_id]
+        with self._lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            broker_dispatcher.submit(fn)
+
+    def flush(self) -> int:
+        """Write everything collected so far in one transaction; returns rows written"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                completed = self._check_complete()
+            else:
+                self._writing += 1
+        if not rows:
+            if completed:
+                self._on_complete()
+            return 0
+
+        from app.db.db import SessionLocal
+        db = SessionLocal()
+        try:
+            if self.kind == self.ENTRY:
+                written = self._insert_entries(db, rows)
+            else:
+                written = self._update_exits(db, rows)
+            db.commit()
+            for row in rows:
+                trace_mark(self.trace, "db_persist", user_id=row["user_id"])
+            logger.info(f"{self.kind} batch for signal {self.signal_log_id}: {written} orders written")
+            return written
+        except Exception as e:
+            db.rollback()
+            logger.error(f"{self.kind} batch for signal {self.signal_log_id} failed: {str(e)}")
+            self.error = e
+            raise
+        finally:
+            db.close()
+            with self._lock:
+                self._writing -= 1
+                completed = self._check_complete()
+            if completed:
+                self._on_complete()
+
+    @staticmethod
+    def _fill_missing_prices(db, rows: List[Dict[str, Any]], price_key: str):
+        """Rows whose fill timed out take the symbol's latest LTP, looked up once per symbol"""
+        from app.services.order_service_utils import get_latest_ltp
+
+        latest: Dict[str, Any] = {}
+        for row in rows:
+            if row[price_key] is None:
+                if row["symbol"] not in latest:
+                    latest[row["symbol"]] = get_latest_ltp(row["symbol"], db)
+                row[price_key] = latest[row["symbol"]]
+            row[price_key] = float(row[price_key]) if row[price_key] is not None else 0.0
+
+    def _insert_entries(self, db, rows: List[Dict[str, Any]]) -> int:
+        self._fill_missing_prices(db, rows, "entry_price")
+        db.execute(insert(Order).values(rows))
+        return len(rows)
+
+    def _update_exits(self, db, rows: List[Dict[str, Any]]) -> int:
+        self._fill_missing_prices(db, rows, "exit_price")
+
+        fills = values(
+            column("user_id", Integer),
+            column("exit_price", Numeric(10, 2)),
+            column("exit_time", DateTime(timezone=True)),
+            name="fills",
+        ).data([(row["user_id"], row["exit_price"], row["exit_time"]) for row in rows])
+
+        result = db.execute(
+            update(Order)
+            .where(
+                Order.signal_log_id == self.signal_log_id,
+                Order.user_id == fills.c.user_id,
+                Order.status == "OPEN",
+            )
+            .values(
+                status="CLOSED",
+                exit_price=fills.c.exit_price,
+                exit_time=fills.c.exit_time,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
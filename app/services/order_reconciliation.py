@@ -0,0 +1,298 @@
+"""
+Broker order ledger and order-status reconciliation
+Fanout records every broker order id it gets back in broker_orders (buffered,
+bulk-inserted off the order path); a reconciler pulls each account's order
+book in one call per cycle, stores the broker's view of every pending order
+and rewrites the orders row's entry/exit price with the actual fill
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.constants.const import (
+    BROKER_ORDER_LEDGER_FLUSH_S,
+    BROKER_ORDER_LEDGER_MAX_QUEUE,
+    ORDER_RECONCILE_LOOKBACK_H,
+    ORDER_RECONCILE_WORKERS,
+)
+from app.models.models import BrokerOrder, Order
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.broker_sessions import broker_session_cache, is_auth_failure
+from app.services.circuit_breaker import broker_breakers
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo("Asia/Kolkata")
+
+# Broker order book status -> broker_orders.status; anything else is still PENDING
+DHAN_ORDER_STATUS = {"TRADED": "FILLED", "REJECTED": "REJECTED", "CANCELLED": "CANCELLED", "EXPIRED": "CANCELLED"}
+ANGELONE_ORDER_STATUS = {"complete": "FILLED", "rejected": "REJECTED", "cancelled": "CANCELLED"}
+
+# When a trader's leg filled on several brokers the orders row takes the first of these, as at placement
+BROKER_PRIORITY = ("dhan", "angelone")
+
+
+def broker_order_id(broker: str, response: Any) -> Optional[str]:
+    """Order id from a place-order response (Dhan payload dict, or SmartConnect's order id string)"""
+    if broker == "dhan":
+        if isinstance(response, dict) and response.get("status") == "success":
+            order_id = (response.get("data") or {}).get("orderId")
+            return str(order_id) if order_id else None
+        return None
+    if isinstance(response, dict):
+        order_id = (response.get("data") or {}).get("orderid")
+        return str(order_id) if order_id else None
+    return str(response) if response else None
+
+
+class BrokerOrderLedger:
+    """Thread-safe write-behind queue of new broker_orders rows"""
+
+    def __init__(self, flush_interval: float = BROKER_ORDER_LEDGER_FLUSH_S, max_queue: int = BROKER_ORDER_LEDGER_MAX_QUEUE):
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        # Metrics
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+
+    def record(self, user_id: int, signal_log_id: int, leg: str, responses: Dict[str, Any]):
+        """
+        Queue the broker orders one trader's leg produced
+
+        Args:
+            user_id: Trader id
+            signal_log_id: orders.signal_log_id of the trader's order (the ENTRY signal)
+            leg: ENTRY or EXIT
+            responses: Broker -> place-order response
+        """
+        rows = []
+        for broker, response in responses.items():
+            order_id = broker_order_id(broker, response)
+            if order_id:
+                rows.append({
+                    "user_id": user_id,
+                    "broker": broker,
+                    "broker_order_id": order_id,
+                    "signal_log_id": signal_log_id,
+                    "leg": leg,
+                    "status": "PENDING",
+                    "price_applied": False,
+                    "raw_response": response if isinstance(response, dict) else {"orderid": order_id},
+                })
+        if not rows:
+            return
+        with self._lock:
+            if len(self._rows) + len(rows) > self.max_queue:
+                self.dropped_rows += len(rows)
+                return
+            self._rows.extend(rows)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="broker-order-ledger-flush", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> int:
+        """Insert everything queued in one statement; returns rows written"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+
+        from app.db.db import SessionLocal
+        db = SessionLocal()
+        try:
+            db.execute(pg_insert(BrokerOrder).values(rows).on_conflict_do_nothing(index_elements=["broker_order_id"]))
+            db.commit()
+            self.flushed_rows += len(rows)
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            self.dropped_rows += len(rows)
+            logger.error(f"Failed to write {len(rows)} broker order rows: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+    def stop(self):
+        """Stop the flusher and write out what is left"""
+        self._stop.set()
+        self.flush()
+
+
+broker_order_ledger = BrokerOrderLedger()
+
+
+class OrderReconciler:
+    """Brings broker_orders and orders prices in line with the brokers' order books"""
+
+    def __init__(self, lookback_hours: float = ORDER_RECONCILE_LOOKBACK_H, workers: int = ORDER_RECONCILE_WORKERS):
+        self.lookback_hours = lookback_hours
+        self.workers = workers
+
+    @staticmethod
+    def _fetch_book(user_id: int, broker: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """One account's order book keyed by broker order id; None if it could not be fetched"""
+        from app.db.db import SessionLocal
+        db = SessionLocal()
+        try:
+            if broker == "dhan":
+                session = broker_session_cache.get_dhan(user_id=user_id, db=db)
+                fetch, ok, key = (session.client.get_order_list if session else None), "success", "orderId"
+            else:
+                session = broker_session_cache.get_angelone(user_id=user_id, db=db)
+                fetch, ok, key = (session.client.orderBook if session else None), True, "orderid"
+            if fetch is None:
+                return None
+
+            with broker_dispatcher.limit(broker):
+                response = broker_breakers.call(broker, "order_book", fetch)
+            if not isinstance(response, dict) or response.get("status") != ok:
+                if is_auth_failure(response):
+                    broker_session_cache.invalidate(user_id, broker)
+                logger.warning(f"{broker} order book for user {user_id} failed: {response}")
+                return None
+            return {str(row[key]): row for row in response.get("data") or [] if row.get(key)}
+        except Exception as e:
+            logger.warning(f"{broker} order book for user {user_id} failed: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _broker_view(broker: str, row: Dict[str, Any]) -> Tuple[str, Optional[float], Optional[str]]:
+        """(status, fill price, exchange order id) from an order book row"""
+        if broker == "dhan":
+            status = DHAN_ORDER_STATUS.get(str(row.get("orderStatus", "")).upper(), "PENDING")
+            price, exchange_order_id = row.get("averageTradedPrice"), row.get("exchangeOrderId")
+        else:
+            status = ANGELONE_ORDER_STATUS.get(str(row.get("status", "")).lower(), "PENDING")
+            price, exchange_order_id = row.get("averageprice"), None
+        fill_price = float(price) if status == "FILLED" and price not in (None, "", 0, "0") else None
+        return status, fill_price, (str(exchange_order_id) if exchange_order_id else None)
+
+    def run_once(self) -> Dict[str, int]:
+        """
+        One reconciliation cycle
+
+        Returns:
+            Counts of accounts polled, broker orders updated and orders rows corrected
+        """
+        from app.db.db import SessionLocal
+        since = datetime.now(IST) - timedelta(hours=self.lookback_hours)
+
+        db = SessionLocal()
+        try:
+            accounts = [
+                (row.user_id, row.broker) for row in
+                db.query(BrokerOrder.user_id, BrokerOrder.broker)
+                .filter(BrokerOrder.status == "PENDING", BrokerOrder.created_at >= since)
+                .distinct().all()
+            ]
+        finally:
+            db.close()
+
+        books: Dict[Tuple[int, str], Dict[str, Dict[str, Any]]] = {}
+        if accounts:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="order-reconcile") as pool:
+                for account, book in zip(accounts, pool.map(lambda a: self._fetch_book(*a), accounts)):
+                    if book is not None:
+                        books[account] = book
+
+        db = SessionLocal()
+        try:
+            now = datetime.now(IST)
+            updated = 0
+            if books:
+                pending = (
+                    db.query(BrokerOrder)
+                    .filter(
+                        BrokerOrder.status == "PENDING",
+                        BrokerOrder.created_at >= since,
+                        tuple_(BrokerOrder.user_id, BrokerOrder.broker).in_(list(books)),
+                    )
+                    .all()
+                )
+                for broker_order in pending:
+                    row = books[(broker_order.user_id, broker_order.broker)].get(broker_order.broker_order_id)
+                    if row is None:
+                        continue
+                    status, fill_price, exchange_order_id = self._broker_view(broker_order.broker, row)
+                    broker_order.status = status
+                    broker_order.fill_price = fill_price
+                    broker_order.exchange_order_id = exchange_order_id or broker_order.exchange_order_id
+                    broker_order.raw_response = row
+                    broker_order.reconciled_at = now
+                    updated += 1
+                db.flush()
+
+            corrected = self._apply_fills(db, since)
+            db.commit()
+            return {"accounts": len(accounts), "accounts_fetched": len(books), "updated": updated, "corrected": corrected}
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _apply_fills(db, since: datetime) -> int:
+        """Write filled prices to their orders rows; returns rows corrected"""
+        filled = (
+            db.query(BrokerOrder)
+            .filter(
+                BrokerOrder.status == "FILLED",
+                BrokerOrder.price_applied == False,
+                BrokerOrder.fill_price.isnot(None),
+                BrokerOrder.signal_log_id.isnot(None),
+                BrokerOrder.created_at >= since,
+            )
+            .all()
+        )
+        if not filled:
+            return 0
+
+        legs: Dict[Tuple[int, int, str], List[BrokerOrder]] = {}
+        for broker_order in sorted(filled, key=lambda b: BROKER_PRIORITY.index(b.broker) if b.broker in BROKER_PRIORITY else len(BROKER_PRIORITY)):
+            legs.setdefault((broker_order.user_id, broker_order.signal_log_id, broker_order.leg), []).append(broker_order)
+
+        orders = {
+            (order.user_id, order.signal_log_id): order for order in
+            db.query(Order).filter(
+                tuple_(Order.user_id, Order.signal_log_id).in_({(user_id, signal_log_id) for user_id, signal_log_id, _ in legs})
+            ).all()
+        }
+
+        corrected = 0
+        for (user_id, signal_log_id, leg), broker_orders in legs.items():
+            order = orders.get((user_id, signal_log_id))
+            # The order's batch may not have been written yet (or the exit not applied): try next cycle
+            if order is None or (leg == "EXIT" and order.status != "CLOSED"):
+                continue
+            fill_price = broker_orders[0].fill_price
+            if leg == "ENTRY":
+                order.entry_price = fill_price
+            else:
+                order.exit_price = fill_price
+            for broker_order in broker_orders:
+                broker_order.order_id = order.id
+                broker_order.price_applied = True
+            corrected += 1
+        return corrected
+
+
+order_reconciler = OrderReconciler()
@@ -3,33 +3,86 @@ from datetime import datetime
 from zoneinfo import ZoneInfo
 from app.models.models import Order, User, DhanCredentials , StrikePriceTickData , AngelOneCredentials ,SymbolMaster
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List
 from dhanhq import dhanhq, DhanContext
 from fastapi import Request
 import pandas as pd
 import time
 from SmartApi import SmartConnect
 import pyotp
+from app.services.symbol_cache import symbol_master_cache
+from app.services.ltp_store import latest_ltp_store
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.scrip_master import scrip_master_index
+from app.services.broker_sessions import broker_session_cache, is_auth_failure
+from app.services.circuit_breaker import CircuitOpenError, broker_breakers
+from app.constants.const import ANGELONE_ORDERS_ENABLED, BROKER_SIMULATOR_URL, STRATEGY_SUBSCRIPTIONS_ENABLED
+from app.services.broker_simulator import SimulatedSmartConnect
+from app.services.fill_price import resolve_fill_price
+from app.services.order_batch import OrderBatch
+from app.services.latency_trace import SignalTrace, trace_mark
+from app.services.paper_trading import PaperFillError, paper_fill_model, paper_traders
+from app.services.order_reconciliation import broker_order_ledger
+from app.services.strategy_subscriptions import strategy_subscription_index
 
 
 def get_all_traders_id(db: Session) -> List[int]:
-    return list(map(lambda x: x.id, db.query(User.id).filter(User.role == "TRADER").all()))
+    return strategy_subscription_index.traders()
+
+
+def get_entry_targets(signal_data, db: Session) -> Dict[int, int]:
+    """
+    Trader id -> order quantity for an entry signal: the strategy's subscribers,
+    each at the signal's lot_qty times their multiplier (every TRADER at
+    lot_qty when subscriptions are off)
+    """
+    lot_qty = signal_data.strike_data.lot_qty
+    if not STRATEGY_SUBSCRIPTIONS_ENABLED:
+        return {trader_id: lot_qty for trader_id in get_all_traders_id(db)}
+    return {
+        trader_id: lot_qty * multiplier
+        for trader_id, multiplier in strategy_subscription_index.subscribers(signal_data.strategy_code).items()
+    }
+
+
+def get_exit_targets(signal_data, signal_log_id: int, db: Session) -> Dict[int, int]:
+    """
+    Trader id -> quantity of their OPEN order for the entry signal, so exits
+    close exactly what was opened even if subscriptions changed since (every
+    TRADER at lot_qty when subscriptions are off)
+
+    Only call once the entry's order rows are written: inline exits go through
+    OrderBatch.after_entry and the outbox defers an EXIT until its ENTRY is DONE
+    """
+    if not STRATEGY_SUBSCRIPTIONS_ENABLED:
+        return {trader_id: signal_data.strike_data.lot_qty for trader_id in get_all_traders_id(db)}
+    return {
+        row.user_id: row.qty for row in
+        db.query(Order.user_id, Order.qty)
+        .filter(Order.signal_log_id == signal_log_id, Order.status == "OPEN")
+        .all()
+    }
 
 def get_angelone_symbol(token:int):
-    import pandas as pd
-    df=pd.read_csv('OpenAPIScripMaster.csv')
+    return scrip_master_index.get_symbol(token)
 
+
+def get_latest_ltp(symbol: str, db: Session):
+    """Latest LTP for a strike symbol: in-process store first, then the newest tick row"""
+    ltp = latest_ltp_store.get_ltp_by_symbol(symbol)
+    if ltp is not None:
+        return ltp
     return (
-        df.loc[df['token'] == int(token), 'symbol']
-        .iloc[0]
-        if not df[df['token'] == int(token)].empty
-        else None
+        db.query(StrikePriceTickData.ltp)
+        .filter(StrikePriceTickData.symbol == symbol)
+        .order_by(StrikePriceTickData.id.desc()).limit(1)
+        .scalar()
     )
 
 
 def check_instrument_isactive(token:str,db:Session):
-    print(db.query(SymbolMaster.is_active).filter(SymbolMaster.token == token).first())
-    return db.query(SymbolMaster.is_active).filter(SymbolMaster.token == token).first()
+    symbol = symbol_master_cache.get(token, db)
+    return symbol.is_active if symbol else None
 
 
 
@@ -99,15 +152,55 @@ def place_angelone_order(smart_api_obj, signal_data,transaction_list: list,angel
     #     }
 
     print("Order Params:", order_params)
-    response = smart_api_obj.placeOrder(order_params)
+    response = broker_breakers.call("angelone", "place_order", smart_api_obj.placeOrder, order_params)
     print("Order Response:", response)
     return response
 
 
 
 
+def place_dhan_order(dhan, strike_data, signal_data, transaction_list: list):
+    """Market order on Dhan for a signal, holding a dhan dispatch slot for the call"""
+    exchange_segment = (
+        dhan.NSE_FNO if strike_data.exchange == 'NSE_FNO'
+        else dhan.BSE_FNO if strike_data.exchange == 'BSE_FNO'
+        else dhan.NSE_FNO
+    )
+    with broker_dispatcher.limit("dhan"):
+        return broker_breakers.call(
+            "dhan", "place_order", dhan.place_order,
+            security_id=strike_data.token,
+            exchange_segment=exchange_segment,
+            transaction_type=dhan.BUY if signal_data.signal.lower() in transaction_list else dhan.SELL,
+            quantity=strike_data.lot_qty,
+            order_type=dhan.MARKET,
+            product_type=dhan.INTRA,
+            price=0,
+        )
+
+
+def dhan_fill_price(dhan, order_response) -> float | None:
+    """Average traded price of a Dhan order if it has already filled, else None"""
+    if not isinstance(order_response, dict) or order_response.get("status") != "success":
+        return None
+    order_id = (order_response.get("data") or {}).get("orderId")
+    if not order_id:
+        return None
+    try:
+        with broker_dispatcher.limit("dhan"):
+            status = broker_breakers.call("dhan", "order_status", dhan.get_order_by_id, order_id)
+        data = status.get("data") if isinstance(status, dict) else None
+        if isinstance(data, list):
+            data = data[0] if data else None
+        if data and data.get("orderStatus") == "TRADED" and data.get("averageTradedPrice"):
+            return float(data["averageTradedPrice"])
+    except Exception as e:
+        print('Dhan order status error:', e)
+    return None
+
+
 def smartapi_login(api_key: str, username: str, password: str, totp_token: str):
-    obj = SmartConnect(api_key=api_key)
+    obj = SimulatedSmartConnect(api_key=api_key) if BROKER_SIMULATOR_URL else SmartConnect(api_key=api_key)
 
     totp = pyotp.TOTP(totp_token).now()
     data = obj.generateSession(username, password, totp)
@@ -148,43 +241,18 @@ def get_angelone_credentials(trader_id: int, db: Session) -> dict | None:
 
 
 
-def handle_order(trader_id: int, signal_log_id: int, strike_data, signal_data, transaction_list: list, db: Session, strategy_id: int = 1):
+def record_entry_order(trader_id: int, signal_log_id: int, strike_data, strategy_id: int = 1,
+                       entry_price: float = None, entry_time: datetime = None):
     """
-    Handle order placement and closure based on trading signals.
-
-    Parameters:
-        trader_id (int): The ID of the trader.
-        signal_log_id (int): The signal log ID.
-        strike_data: Object containing `symbol`, `position`, and `lot_qty`.
-        signal_data: Object containing `signal` attribute.
-        transaction_list (list): List of active signals to trigger orders.
-        db (Session): SQLAlchemy session.
-        strategy_id (int): Strategy ID for the order. Default is 1.
+    Insert the OPEN order for an entry.
+    Uses the resolved fill price when given, else the strike's latest LTP.
     """
-
-    # Check if signal matches the allowed transaction list
-    if signal_data.signal.lower() in transaction_list:
-        # Log the order
-        with open('order_log.txt', 'a') as f:
-            f.write(
-                f'trader_id: {trader_id}, signal_log_id: {signal_log_id}, '
-                f'symbol: {strike_data.symbol}, position: {strike_data.position}, '
-                f'lot_qty: {strike_data.lot_qty}\n'
-            )
-
-        time.sleep(5)
+    from app.db.db import SessionLocal
+    db = SessionLocal()
+    try:
         print('Adding order to db')
-
-        # Fetch latest LTP
-        ltp = (
-            db.query(StrikePriceTickData.ltp)
-            .filter(StrikePriceTickData.symbol == strike_data.symbol)
-            .order_by(StrikePriceTickData.id.desc())
-            .limit(1)
-            .scalar()
-        )
-
-        # Add new order
+        if entry_price is None:
+            entry_price = get_latest_ltp(strike_data.symbol, db)
         db.add(
             Order(
                 strategy_id=strategy_id,
@@ -193,17 +261,30 @@ def handle_order(trader_id: int, signal_log_id: int, strike_data, signal_data, t
                 symbol=strike_data.symbol,
                 option_type=strike_data.position,
                 qty=strike_data.lot_qty,
-                entry_price=float(ltp) if ltp is not None else 0.0,
+                entry_price=float(entry_price) if entry_price is not None else 0.0,
                 status="OPEN",
-                entry_time=datetime.now(ZoneInfo("Asia/Kolkata")),
+                entry_time=entry_time or datetime.now(ZoneInfo("Asia/Kolkata")),
                 is_deleted=False
             )
         )
         db.commit()
         print('Order added to db')
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
-    else:
-        # Close any open order for this signal
+
+def record_exit_order(trader_id: int, signal_log_id: int, symbol: str,
+                      exit_price: float = None, exit_time: datetime = None):
+    """
+    Close the trader's OPEN order for a signal.
+    Uses the resolved fill price when given, else the strike's latest LTP.
+    """
+    from app.db.db import SessionLocal
+    db = SessionLocal()
+    try:
         open_order = (
             db.query(Order)
             .filter(
@@ -213,137 +294,283 @@ def handle_order(trader_id: int, signal_log_id: int, strike_data, signal_data, t
             )
             .first()
         )
+        if not open_order:
+            print(f"No open order to close for trader_id {trader_id}, signal_log_id {signal_log_id}")
+            return
+
+        if exit_price is None:
+            exit_price = get_latest_ltp(symbol, db)
+
+        open_order.status = "CLOSED"
+        open_order.exit_price = float(exit_price) if exit_price is not None else 0.0
+        open_order.exit_time = exit_time or datetime.now(ZoneInfo("Asia/Kolkata"))
+        db.commit()
+        print(f"Closed order for symbol {symbol}, trader_id {trader_id}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _on_entry_fill(trader_id: int, signal_log_id: int, strike_data, strategy_id: int,
+                   order_time: datetime, order_batch: OrderBatch = None):
+    """resolve_fill_price callback: queue the OPEN order on the signal's batch, or write it directly"""
+    def record(price, source):
+        if order_batch is not None:
+            order_batch.add_entry(trader_id, strike_data, strategy_id, entry_price=price, entry_time=order_time)
+        else:
+            record_entry_order(trader_id, signal_log_id, strike_data, strategy_id, entry_price=price, entry_time=order_time)
+    return record
+
+
+def _on_exit_fill(trader_id: int, signal_log_id: int, symbol: str,
+                  order_time: datetime, order_batch: OrderBatch = None):
+    """resolve_fill_price callback: queue the close on the signal's batch, or write it directly"""
+    def record(price, source):
+        if order_batch is not None:
+            order_batch.add_exit(trader_id, symbol, exit_price=price, exit_time=order_time)
+        else:
+            record_exit_order(trader_id, signal_log_id, symbol, exit_price=price, exit_time=order_time)
+    return record
 
-        if open_order:
-            open_order.status = "CLOSED"
 
-            # Fetch latest LTP for exit price
-            exit_ltp = (
-                db.query(StrikePriceTickData.ltp)
-                .filter(StrikePriceTickData.symbol == strike_data.symbol)
-                .order_by(StrikePriceTickData.id.desc())
-                .limit(1)
-                .scalar()
+def handle_order(trader_id: int, signal_log_id: int, strike_data, signal_data, transaction_list: list, db: Session,
+                 strategy_id: int = 1, order_time: datetime = None, broker_price: float = None,
+                 order_batch: OrderBatch = None):
+    """
+    Handle order placement and closure based on trading signals.
+
+    Parameters:
+        trader_id (int): The ID of the trader.
+        signal_log_id (int): The signal log ID.
+        strike_data: Object containing `symbol`, `position`, and `lot_qty`.
+        signal_data: Object containing `signal` attribute.
+        transaction_list (list): List of active signals to trigger orders.
+        db (Session): SQLAlchemy session.
+        strategy_id (int): Strategy ID for the order. Default is 1.
+        order_time (datetime): When the broker order was sent. Default is now.
+        broker_price (float): Fill price reported by the broker, if any.
+        order_batch (OrderBatch): Signal-wide batch to write through, if any.
+    """
+    order_time = order_time or datetime.now(ZoneInfo("Asia/Kolkata"))
+
+    # Check if signal matches the allowed transaction list
+    if signal_data.signal.lower() in transaction_list:
+        # Log the order
+        with open('order_log.txt', 'a') as f:
+            f.write(
+                f'trader_id: {trader_id}, signal_log_id: {signal_log_id}, '
+                f'symbol: {strike_data.symbol}, position: {strike_data.position}, '
+                f'lot_qty: {strike_data.lot_qty}\n'
             )
 
-            open_order.exit_price = float(exit_ltp) if exit_ltp is not None else 0.0
-            open_order.exit_time = datetime.now(ZoneInfo("Asia/Kolkata"))
+        resolve_fill_price(
+            strike_data.symbol, order_time,
+            _on_entry_fill(trader_id, signal_log_id, strike_data, strategy_id, order_time, order_batch),
+            broker_price=broker_price,
+        )
 
-            db.commit()
-            print(f"Closed order for symbol {strike_data.symbol}, trader_id {trader_id}")
+    else:
+        # Close any open order for this signal at the exit fill
+        resolve_fill_price(
+            strike_data.symbol, order_time,
+            _on_exit_fill(trader_id, signal_log_id, strike_data.symbol, order_time, order_batch),
+            broker_price=broker_price,
+        )
 
 
 
-def call_broker_api(trader_id: int,signal_log_id: int,angelone_symbol: str, signal_data, db: Session=None,):
+def call_broker_api(trader_id: int,signal_log_id: int,angelone_symbol: str, signal_data, db: Session=None, order_batch: OrderBatch=None, trace: SignalTrace=None, lot_qty: int=None):
+    """
+    Place one trader's order for a signal; submitted to broker_dispatcher by the fanout paths.
+    With an order_batch the order row is written with the rest of the signal's traders.
+    With a trace each stage of the trader's order is timed.
+    With a lot_qty the trader's order is for that quantity instead of the signal's.
+    """
+    trace_mark(trace, "dispatch", user_id=trader_id)
+    if lot_qty and lot_qty != signal_data.strike_data.lot_qty:
+        strike_data = signal_data.strike_data.model_copy(update={"lot_qty": lot_qty})
+        signal_data = signal_data.model_copy(update={"strike_data": strike_data})
     from app.db.db import SessionLocal
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    placed = False
+    try:
+        placed = _place_trader_order(trader_id, signal_log_id, angelone_symbol, signal_data, db, order_batch, trace)
+        return placed
+    finally:
+        if own_session:
+            db.close()
+        if order_batch is not None and not placed:
+            order_batch.skip(trader_id)
+
+
+def _dhan_leg(trader_id: int, dhan_session, strike_data, signal_data, transaction_list: list,
+              trace: SignalTrace=None) -> Dict[str, Any]:
+    """Place a trader's Dhan order; errors are logged and the order is still recorded, as before"""
+    from app.db.db import SessionLocal
+    dhan_res = None
+    fill_price = None
+    order_time = datetime.now(ZoneInfo("Asia/Kolkata"))
+    try:
+        trace_mark(trace, "broker_call_start", user_id=trader_id, broker="dhan")
+        dhan_res = place_dhan_order(dhan_session.client, strike_data, signal_data, transaction_list)
+        if is_auth_failure(dhan_res):
+            # Token was rotated or expired: rebuild the client from the DB once and retry
+            broker_session_cache.invalidate(trader_id, "dhan")
+            db = SessionLocal()
+            try:
+                dhan_session = broker_session_cache.get_dhan(user_id=trader_id, db=db)
+            finally:
+                db.close()
+            if dhan_session:
+                dhan_res = place_dhan_order(dhan_session.client, strike_data, signal_data, transaction_list)
+        trace_mark(trace, "broker_call_end", user_id=trader_id, broker="dhan")
+        print('Dhan Response:', dhan_res)
+        fill_price = dhan_fill_price(dhan_session.client, dhan_res)
+    except CircuitOpenError:
+        # Nothing was sent: don't record an order for this leg
+        raise
+    except Exception as e:
+        print('Dhan Error:', e)
+    return {"order_time": order_time, "fill_price": fill_price, "response": dhan_res}
+
+
+def _angelone_leg(trader_id: int, angelone_symbol: str, signal_data, transaction_list: list,
+                  trace: SignalTrace=None) -> Dict[str, Any]:
+    """Place a trader's AngelOne order; raises if the order could not be sent"""
+    from app.db.db import SessionLocal
+    order_time = datetime.now(ZoneInfo("Asia/Kolkata"))
     db = SessionLocal()
+    try:
+        with broker_dispatcher.limit("angelone"):
+            angelone_session = broker_session_cache.get_angelone(user_id=trader_id, db=db)
+            trace_mark(trace, "credential_fetch", user_id=trader_id, broker="angelone")
+            trace_mark(trace, "broker_call_start", user_id=trader_id, broker="angelone")
+            response = place_angelone_order(smart_api_obj=angelone_session.client, 
+                                signal_data=signal_data,
+                                transaction_list=transaction_list,
+                                angelone_symbol=angelone_symbol)
+            if is_auth_failure(response):
+                # Session expired early: log in again once and retry
+                broker_session_cache.invalidate(trader_id, "angelone")
+                angelone_session = broker_session_cache.get_angelone(user_id=trader_id, db=db)
+                response = place_angelone_order(smart_api_obj=angelone_session.client, 
+                                    signal_data=signal_data,
+                                    transaction_list=transaction_list,
+                                    angelone_symbol=angelone_symbol)
+            trace_mark(trace, "broker_call_end", user_id=trader_id, broker="angelone")
+        print('AngelOne Order Response:', response)                
+    except Exception as e:
+        error_msg = f'AngelOne Error: {str(e)}'
+        print(error_msg)
+        raise Exception(error_msg)
+    finally:
+        db.close()
+    return {"order_time": order_time, "fill_price": None, "response": response}
+
+
+def _paper_leg(trader_id: int, signal_log_id: int, strike_data, signal_data, transaction_list: list, db: Session,
+               order_batch: OrderBatch=None, trace: SignalTrace=None):
+    """
+    Fill a paper trader's order in-process at the latest LTP and record it
+
+    The fill runs once the simulated latency has passed, on the dispatcher
+    timer. Raises now if there is no price to fill at.
+    """
+    if paper_fill_model.latest_ltp(strike_data.symbol, strike_data.token, db) is None:
+        raise PaperFillError(f"No LTP for {strike_data.symbol}; paper order not filled")
+    order_time = datetime.now(ZoneInfo("Asia/Kolkata"))
+    trace_mark(trace, "broker_call_start", user_id=trader_id, broker="paper")
+
+    def on_filled(response):
+        trace_mark(trace, "broker_call_end", user_id=trader_id, broker="paper")
+        print('Paper Fill:', response)
+        handle_order(
+            trader_id=trader_id,
+            signal_log_id=signal_log_id,
+            strike_data=strike_data,
+            signal_data=signal_data,
+            transaction_list=transaction_list,
+            strategy_id=1,
+            db=None,
+            order_time=order_time,
+            broker_price=response["data"]["averageTradedPrice"],
+            order_batch=order_batch)
+
+    def on_error(e):
+        print('Paper Fill Error:', e)
+        if order_batch is not None:
+            order_batch.skip(trader_id)
+
+    paper_fill_model.fill_later(
+        on_filled, on_error,
+        transaction_type="BUY" if signal_data.signal.lower() in transaction_list else "SELL",
+        quantity=strike_data.lot_qty,
+        symbol=strike_data.symbol,
+        token=strike_data.token,
+    )
+
+
+def _place_trader_order(trader_id: int,signal_log_id: int,angelone_symbol: str, signal_data, db: Session, order_batch: OrderBatch=None, trace: SignalTrace=None) -> bool:
+    """
+    Send a trader's order to every broker they trade on, concurrently, and record one order
+
+    The per-broker results are merged into one outcome: the trader's order row
+    takes the earliest send time and the first broker-reported fill price.
+    A trader is placed if any broker leg went through. Paper traders get a
+    simulated fill instead and no broker is called.
+    """
     print(f'Placing order for trader_id: {trader_id}, signal_log_id: {signal_log_id}')
     strike_data = signal_data.strike_data
-    dhan_creds=get_dhan_credentials(trader_id=trader_id, db=db)
-    angelone_creds=get_angelone_credentials(trader_id=trader_id, db=db)
-    # if not dhan_creds:
-    #     return False
-    print('Dhan Credentials:', dhan_creds.client_id,dhan_creds.access_token,dhan_creds.user_id)
     transaction_list = ['buy_entry','sell_entry']
-    print
+    if paper_traders.is_paper(trader_id):
+        # No broker session or call: the fill is simulated from the latest tick
+        _paper_leg(trader_id, signal_log_id, strike_data, signal_data, transaction_list, db, order_batch, trace)
+        return True
+
+    dhan_session = broker_session_cache.get_dhan(user_id=trader_id, db=db)
+    trace_mark(trace, "credential_fetch", user_id=trader_id, broker="dhan" if dhan_session else None)
+    print('Dhan Session:', dhan_session.client_id if dhan_session else None, trader_id)
     is_active = check_instrument_isactive(token=str(signal_data.token), db=db)
     is_non_entry_signal = signal_data.signal.lower() not in transaction_list
     print('is_active',is_active)
     print('is_non_entry_signal',is_non_entry_signal)
-    if dhan_creds and (is_active or is_non_entry_signal):
-        # dhan_context=DhanContext(client_id=dhan_creds['client_id'], access_token=dhan_creds['access_token'])
-        try:
-            dhan_context = DhanContext(client_id=dhan_creds.client_id, access_token=dhan_creds.access_token)
-
-            dhan = dhanhq(dhan_context)
-            exchange_segment = (
-                dhan.NSE_FNO if strike_data.exchange == 'NSE_FNO'
-                else dhan.BSE_FNO if strike_data.exchange == 'BSE_FNO'
-                else dhan.NSE_FNO
-            )
-            dhan_res = dhan.place_order(
-            security_id=strike_data.token,
-            exchange_segment=exchange_segment,
-            transaction_type=dhan.BUY if signal_data.signal.lower() in transaction_list else dhan.SELL,
-            quantity=strike_data.lot_qty,
-            order_type=dhan.MARKET,
-            product_type=dhan.INTRA,
-            price=0,
-            )
-            print('Dhan Response:', dhan_res)
-        except Exception as e:
-            print('Dhan Error:', e)
-        print('signal if ',signal_data.signal)
-        if signal_data.signal.lower() in transaction_list:
-            with open('order_log.txt', 'a') as f:
-                f.write(f'trader_id: {trader_id}, signal_log_id: {signal_log_id}, symbol: {strike_data.symbol}, position: {strike_data.position}, lot_qty: {strike_data.lot_qty}\n')
-            time.sleep(5)   
-            print('Adding order to db')
-            ltp = (
-                db.query(StrikePriceTickData.ltp)
-                .filter(StrikePriceTickData.symbol == strike_data.symbol)
-                .order_by(StrikePriceTickData.id.desc()).limit(1)
-                .scalar()
-            )
-            db.add(
-            Order(
-                strategy_id=1,
-                user_id=trader_id,
-                signal_log_id=signal_log_id,
-                symbol=strike_data.symbol,
-                option_type=strike_data.position,
-                qty=strike_data.lot_qty,
-                entry_price=float(ltp) if ltp is not None else 0.0,
-                status="OPEN",
-                entry_time=datetime.now(ZoneInfo("Asia/Kolkata")),
-                is_deleted=False
-            )
-            )
-            db.commit()
-            print('Order added to db')
-        
-        else:
-            #get open order from orders table for the particular trader_id and signal_log_id
-            open_order = db.query(Order).filter(Order.user_id == trader_id, Order.signal_log_id == signal_log_id, Order.status == "OPEN").first()
-            print('order check point 1',open_order.user_id)
-            if open_order:
-                open_order.status = "CLOSED"
-
-                open_order.exit_price = (
-                    db.query(StrikePriceTickData.ltp)
-                    .filter(StrikePriceTickData.symbol == strike_data.symbol)
-                    .order_by(StrikePriceTickData.id.desc()).limit(1)
-                    .scalar()
-                ) or 0
-
-                open_order.exit_time = datetime.now(ZoneInfo("Asia/Kolkata"))
-                db.commit()
-    elif angelone_creds and False:
-        try:
-            smart_api = smartapi_login(
-                api_key=angelone_creds["api_key"],
-                username=angelone_creds["username"],
-                password=angelone_creds["password"],
-                totp_token=angelone_creds["access_token"],
-            )
-            print('AngelOne Login Response:', smart_api)
-            response = place_angelone_order(smart_api_obj=smart_api, 
-                                signal_data=signal_data,
-                                transaction_list=transaction_list,
-                                angelone_symbol=angelone_symbol)
-            print('AngelOne Order Response:', response)                
-        except Exception as e:
-            error_msg = f'AngelOne Error: {str(e)}'
-            print(error_msg)
-            raise Exception(error_msg)
-        handle_order(
-                        trader_id=trader_id, 
-                        signal_log_id=signal_log_id, 
-                        strike_data=strike_data, 
-                        signal_data=signal_data, 
-                        transaction_list=transaction_list, 
-                        strategy_id=1,
-                        db=db)
+
+    legs = {}
+    if dhan_session and (is_active or is_non_entry_signal):
+        legs["dhan"] = lambda: _dhan_leg(trader_id, dhan_session, strike_data, signal_data, transaction_list, trace)
+    if ANGELONE_ORDERS_ENABLED and get_angelone_credentials(trader_id=trader_id, db=db):
+        legs["angelone"] = lambda: _angelone_leg(trader_id, angelone_symbol, signal_data, transaction_list, trace)
+    if not legs:
+        return False
+
+    results = broker_dispatcher.run_concurrently(legs)
+    sent = {broker: future.result() for broker, future in results.items() if future.exception() is None}
+    errors = {broker: str(future.exception()) for broker, future in results.items() if future.exception() is not None}
+    print(f'Trader {trader_id} broker outcome: sent={list(sent)}, errors={errors}')
+    if not sent:
+        raise Exception("; ".join(errors.values()))
+
+    # Order ids go to broker_orders so the reconciler can replace the estimated price with the real fill
+    broker_order_ledger.record(trader_id, signal_log_id, "EXIT" if is_non_entry_signal else "ENTRY",
+                               {broker: leg["response"] for broker, leg in sent.items()})
+    order_time = min(leg["order_time"] for leg in sent.values())
+    fill_price = next((leg["fill_price"] for leg in sent.values() if leg["fill_price"]), None)
+    handle_order(
+                    trader_id=trader_id, 
+                    signal_log_id=signal_log_id, 
+                    strike_data=strike_data, 
+                    signal_data=signal_data, 
+                    transaction_list=transaction_list, 
+                    strategy_id=1,
+                    db=db,
+                    order_time=order_time,
+                    broker_price=fill_price,
+                    order_batch=order_batch)
+    return True
 
 
 
@@ -0,0 +1,227 @@
+"""
+Paper trading: simulated order fills with no broker call
+A paper trader's orders are filled in-process at the strike's latest LTP,
+moved against the trader by a fixed slippage; fanout fills are delayed by a
+configurable latency on the dispatcher timer, so strategies can run at full
+trader scale without broker quota
+"""
+
+import itertools
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Set
+from zoneinfo import ZoneInfo
+
+from sqlalchemy.orm import Session
+
+from app.constants.const import (
+    PAPER_TRADING_ENABLED,
+    PAPER_SLIPPAGE_BPS,
+    PAPER_LATENCY_MS,
+    PAPER_LATENCY_JITTER_MS,
+    PAPER_TRADERS_REFRESH_S,
+    PAPER_TRADERS_RETRY_S,
+)
+from app.models.models import StrikePriceTickData, UserTradingSettings
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.ltp_store import latest_ltp_store
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo("Asia/Kolkata")
+
+
+class PaperFillError(Exception):
+    """Raised when a paper order can't be filled (no price known for the instrument)"""
+    pass
+
+
+class PaperFillModel:
+    """
+    Fills market orders at the latest LTP plus slippage
+
+    `fill` fills at once; `fill_later` waits out a simulated broker latency on
+    the dispatcher timer first, so no worker sleeps through it.
+    """
+
+    def __init__(
+        self,
+        slippage_bps: float = PAPER_SLIPPAGE_BPS,
+        latency_ms: float = PAPER_LATENCY_MS,
+        jitter_ms: float = PAPER_LATENCY_JITTER_MS,
+    ):
+        self.slippage_bps = slippage_bps
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._order_ids = itertools.count(1)
+        self._prefix = f"PAPER-{int(time.time())}"
+
+        # Metrics
+        self.filled = 0
+        self.unfilled = 0
+
+    def latest_ltp(self, symbol: Optional[str], token: Optional[str], db: Optional[Session]) -> Optional[float]:
+        ltp = latest_ltp_store.get_ltp_by_symbol(symbol) if symbol else None
+        if ltp is None and token:
+            ltp = latest_ltp_store.get_ltp(str(token))
+        if ltp is not None or db is None:
+            return ltp
+
+        column = StrikePriceTickData.symbol if symbol else StrikePriceTickData.token
+        return (
+            db.query(StrikePriceTickData.ltp)
+            .filter(column == (symbol or str(token)))
+            .order_by(StrikePriceTickData.id.desc()).limit(1)
+            .scalar()
+        )
+
+    def fill(self, transaction_type: str, quantity: int, symbol: Optional[str] = None,
+             token: Optional[str] = None, db: Optional[Session] = None) -> Dict[str, Any]:
+        """
+        Fill a market order now
+
+        Args:
+            transaction_type: "BUY" or "SELL"
+            quantity: Order quantity
+            symbol: Strike trading symbol (preferred price lookup)
+            token: Instrument token, if the symbol is not known
+            db: Session for the strike_price_tick_data fallback
+
+        Returns:
+            Dhan-style order payload with `averageTradedPrice`
+
+        Raises:
+            PaperFillError: If there is no LTP for the instrument
+        """
+        ltp = self.latest_ltp(symbol, token, db)
+        if ltp is None:
+            self.unfilled += 1
+            raise PaperFillError(f"No LTP for {symbol or token}; paper order not filled")
+
+        direction = 1 if transaction_type.upper() == "BUY" else -1
+        price = round(float(ltp) * (1 + direction * self.slippage_bps / 10000), 2)
+        self.filled += 1
+        return {
+            "status": "success",
+            "remarks": "paper",
+            "data": {
+                "orderId": f"{self._prefix}-{next(self._order_ids)}",
+                "orderStatus": "TRADED",
+                "transactionType": transaction_type.upper(),
+                "tradingSymbol": symbol,
+                "securityId": token,
+                "quantity": quantity,
+                "averageTradedPrice": price,
+                "ltp": float(ltp),
+                "updateTime": datetime.now(IST).isoformat(),
+            },
+        }
+
+    def fill_later(self, on_filled: Callable[[Dict[str, Any]], None], on_error: Callable[[Exception], None],
+                   transaction_type: str, quantity: int, symbol: Optional[str] = None, token: Optional[str] = None):
+        """
+        Fill a market order once the simulated latency has passed
+
+        Runs at once when there is no latency; otherwise the fill is queued on
+        the dispatcher timer and the caller's worker is free meanwhile.
+
+        Args:
+            on_filled: Called with the fill payload (see `fill`)
+            on_error: Called with the exception if the order can't be filled
+            transaction_type: "BUY" or "SELL"
+            quantity: Order quantity
+            symbol: Strike trading symbol (preferred price lookup)
+            token: Instrument token, if the symbol is not known
+        """
+        latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            broker_dispatcher.submit_after(
+                latency / 1000, self._fill_and_report, on_filled, on_error, transaction_type, quantity, symbol, token
+            )
+        else:
+            self._fill_and_report(on_filled, on_error, transaction_type, quantity, symbol, token)
+
+    def _fill_and_report(self, on_filled, on_error, transaction_type, quantity, symbol, token):
+        from app.db.db import SessionLocal
+        db = SessionLocal()
+        try:
+            response = self.fill(transaction_type, quantity, symbol=symbol, token=token, db=db)
+        except Exception as e:
+            on_error(e)
+            return
+        finally:
+            db.close()
+        on_filled(response)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slippage_bps": self.slippage_bps,
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "filled": self.filled,
+            "unfilled": self.unfilled,
+        }
+
+
+paper_fill_model = PaperFillModel()
+
+
+class PaperTraders:
+    """
+    Ids of users with paper trading switched on, reloaded every PAPER_TRADERS_REFRESH_S
+
+    Until a load has succeeded every user counts as a paper trader, so a
+    failing lookup never sends a paper user's orders to a broker; failed
+    loads are retried every PAPER_TRADERS_RETRY_S.
+    """
+
+    def __init__(self, refresh_s: float = PAPER_TRADERS_REFRESH_S, retry_s: float = PAPER_TRADERS_RETRY_S):
+        self.refresh_s = refresh_s
+        self.retry_s = retry_s
+        self._user_ids: Set[int] = set()
+        self._loaded = False
+        self._next_load_at = 0.0
+        self._lock = threading.Lock()
+
+    def _reload(self):
+        from app.db.db import SessionLocal
+        db = SessionLocal()
+        try:
+            rows = db.query(UserTradingSettings.user_id).filter(UserTradingSettings.paper_trading == True).all()
+            self._user_ids = {row.user_id for row in rows}
+            self._loaded = True
+            self._next_load_at = time.monotonic() + self.refresh_s
+        except Exception as e:
+            if self._loaded:
+                logger.warning(f"Failed to reload paper traders, keeping {len(self._user_ids)}: {str(e)}")
+            else:
+                logger.warning(f"Failed to load paper traders, treating every user as paper: {str(e)}")
+            self._next_load_at = time.monotonic() + self.retry_s
+        finally:
+            db.close()
+
+    def is_paper(self, user_id: int) -> bool:
+        """Whether the user's orders are paper-traded; true for everyone when PAPER_TRADING_ENABLED"""
+        if PAPER_TRADING_ENABLED:
+            return True
+        if time.monotonic() >= self._next_load_at:
+            with self._lock:
+                if time.monotonic() >= self._next_load_at:
+                    self._reload()
+        if not self._loaded:
+            return True
+        return user_id in self._user_ids
+
+    def invalidate(self):
+        """Force a reload on the next lookup (after a user's setting changes)"""
+        with self._lock:
+            self._next_load_at = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"global": PAPER_TRADING_ENABLED, "loaded": self._loaded, "paper_traders": sorted(self._user_ids)}
+
+
+paper_traders = PaperTraders()
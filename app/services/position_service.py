@@ -8,8 +8,9 @@ from typing import List, Optional
 from sqlalchemy import func
 from sqlalchemy.orm import Session, joinedload
 from fastapi import Request
-from app.models.models import Order, Strategy, StrikePriceTickData, SignalLog
+from app.models.models import Order, Strategy, StrikePriceTickData, StrikeLatestLTP, SignalLog
 from sqlalchemy import desc, func, outerjoin
+from app.services.ltp_store import latest_ltp_store
 
 logger = logging.getLogger(__name__)
 
@@ -28,25 +29,13 @@ class PositionService:
             today = date.today()
             print('test flag')
             
-            # Subquery to get the latest LTP for each symbol
-            latest_ltp_subquery = db.query(
-                StrikePriceTickData.symbol,
-                func.max(StrikePriceTickData.id).label('max_id')
-            ).group_by(StrikePriceTickData.symbol).subquery()
-
-            ltp_join = db.query(
-                StrikePriceTickData.symbol,
-                StrikePriceTickData.ltp
-            ).join(
-                latest_ltp_subquery,
-                StrikePriceTickData.id == latest_ltp_subquery.c.max_id
-            ).subquery()
+            # Latest LTP per symbol comes from the maintained strike_latest_ltp table
 
             # We filter for orders where exit_price is None or 0 (indicating they are still open)
             # if order is open we can in our order table  status is OPEN if it is closed then status is CLOSED
             # and status is EXECUTED or PLACED
-            query = db.query(Order, ltp_join.c.ltp.label('current_ltp')).outerjoin(
-                ltp_join, Order.symbol == ltp_join.c.symbol
+            query = db.query(Order, StrikeLatestLTP.ltp.label('current_ltp')).outerjoin(
+                StrikeLatestLTP, Order.symbol == StrikeLatestLTP.symbol
             ).options(
                 joinedload(Order.strategy),
                 joinedload(Order.signal_log)
@@ -115,8 +104,9 @@ class PositionService:
         if order.status.upper() == "CLOSED":
             current_price = float(order.exit_price or 0)
         else:
-            # Use pre-fetched LTP from DB join
-            current_price = float(current_ltp or 0)
+            # Prefer the in-process latest LTP, then the pre-fetched LTP from DB join
+            live_ltp = latest_ltp_store.get_ltp_by_symbol(order.symbol)
+            current_price = float(live_ltp if live_ltp is not None else (current_ltp or 0))
         
         # Fallback for display
         display_current_price = current_price if current_price > 0 else entry_price
@@ -164,22 +154,8 @@ class PositionService:
         try:
             today = date.today()
             
-            # Subquery logic repeated for consistent joins
-            latest_ltp_subquery = db.query(
-                StrikePriceTickData.symbol,
-                func.max(StrikePriceTickData.id).label('max_id')
-            ).group_by(StrikePriceTickData.symbol).subquery()
-
-            ltp_join = db.query(
-                StrikePriceTickData.symbol,
-                StrikePriceTickData.ltp
-            ).join(
-                latest_ltp_subquery,
-                StrikePriceTickData.id == latest_ltp_subquery.c.max_id
-            ).subquery()
-
-            query = db.query(Order, ltp_join.c.ltp.label('current_ltp')).outerjoin(
-                ltp_join, Order.symbol == ltp_join.c.symbol
+            query = db.query(Order, StrikeLatestLTP.ltp.label('current_ltp')).outerjoin(
+                StrikeLatestLTP, Order.symbol == StrikeLatestLTP.symbol
             ).options(
                 joinedload(Order.strategy),
                 joinedload(Order.signal_log)
@@ -204,22 +180,8 @@ class PositionService:
     def get_position_by_id(db: Session, position_id: int) -> Optional[dict]:
         """Get trade by ID from Order table, formatted for frontend"""
         try:
-            # Subquery logic for consistent joins
-            latest_ltp_subquery = db.query(
-                StrikePriceTickData.symbol,
-                func.max(StrikePriceTickData.id).label('max_id')
-            ).group_by(StrikePriceTickData.symbol).subquery()
-
-            ltp_join = db.query(
-                StrikePriceTickData.symbol,
-                StrikePriceTickData.ltp
-            ).join(
-                latest_ltp_subquery,
-                StrikePriceTickData.id == latest_ltp_subquery.c.max_id
-            ).subquery()
-
-            result = db.query(Order, ltp_join.c.ltp.label('current_ltp')).outerjoin(
-                ltp_join, Order.symbol == ltp_join.c.symbol
+            result = db.query(Order, StrikeLatestLTP.ltp.label('current_ltp')).outerjoin(
+                StrikeLatestLTP, Order.symbol == StrikeLatestLTP.symbol
             ).options(
                 joinedload(Order.strategy),
                 joinedload(Order.signal_log)
@@ -0,0 +1,125 @@
+"""
+In-process AngelOne scrip master index keyed by token
+Built once from OpenAPIScripMaster.csv and rebuilt in the background when the
+file changes or an admin asks for a reload
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+import pandas as pd
+
+from app.constants.const import ANGELONE_SCRIP_MASTER_PATH, SCRIP_MASTER_CHECK_INTERVAL_S
+
+logger = logging.getLogger(__name__)
+
+
+class ScripMasterIndex:
+    """Shared, read-mostly token -> AngelOne trading symbol map"""
+
+    def __init__(self, path: str = ANGELONE_SCRIP_MASTER_PATH, check_interval: float = SCRIP_MASTER_CHECK_INTERVAL_S):
+        self.path = path
+        self.check_interval = check_interval
+        self._by_token: Dict[str, str] = {}
+        self._loaded_mtime: Optional[float] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+
+    @staticmethod
+    def _key(token) -> str:
+        token = str(token).strip()
+        try:
+            return str(int(float(token)))
+        except ValueError:
+            return token
+
+    def load(self) -> int:
+        """
+        (Re)build the index from the CSV and swap it in atomically
+
+        Returns:
+            Number of tokens indexed
+
+        Raises:
+            FileNotFoundError: If the scrip master file is missing
+        """
+        mtime = os.path.getmtime(self.path)
+        df = pd.read_csv(self.path, usecols=["token", "symbol"], dtype=str)
+        df = df.dropna()
+
+        by_token: Dict[str, str] = {}
+        for token, symbol in zip(df["token"], df["symbol"]):
+            # First row wins, matching the old .iloc[0] lookup
+            by_token.setdefault(self._key(token), sys.intern(symbol))
+
+        with self._lock:
+            self._by_token = by_token
+            self._loaded_mtime = mtime
+            self._last_check = time.time()
+
+        logger.info(f"Scrip master index loaded with {len(by_token)} tokens from {self.path}")
+        return len(by_token)
+
+    def _reload_in_background(self):
+        try:
+            self.load()
+        except Exception as e:
+            logger.error(f"Scrip master reload failed: {str(e)}")
+        finally:
+            self._reloading = False
+
+    def _check_for_change(self):
+        """Start a background rebuild if the file changed; lookups keep the old index meanwhile"""
+        now = time.time()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._loaded_mtime or self._reloading:
+            return
+
+        self._reloading = True
+        threading.Thread(target=self._reload_in_background, daemon=True).start()
+
+    def get_symbol(self, token) -> Optional[str]:
+        """
+        AngelOne trading symbol for a token
+
+        Loads the index on first use; later file changes are picked up in
+        the background.
+
+        Args:
+            token: Instrument token (int or str)
+
+        Returns:
+            Trading symbol, or None if the token is not in the scrip master
+        """
+        if self._loaded_mtime is None:
+            with self._lock:
+                needs_load = self._loaded_mtime is None
+            if needs_load:
+                self.load()
+        else:
+            self._check_for_change()
+
+        return self._by_token.get(self._key(token))
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "tokens": len(self._by_token),
+            "loaded_mtime": self._loaded_mtime,
+            "reloading": self._reloading,
+        }
+
+
+scrip_master_index = ScripMasterIndex()
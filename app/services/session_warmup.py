@@ -0,0 +1,190 @@
+"""
+Pre-market broker session warm-up
+Logs every trader into their brokers before the open so the first signal of
+the day doesn't pay the login cost, and tells admins whose login failed
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy.orm import Session
+
+from app.constants.const import BROKER_WARMUP_TIME, BROKER_WARMUP_WORKERS
+from app.models.models import AlertType, AngelOneCredentials, DhanCredentials, Notification, User, UserRole
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.broker_sessions import broker_session_cache
+from app.services.paper_trading import paper_traders
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo("Asia/Kolkata")
+
+
+class BrokerWarmupService:
+    """Service class for the pre-market broker login job"""
+
+    last_report: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def _warm_dhan(user_id: int) -> Optional[str]:
+        """Build and validate a user's Dhan client; returns an error message or None"""
+        from app.db.db import SessionLocal
+        db = SessionLocal()
+        try:
+            broker_session_cache.invalidate(user_id, "dhan")
+            session = broker_session_cache.get_dhan(user_id=user_id, db=db)
+            if session is None:
+                return "No active Dhan credentials"
+            with broker_dispatcher.limit("dhan"):
+                response = session.client.get_fund_limits()
+            if not isinstance(response, dict) or response.get("status") != "success":
+                broker_session_cache.invalidate(user_id, "dhan")
+                return f"Dhan token rejected: {response}"
+            return None
+        except Exception as e:
+            broker_session_cache.invalidate(user_id, "dhan")
+            return f"Dhan validation failed: {str(e)}"
+        finally:
+            db.close()
+
+    @staticmethod
+    def _warm_angelone(user_id: int) -> Optional[str]:
+        """Log a user into AngelOne and cache the session; returns an error message or None"""
+        from app.db.db import SessionLocal
+        db = SessionLocal()
+        try:
+            broker_session_cache.invalidate(user_id, "angelone")
+            with broker_dispatcher.limit("angelone"):
+                session = broker_session_cache.get_angelone(user_id=user_id, db=db)
+            if session is None:
+                return "No active AngelOne credentials"
+            return None
+        except Exception as e:
+            return f"AngelOne login failed: {str(e)}"
+        finally:
+            db.close()
+
+    @staticmethod
+    def warm_up(db: Session) -> Dict[str, Any]:
+        """
+        Log in every active trader's broker accounts in parallel
+
+        Args:
+            db: Database session used to list traders and notify admins
+
+        Returns:
+            Report with counts, per-account failures and duration
+        """
+        started = time.perf_counter()
+
+        dhan_users = [
+            row.user_id for row in db.query(DhanCredentials.user_id)
+            .join(User, User.id == DhanCredentials.user_id)
+            .filter(DhanCredentials.is_active == True, User.role == UserRole.TRADER)
+            .all()
+        ]
+        angelone_users = [
+            row.user_id for row in db.query(AngelOneCredentials.user_id)
+            .join(User, User.id == AngelOneCredentials.user_id)
+            .filter(AngelOneCredentials.is_active == True, User.role == UserRole.TRADER)
+            .all()
+        ]
+        # Paper traders never call their brokers
+        dhan_users = [user_id for user_id in dhan_users if not paper_traders.is_paper(user_id)]
+        angelone_users = [user_id for user_id in angelone_users if not paper_traders.is_paper(user_id)]
+
+        with ThreadPoolExecutor(max_workers=BROKER_WARMUP_WORKERS, thread_name_prefix="broker-warmup") as pool:
+            jobs = [
+                ("dhan", user_id, pool.submit(BrokerWarmupService._warm_dhan, user_id))
+                for user_id in dhan_users
+            ] + [
+                ("angelone", user_id, pool.submit(BrokerWarmupService._warm_angelone, user_id))
+                for user_id in angelone_users
+            ]
+            failures = [
+                {"user_id": user_id, "broker": broker, "error": job.result()}
+                for broker, user_id, job in jobs
+                if job.result() is not None
+            ]
+
+        report = {
+            "ran_at": datetime.now(IST).isoformat(),
+            "dhan_accounts": len(dhan_users),
+            "angelone_accounts": len(angelone_users),
+            "ready": len(dhan_users) + len(angelone_users) - len(failures),
+            "failures": failures,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+        BrokerWarmupService.last_report = report
+
+        if failures:
+            BrokerWarmupService._notify_admins(db, failures)
+        logger.warning(
+            f"Broker warm-up: {report['ready']} sessions ready, {len(failures)} failed "
+            f"in {report['duration_ms']}ms"
+        )
+        return report
+
+    @staticmethod
+    def _notify_admins(db: Session, failures: List[Dict[str, Any]]):
+        """One notification per admin listing every account that failed to log in"""
+        admin_ids = [
+            row.id for row in db.query(User.id)
+            .filter(User.role.in_([UserRole.ADMIN, UserRole.SUPERADMIN]))
+            .all()
+        ]
+        message = "\n".join(f"User {f['user_id']} ({f['broker']}): {f['error']}" for f in failures)
+
+        try:
+            for admin_id in admin_ids:
+                db.add(Notification(
+                    user_id=admin_id,
+                    title=f"Broker warm-up: {len(failures)} account(s) failed to log in",
+                    message=message,
+                    notification_type=AlertType.ERROR,
+                    category="SYSTEM",
+                    priority="HIGH",
+                    is_read=False
+                ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error notifying admins of warm-up failures: {str(e)}")
+
+    @staticmethod
+    def next_run_at(now: Optional[datetime] = None) -> datetime:
+        """Next weekday at BROKER_WARMUP_TIME (HH:MM, IST)"""
+        now = now or datetime.now(IST)
+        hour, minute = (int(part) for part in BROKER_WARMUP_TIME.split(":"))
+        run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        while run_at.weekday() >= 5:
+            run_at += timedelta(days=1)
+        return run_at
+
+    @staticmethod
+    def run_scheduled():
+        """Warm-up entry point for the scheduler; owns its session"""
+        from app.db.db import SessionLocal
+        db = SessionLocal()
+        try:
+            return BrokerWarmupService.warm_up(db)
+        finally:
+            db.close()
+
+
+async def run_broker_warmup_scheduler():
+    """Background task: run the warm-up every weekday before the open"""
+    while True:
+        run_at = BrokerWarmupService.next_run_at()
+        await asyncio.sleep(max(0.0, (run_at - datetime.now(IST)).total_seconds()))
+        try:
+            await asyncio.to_thread(BrokerWarmupService.run_scheduled)
+        except Exception as e:
+            logger.error(f"Broker warm-up failed: {str(e)}")
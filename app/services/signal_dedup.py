@@ -0,0 +1,119 @@
+"""
+In-memory seen-set for signal ingestion
+Remembers the result of each (unique_id, signal_category) processed by this
+process so a client retry is answered without touching the database or the
+brokers; the unique key on signal_logs covers restarts and other processes
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.constants.const import SIGNAL_SEEN_MAX_KEYS, SIGNAL_SEEN_TTL_S, SIGNAL_SEEN_WAIT_S
+
+logger = logging.getLogger(__name__)
+
+
+class SignalInFlightError(Exception):
+    """Raised when the first request for a signal is still running after the wait timeout"""
+    pass
+
+
+class _Seen:
+    __slots__ = ("done", "result", "expires_at")
+
+    def __init__(self, expires_at: float):
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.expires_at = expires_at
+
+
+class SignalSeenSet:
+    """
+    Thread-safe (unique_id, signal_category) -> first result map
+
+    `begin` makes the caller the owner of an unseen key; concurrent callers
+    for the same key wait for the owner's `complete` (and get its result) or
+    `fail` (and one of them takes over). Keys expire after `ttl_s`, and the
+    oldest are evicted beyond `max_keys`.
+    """
+
+    def __init__(self, max_keys: int = SIGNAL_SEEN_MAX_KEYS, ttl_s: float = SIGNAL_SEEN_TTL_S):
+        self.max_keys = max_keys
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[tuple, _Seen]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    def begin(self, unique_id: str, signal_category: str, timeout: float = SIGNAL_SEEN_WAIT_S) -> Optional[Dict[str, Any]]:
+        """
+        Claim a signal for processing
+
+        Returns:
+            None if the caller should process the signal (and then call
+            complete or fail), otherwise the first request's result
+
+        Raises:
+            SignalInFlightError: If the first request is still running after `timeout`
+        """
+        key = (unique_id, signal_category)
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.done.is_set() and entry.expires_at <= now:
+                    del self._entries[key]
+                    entry = None
+                if entry is None:
+                    self._entries[key] = _Seen(now + self.ttl_s)
+                    self._evict()
+                    self.misses += 1
+                    return None
+                if entry.done.is_set():
+                    self.hits += 1
+                    return entry.result
+
+            if not entry.done.wait(timeout):
+                raise SignalInFlightError(f"{signal_category} signal {unique_id} is still being processed")
+            # Completed: loop round to return its result. Failed: the key is gone and we take it over
+
+    def complete(self, unique_id: str, signal_category: str, result: Dict[str, Any]):
+        with self._lock:
+            entry = self._entries.get((unique_id, signal_category))
+            if entry is None:
+                entry = self._entries[(unique_id, signal_category)] = _Seen(time.monotonic() + self.ttl_s)
+            entry.result = result
+        entry.done.set()
+
+    def fail(self, unique_id: str, signal_category: str):
+        """Forget an unfinished key so a retry processes the signal"""
+        with self._lock:
+            entry = self._entries.pop((unique_id, signal_category), None)
+        if entry is not None:
+            entry.done.set()
+
+    def _evict(self):
+        """Drop the oldest finished keys beyond max_keys; in-flight keys are never evicted"""
+        excess = len(self._entries) - self.max_keys
+        if excess <= 0:
+            return
+        stale = []
+        for key, entry in self._entries.items():
+            if len(stale) >= excess:
+                break
+            if entry.done.is_set():
+                stale.append(key)
+        for key in stale:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"keys": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+signal_seen_set = SignalSeenSet()
@@ -0,0 +1,268 @@
+"""
+Signal outbox: durable hand-off of broker fanout from the API to worker processes
+The API writes an outbox row with the SignalLog; workers claim rows with
+FOR UPDATE SKIP LOCKED, place every trader's order and record the outcome
+per trader, so a restart never leaves a half-sent signal unaccounted for.
+A trader only counts as PLACED once their order row is written.
+"""
+
+import logging
+import os
+import socket
+from concurrent.futures import wait
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.constants.const import ORDER_BATCH_FLUSH_TIMEOUT_S, SIGNAL_OUTBOX_BATCH_SIZE, SIGNAL_OUTBOX_LEASE_S
+from app.models.models import SignalOutbox, SignalOutboxDelivery
+from app.schemas.signal_schema import SignalEntryRequest, SignalExitRequest
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.latency_trace import SignalTrace, trace_mark
+from app.services.order_batch import OrderBatch
+from app.services.order_service_utils import call_broker_api, get_angelone_symbol, get_entry_targets, get_exit_targets
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo("Asia/Kolkata")
+
+# Delivery states a re-claimed row must not send again
+TERMINAL_DELIVERY_STATES = ("PLACED", "SKIPPED", "FAILED", "UNKNOWN")
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SignalOutboxService:
+    """Service class for signal outbox writes and worker processing"""
+
+    @staticmethod
+    def enqueue(db: Session, signal_log_id: int, signal_category: str, payload: Dict[str, Any],
+                order_signal_log_id: Optional[int] = None, trace: Optional[SignalTrace] = None) -> SignalOutbox:
+        """
+        Add an outbox row to the caller's transaction (caller commits)
+
+        Args:
+            db: Database session holding the SignalLog insert
+            signal_log_id: The new SignalLog's id
+            signal_category: ENTRY or EXIT
+            payload: Signal request as JSON
+            order_signal_log_id: Signal log id the orders are keyed by (the ENTRY's, for exits)
+            trace: The signal's latency trace; the worker continues it from the receipt time
+
+        Returns:
+            The pending SignalOutbox row
+        """
+        outbox = SignalOutbox(
+            signal_log_id=signal_log_id,
+            order_signal_log_id=order_signal_log_id or signal_log_id,
+            signal_category=signal_category,
+            payload=payload,
+            received_at=datetime.fromtimestamp(trace.received_at, IST) if trace is not None else datetime.now(IST),
+            status="PENDING",
+            attempts=0,
+        )
+        db.add(outbox)
+        return outbox
+
+    @staticmethod
+    def claim(db: Session, worker_id: str, limit: int = SIGNAL_OUTBOX_BATCH_SIZE) -> List[int]:
+        """
+        Claim pending rows, and rows whose worker's lease ran out
+
+        Rows locked by another worker's claim are skipped, so any number of
+        workers can poll the same table.
+
+        Returns:
+            Claimed outbox ids, oldest first
+        """
+        now = datetime.now(IST)
+        lease_expired = now - timedelta(seconds=SIGNAL_OUTBOX_LEASE_S)
+
+        rows = (
+            db.query(SignalOutbox)
+            .filter(
+                (SignalOutbox.status == "PENDING")
+                | ((SignalOutbox.status == "CLAIMED") & (SignalOutbox.claimed_at < lease_expired))
+            )
+            .order_by(SignalOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for row in rows:
+            row.status = "CLAIMED"
+            row.claimed_by = worker_id
+            row.claimed_at = now
+            row.attempts = (row.attempts or 0) + 1
+        db.commit()
+        return [row.id for row in rows]
+
+    @staticmethod
+    def _set_delivery(outbox_id: int, user_id: int, status: str, error: Optional[str] = None):
+        from app.db.db import SessionLocal
+        db = SessionLocal()
+        try:
+            db.query(SignalOutboxDelivery).filter(
+                SignalOutboxDelivery.outbox_id == outbox_id,
+                SignalOutboxDelivery.user_id == user_id
+            ).update({
+                SignalOutboxDelivery.status: status,
+                SignalOutboxDelivery.error: error,
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _deliver(outbox_id: int, trader_id: int, signal_log_id: int, angelone_symbol: str,
+                 signal_data, order_batch: OrderBatch, trace: Optional[SignalTrace] = None,
+                 lot_qty: Optional[int] = None) -> str:
+        """
+        Place one trader's order and record the outcome
+
+        A placed order stays SENDING until `process` has written its order row,
+        so a crash before then leaves it UNKNOWN rather than PLACED with no row
+        """
+        SignalOutboxService._set_delivery(outbox_id, trader_id, "SENDING")
+        try:
+            placed = call_broker_api(trader_id, signal_log_id, angelone_symbol, signal_data,
+                                     order_batch=order_batch, trace=trace, lot_qty=lot_qty)
+        except Exception as e:
+            SignalOutboxService._set_delivery(outbox_id, trader_id, "FAILED", str(e))
+            return "FAILED"
+        if not placed:
+            SignalOutboxService._set_delivery(outbox_id, trader_id, "SKIPPED")
+            return "SKIPPED"
+        return "PLACED"
+
+    @staticmethod
+    def _entry_pending(db: Session, outbox: SignalOutbox) -> bool:
+        """Whether an EXIT row's ENTRY row has not yet written its orders"""
+        entry_status = db.query(SignalOutbox.status).filter(
+            SignalOutbox.signal_log_id == outbox.order_signal_log_id,
+            SignalOutbox.signal_category == "ENTRY"
+        ).scalar()
+        return entry_status is not None and entry_status != "DONE"
+
+    @staticmethod
+    def defer(db: Session, outbox_id: int, reason: str):
+        """Return a claimed row to PENDING without counting the attempt"""
+        db.query(SignalOutbox).filter(SignalOutbox.id == outbox_id).update({
+            SignalOutbox.status: "PENDING",
+            SignalOutbox.attempts: SignalOutbox.attempts - 1,
+            SignalOutbox.last_error: reason,
+        }, synchronize_session=False)
+        db.commit()
+
+    @staticmethod
+    def process(db: Session, outbox_id: int) -> Optional[Dict[str, int]]:
+        """
+        Fan one claimed outbox row out to its traders
+
+        Traders already in a terminal state are not sent again. A trader left
+        in SENDING by a worker that died mid broker call, or before the order
+        row was written, is marked UNKNOWN for manual reconciliation rather
+        than risk a duplicate order. Placed traders are marked PLACED and the
+        row DONE together, only after the signal's order rows are committed.
+        An EXIT whose ENTRY row is not DONE yet is deferred: its targets are
+        the entry's OPEN orders, which aren't all written until then.
+
+        Returns:
+            Count of deliveries per status, or None if the row was deferred
+        """
+        outbox = db.query(SignalOutbox).filter(SignalOutbox.id == outbox_id).first()
+        if outbox is None:
+            return {}
+        if outbox.signal_category == "EXIT" and SignalOutboxService._entry_pending(db, outbox):
+            SignalOutboxService.defer(db, outbox_id, "Waiting for the entry's orders")
+            return None
+
+        if outbox.signal_category == "ENTRY":
+            signal_data = SignalEntryRequest(**outbox.payload)
+            batch_kind = OrderBatch.ENTRY
+        else:
+            signal_data = SignalExitRequest(**outbox.payload)
+            batch_kind = OrderBatch.EXIT
+
+        order_signal_log_id = outbox.order_signal_log_id
+        if outbox.signal_category == "ENTRY":
+            targets = get_entry_targets(signal_data, db=db)
+        else:
+            targets = get_exit_targets(signal_data, order_signal_log_id, db=db)
+        if targets:
+            db.execute(
+                pg_insert(SignalOutboxDelivery)
+                .values([{"outbox_id": outbox_id, "user_id": trader_id, "status": "PENDING"} for trader_id in targets])
+                .on_conflict_do_nothing(constraint="uq_signal_outbox_delivery")
+            )
+        db.query(SignalOutboxDelivery).filter(
+            SignalOutboxDelivery.outbox_id == outbox_id,
+            SignalOutboxDelivery.status == "SENDING"
+        ).update({
+            SignalOutboxDelivery.status: "UNKNOWN",
+            SignalOutboxDelivery.error: "Worker stopped before the order was recorded",
+        }, synchronize_session=False)
+        db.commit()
+
+        to_send = [
+            row.user_id for row in db.query(SignalOutboxDelivery.user_id).filter(
+                SignalOutboxDelivery.outbox_id == outbox_id,
+                SignalOutboxDelivery.status.notin_(TERMINAL_DELIVERY_STATES)
+            ).all()
+        ]
+
+        trace = SignalTrace(
+            outbox.signal_category,
+            received_at=outbox.received_at.timestamp() if outbox.received_at else None,
+        )
+        trace.bind(outbox.signal_log_id)
+
+        angelone_symbol = get_angelone_symbol(token=int(signal_data.strike_data.token))
+        trace_mark(trace, "symbol_resolution")
+        order_batch = OrderBatch(order_signal_log_id, batch_kind, to_send, trace=trace)
+        futures = [
+            broker_dispatcher.submit(
+                SignalOutboxService._deliver,
+                outbox_id, trader_id, order_signal_log_id, angelone_symbol, signal_data, order_batch, trace,
+                targets.get(trader_id)
+            )
+            for trader_id in to_send
+        ]
+        wait(futures)
+        placed = [trader_id for trader_id, future in zip(to_send, futures)
+                  if future.exception() is None and future.result() == "PLACED"]
+
+        # Fills without a broker price wait up to FILL_PRICE_TIMEOUT_S for a tick before their rows are written
+        if not order_batch.wait_complete(ORDER_BATCH_FLUSH_TIMEOUT_S):
+            raise Exception(f"Order rows for signal {order_signal_log_id} were not written: {order_batch.error}")
+
+        if placed:
+            db.query(SignalOutboxDelivery).filter(
+                SignalOutboxDelivery.outbox_id == outbox_id,
+                SignalOutboxDelivery.user_id.in_(placed)
+            ).update({SignalOutboxDelivery.status: "PLACED"}, synchronize_session=False)
+        outbox.status = "DONE"
+        outbox.completed_at = datetime.now(IST)
+        outbox.last_error = None
+        db.commit()
+
+        counts: Dict[str, int] = {}
+        for row in db.query(SignalOutboxDelivery.status).filter(SignalOutboxDelivery.outbox_id == outbox_id).all():
+            counts[row.status] = counts.get(row.status, 0) + 1
+        logger.warning(f"Signal outbox {outbox_id} ({outbox.signal_category}) done: {counts}")
+        return counts
+
+    @staticmethod
+    def record_failure(db: Session, outbox_id: int, error: str):
+        """Return a row to PENDING after a worker-level error so it is retried"""
+        db.rollback()
+        db.query(SignalOutbox).filter(SignalOutbox.id == outbox_id).update({
+            SignalOutbox.status: "PENDING",
+            SignalOutbox.last_error: error,
+        }, synchronize_session=False)
+        db.commit()
@@ -2,6 +2,7 @@
 Service layer for Signal operations
 """
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from typing import Dict, Any
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -12,9 +13,16 @@ from fastapi import Request
 
 from app.schemas.signal_schema import SignalEntryRequest, SignalExitRequest
 from app.models.models import SignalLog, Order, Position , Trade , Strategy ,StrikeInstrument
-from app.services.order_service_utils import get_all_traders_id,get_dhan_credentials,call_broker_api
+from app.services.order_service_utils import get_dhan_credentials,call_broker_api,get_entry_targets,get_exit_targets
 from app.services.broker_services import place_dhan_order_standalone
 from app.services.order_service_utils import get_angelone_symbol
+from app.services.instrument_hub import instrument_hub
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.order_batch import OrderBatch
+from app.services.signal_outbox import SignalOutboxService
+from app.services.latency_trace import SignalTrace, trace_mark
+from app.services.signal_dedup import signal_seen_set
+from app.constants.const import SIGNAL_DISPATCH_MODE
 
 
 import threading
@@ -122,7 +130,61 @@ class SignalService:
 
 
     @staticmethod
-    def process_entry_signal_v3(db: Session, signal_data: SignalEntryRequest,request:Request) -> Dict[str, Any]:
+    def _signal_result(signal_log: SignalLog) -> Dict[str, Any]:
+        return {
+            "id": signal_log.id,
+            "token": signal_log.token,
+            "signal": signal_log.signal_type,
+            "unique_id": signal_log.unique_id,
+            "strike_price_token": signal_log.strike_price_token,
+            "strategy_code": signal_log.strategy_code,
+            "signal_category": signal_log.signal_category,
+            "timestamp": signal_log.timestamp.isoformat()
+        }
+
+    @staticmethod
+    def _process_once(signal_category: str, unique_id: str, process) -> Dict[str, Any]:
+        """
+        Run `process` once per (unique_id, signal_category)
+
+        A retry of a signal this process has already handled gets the first
+        result back from the in-memory seen-set without touching the database
+        or the brokers; a concurrent retry waits for the first request.
+        """
+        seen = signal_seen_set.begin(unique_id, signal_category)
+        if seen is not None:
+            print(f'Duplicate {signal_category} signal {unique_id}, returning the original result')
+            return seen
+        try:
+            result = process()
+        except Exception:
+            signal_seen_set.fail(unique_id, signal_category)
+            raise
+        signal_seen_set.complete(unique_id, signal_category, result)
+        return result
+
+    @staticmethod
+    def _logged_signal_result(db: Session, unique_id: str, signal_category: str) -> Dict[str, Any]:
+        """Result of a signal already in signal_logs (unique key hit after a restart or on another process)"""
+        db.rollback()
+        signal_log = db.query(SignalLog).filter(
+            SignalLog.unique_id == unique_id,
+            SignalLog.signal_category == signal_category
+        ).first()
+        if signal_log is None:
+            return None
+        print(f'Duplicate {signal_category} signal {unique_id} already logged as {signal_log.id}')
+        return SignalService._signal_result(signal_log)
+
+    @staticmethod
+    def process_entry_signal_v3(db: Session, signal_data: SignalEntryRequest,request:Request, trace: SignalTrace = None) -> Dict[str, Any]:
+        return SignalService._process_once(
+            "ENTRY", signal_data.unique_id,
+            lambda: SignalService._process_entry_signal_v3(db, signal_data, request, trace)
+        )
+
+    @staticmethod
+    def _process_entry_signal_v3(db: Session, signal_data: SignalEntryRequest,request:Request, trace: SignalTrace = None) -> Dict[str, Any]:
 
         print('check point 0',signal_data.strike_data.token)
         strategy_id = (
@@ -133,7 +195,7 @@ class SignalService:
         
         print('strategy id',strategy_id)
 
-        db.add(SignalLog(
+        signal_log = SignalLog(
             token=signal_data.token,
             signal_type=signal_data.signal,
             unique_id=signal_data.unique_id,
@@ -145,14 +207,8 @@ class SignalService:
             stop_loss=signal_data.stop_loss,
             target=signal_data.target,
             description=signal_data.description
-        ))
-        db.commit()
-        print('check point 1')
-        
-        signal_log = db.query(SignalLog).filter(SignalLog.unique_id == signal_data.unique_id).order_by(SignalLog.id.desc()).first()
-        signal_log_id = signal_log.id if signal_log else None
-        traders_ids = get_all_traders_id(db=db)
-        print('check point 2')
+        )
+        db.add(signal_log)
         db.add(StrikeInstrument(
             token=signal_data.strike_data.token,
             symbol=signal_data.strike_data.symbol,
@@ -160,31 +216,88 @@ class SignalService:
             is_started=False,
             is_deleted=False
         ))
+        try:
+            db.flush()
+        except IntegrityError:
+            existing = SignalService._logged_signal_result(db, signal_data.unique_id, "ENTRY")
+            if existing is None:
+                raise
+            return existing
+        signal_log_id = signal_log.id
+        result = SignalService._signal_result(signal_log)
+        if SIGNAL_DISPATCH_MODE == "outbox":
+            # Committed with the SignalLog: the fanout survives an API restart
+            SignalOutboxService.enqueue(db, signal_log_id, "ENTRY", signal_data.model_dump(mode="json"), trace=trace)
+        else:
+            # Resolved before the commit: once the SignalLog is committed a retry only
+            # gets the logged result back, so nothing may fail between here and the fanout
+            targets = get_entry_targets(signal_data, db=db)
+            print('check point 2')
+            angelone_symbol=get_angelone_symbol(token=int(signal_data.strike_data.token))
+            trace_mark(trace, "symbol_resolution")
         db.commit()
-        # import pandas as pd
-        # df=pd.read_csv('OpenAPIScripMaster.csv')
-
-        # angelone_symbol = (
-        #     df.loc[df['token'] == int(signal_data.strike_data.token), 'symbol']
-        #     .iloc[0]
-        #     if not df[df['token'] == int(signal_data.strike_data.token)].empty
-        #     else None
-        # )
-        angelone_symbol=get_angelone_symbol(token=int(signal_data.strike_data.token))
-
+        trace_mark(trace, "signal_log_commit")
+        if trace is not None:
+            trace.bind(signal_log_id)
+        # Push the strike to connected feeds now rather than on their next poll
+        instrument_hub.notify()
+        print('check point 1')
+        if SIGNAL_DISPATCH_MODE == "outbox":
+            return result
 
-        for trader_id in traders_ids:
-            threading.Thread(target=call_broker_api, args=(trader_id,signal_log_id,angelone_symbol,signal_data,)).start()
+        order_batch = OrderBatch(signal_log_id, OrderBatch.ENTRY, targets, trace=trace)
+        for trader_id, lot_qty in targets.items():
+            broker_dispatcher.submit(call_broker_api, trader_id, signal_log_id, angelone_symbol, signal_data, order_batch=order_batch, trace=trace, lot_qty=lot_qty)
         print('check point 3')
+        return result
             
                 
 
     @staticmethod
-    def process_exit_signal_v3(db: Session, signal_data: SignalExitRequest) -> Dict[str, Any]:
+    def _close_strike_instrument(db: Session, strike_token: str) -> bool:
+        """
+        Mark a strike instrument deleted once no ENTRY signal on it is still open,
+        so feed processes can unsubscribe it
+        """
+        entry_ids = {
+            row.unique_id for row in db.query(SignalLog.unique_id).filter(
+                SignalLog.strike_price_token == strike_token,
+                SignalLog.signal_category == "ENTRY"
+            ).all()
+        }
+        exit_ids = {
+            row.unique_id for row in db.query(SignalLog.unique_id).filter(
+                SignalLog.strike_price_token == strike_token,
+                SignalLog.signal_category == "EXIT"
+            ).all()
+        }
+        if entry_ids - exit_ids:
+            return False
+
+        db.query(StrikeInstrument).filter(
+            StrikeInstrument.token == strike_token,
+            StrikeInstrument.is_deleted.is_(False)
+        ).update({StrikeInstrument.is_deleted: True}, synchronize_session=False)
+        db.commit()
+        return True
+
+
+    @staticmethod
+    def process_exit_signal_v3(db: Session, signal_data: SignalExitRequest, trace: SignalTrace = None) -> Dict[str, Any]:
+        return SignalService._process_once(
+            "EXIT", signal_data.unique_id,
+            lambda: SignalService._process_exit_signal_v3(db, signal_data, trace)
+        )
+
+    @staticmethod
+    def _process_exit_signal_v3(db: Session, signal_data: SignalExitRequest, trace: SignalTrace = None) -> Dict[str, Any]:
         print('exit check point 1')
-        signal_log_id = db.query(SignalLog.id).filter(SignalLog.unique_id == signal_data.unique_id).scalar()
+        signal_log_id = db.query(SignalLog.id).filter(
+            SignalLog.unique_id == signal_data.unique_id,
+            SignalLog.signal_category == "ENTRY"
+        ).scalar()
         print('exit check point 0',signal_log_id)
-        db.add(SignalLog(
+        exit_log = SignalLog(
             token=signal_data.token,
             signal_type=signal_data.signal,
             unique_id=signal_data.unique_id,
@@ -196,17 +309,62 @@ class SignalService:
             stop_loss=0.0,
             target=0.0,
             description=signal_data.description
-        ))
+        )
+        db.add(exit_log)
+        try:
+            db.flush()
+        except IntegrityError:
+            existing = SignalService._logged_signal_result(db, signal_data.unique_id, "EXIT")
+            if existing is None:
+                raise
+            return existing
+        exit_log_id = exit_log.id
+        result = SignalService._signal_result(exit_log)
+        if SIGNAL_DISPATCH_MODE == "outbox":
+            # Exit orders are keyed by the ENTRY signal log they close
+            SignalOutboxService.enqueue(db, exit_log_id, "EXIT", signal_data.model_dump(mode="json"),
+                                        order_signal_log_id=signal_log_id, trace=trace)
+        else:
+            # Resolved before the commit, as for entries; targets wait if the entry's rows aren't written yet
+            angelone_symbol=get_angelone_symbol(token=int(signal_data.strike_data.token))
+            trace_mark(trace, "symbol_resolution")
+            targets = None if OrderBatch.entry_pending(signal_log_id) else get_exit_targets(signal_data, signal_log_id, db=db)
         db.commit()
+        trace_mark(trace, "signal_log_commit")
+        if trace is not None:
+            trace.bind(exit_log_id)
+        SignalService._close_strike_instrument(db=db, strike_token=signal_data.strike_data.token)
         print('exit check point 1')
+        if SIGNAL_DISPATCH_MODE == "outbox":
+            return result
 
         print('exit check point 2',signal_log_id)
-        traders_ids = get_all_traders_id(db=db)
-        print('exit check point 3',traders_ids)
-        angelone_symbol=get_angelone_symbol(token=int(signal_data.strike_data.token))
+        if targets is not None:
+            SignalService._fan_out_exit(signal_data, signal_log_id, angelone_symbol, targets, trace)
+        else:
+            # An exit right behind its entry waits until the entry's OPEN orders are written
+            OrderBatch.after_entry(
+                signal_log_id,
+                lambda: SignalService._fan_out_exit(signal_data, signal_log_id, angelone_symbol, trace=trace)
+            )
+        return result
 
-        for trader_id in traders_ids:
-            threading.Thread(target=call_broker_api, args=(trader_id,signal_log_id,angelone_symbol,signal_data)).start()
+    @staticmethod
+    def _fan_out_exit(signal_data: SignalExitRequest, signal_log_id: int, angelone_symbol: str,
+                      targets: Dict[int, int] = None, trace: SignalTrace = None):
+        """Place the exit orders for an entry signal's OPEN orders (looked up here unless given)"""
+        if targets is None:
+            from app.db.db import SessionLocal
+            db = SessionLocal()
+            try:
+                targets = get_exit_targets(signal_data, signal_log_id, db=db)
+            finally:
+                db.close()
+        print('exit check point 3',list(targets))
+
+        order_batch = OrderBatch(signal_log_id, OrderBatch.EXIT, targets, trace=trace)
+        for trader_id, lot_qty in targets.items():
+            broker_dispatcher.submit(call_broker_api, trader_id, signal_log_id, angelone_symbol, signal_data, order_batch=order_batch, trace=trace, lot_qty=lot_qty)
 
 
             
@@ -0,0 +1,114 @@
+"""
+In-process strategy subscription index keyed by strategy_code
+Signal fanout resolves its traders and their lot multipliers from here
+instead of querying users per signal; reloaded when an admin changes a
+subscription and every STRATEGY_SUBSCRIPTIONS_REFRESH_S for other processes
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.constants.const import STRATEGY_SUBSCRIPTIONS_REFRESH_S
+from app.models.models import User, UserRole, UserStrategySubscription
+
+logger = logging.getLogger(__name__)
+
+
+class StrategySubscriptionIndex:
+    """strategy_code -> {trader id: qty multiplier}, plus every TRADER id"""
+
+    def __init__(self, refresh_s: float = STRATEGY_SUBSCRIPTIONS_REFRESH_S):
+        self.refresh_s = refresh_s
+        self._by_strategy: Dict[str, Dict[int, int]] = {}
+        self._traders: List[int] = []
+        self._loaded_at = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    def load(self, db: Session) -> int:
+        """
+        (Re)load subscriptions and trader ids and swap them in atomically
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of active subscriptions indexed
+        """
+        traders = [row.id for row in db.query(User.id).filter(User.role == UserRole.TRADER).all()]
+        rows = (
+            db.query(
+                UserStrategySubscription.user_id,
+                UserStrategySubscription.strategy_code,
+                UserStrategySubscription.qty_multiplier,
+            )
+            .join(User, User.id == UserStrategySubscription.user_id)
+            .filter(
+                UserStrategySubscription.is_active == True,
+                UserStrategySubscription.qty_multiplier > 0,
+                User.role == UserRole.TRADER,
+            )
+            .all()
+        )
+
+        by_strategy: Dict[str, Dict[int, int]] = {}
+        for row in rows:
+            by_strategy.setdefault(row.strategy_code, {})[row.user_id] = row.qty_multiplier
+
+        with self._lock:
+            self._by_strategy = by_strategy
+            self._traders = traders
+            self._loaded_at = time.monotonic()
+            self._loaded = True
+
+        logger.info(f"Strategy subscription index loaded: {len(rows)} subscriptions, {len(by_strategy)} strategies")
+        return len(rows)
+
+    def _ensure_fresh(self):
+        if self._loaded and time.monotonic() - self._loaded_at < self.refresh_s:
+            return
+        with self._reload_lock:
+            if self._loaded and time.monotonic() - self._loaded_at < self.refresh_s:
+                return
+            from app.db.db import SessionLocal
+            db = SessionLocal()
+            try:
+                self.load(db)
+            except Exception as e:
+                # Serve the previous index until the next refresh; with none, signals can't be routed
+                logger.error(f"Failed to load strategy subscriptions: {str(e)}")
+                if not self._loaded:
+                    raise
+                self._loaded_at = time.monotonic()
+            finally:
+                db.close()
+
+    def subscribers(self, strategy_code: str) -> Dict[int, int]:
+        """Trader id -> qty multiplier for a strategy's active subscriptions"""
+        self._ensure_fresh()
+        return dict(self._by_strategy.get(strategy_code, {}))
+
+    def traders(self) -> List[int]:
+        """Every TRADER id"""
+        self._ensure_fresh()
+        return list(self._traders)
+
+    def invalidate(self):
+        """Reload on the next lookup (after a subscription or trader changes)"""
+        self._loaded_at = 0.0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "traders": len(self._traders),
+                "strategies": len(self._by_strategy),
+                "subscriptions": sum(len(subs) for subs in self._by_strategy.values()),
+            }
+
+
+strategy_subscription_index = StrategySubscriptionIndex()
@@ -0,0 +1,143 @@
+"""
+In-process SymbolMaster cache keyed by token
+Loaded at startup and refreshed whenever an admin edits an instrument
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from sqlalchemy.orm import Session
+
+from app.models.models import SymbolMaster
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SymbolInfo:
+    """Read-only snapshot of the SymbolMaster columns used on the hot path"""
+    id: int
+    token: str
+    symbol: str
+    exchange: Any
+    lot_size: int
+    is_active: bool
+    is_deleted: bool
+
+
+class SymbolMasterCache:
+    """Shared, read-mostly token -> SymbolInfo map"""
+
+    def __init__(self):
+        self._by_token: Dict[str, SymbolInfo] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _to_info(row) -> SymbolInfo:
+        return SymbolInfo(
+            id=row.id,
+            token=row.token,
+            symbol=row.symbol,
+            exchange=row.exchange,
+            lot_size=row.lot_size or 1,
+            is_active=bool(row.is_active),
+            is_deleted=bool(row.is_deleted),
+        )
+
+    def load(self, db: Session) -> int:
+        """
+        (Re)load the whole table and swap it in atomically
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of symbols cached
+        """
+        rows = db.query(
+            SymbolMaster.id,
+            SymbolMaster.token,
+            SymbolMaster.symbol,
+            SymbolMaster.exchange,
+            SymbolMaster.lot_size,
+            SymbolMaster.is_active,
+            SymbolMaster.is_deleted,
+        ).all()
+
+        by_token = {row.token: self._to_info(row) for row in rows}
+        with self._lock:
+            self._by_token = by_token
+            self._loaded = True
+
+        logger.info(f"SymbolMaster cache loaded with {len(by_token)} symbols")
+        return len(by_token)
+
+    def refresh(self, db: Optional[Session] = None) -> int:
+        """Reload the cache, opening a short-lived session if none is given"""
+        if db is not None:
+            return self.load(db)
+
+        from app.db.db import SessionLocal
+        session = SessionLocal()
+        try:
+            return self.load(session)
+        finally:
+            session.close()
+
+    def invalidate(self):
+        """Drop the cached map; the next lookup reloads it"""
+        with self._lock:
+            self._by_token = {}
+            self._loaded = False
+
+    def get(self, token: str, db: Session) -> Optional[SymbolInfo]:
+        """
+        Look up a symbol by token
+
+        Falls back to a single-row query for tokens added to the table
+        outside the admin API, and caches the result.
+
+        Args:
+            token: Instrument token
+            db: Database session used for the initial load or a miss
+
+        Returns:
+            SymbolInfo, or None if the token does not exist
+        """
+        if not self._loaded:
+            self.load(db)
+
+        token = str(token)
+        info = self._by_token.get(token)
+        if info is not None:
+            return info
+
+        row = db.query(
+            SymbolMaster.id,
+            SymbolMaster.token,
+            SymbolMaster.symbol,
+            SymbolMaster.exchange,
+            SymbolMaster.lot_size,
+            SymbolMaster.is_active,
+            SymbolMaster.is_deleted,
+        ).filter(SymbolMaster.token == token).first()
+
+        if not row:
+            return None
+
+        info = self._to_info(row)
+        with self._lock:
+            self._by_token[token] = info
+        return info
+
+    def get_active(self, token: str, db: Session) -> Optional[SymbolInfo]:
+        """Look up a symbol by token, returning None unless active and not deleted"""
+        info = self.get(token, db)
+        if info is None or not info.is_active or info.is_deleted:
+            return None
+        return info
+
+
+symbol_master_cache = SymbolMasterCache()
@@ -0,0 +1,224 @@
+"""
+Write-behind buffer for tick data
+Tick endpoints enqueue rows and return; a background task bulk-inserts them.
+Rows whose insert fails go back on the queue and are retried for up to
+TICK_BUFFER_RETRY_MAX_S, so a short DB outage doesn't lose ticks
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.constants.const import (
+    TICK_BUFFER_FLUSH_INTERVAL_MS,
+    TICK_BUFFER_MAX_BATCH,
+    TICK_BUFFER_MAX_QUEUE,
+    TICK_BUFFER_RETRY_BACKOFF_S,
+    TICK_BUFFER_RETRY_MAX_S,
+)
+from app.models.models import SpotTickData, StrikePriceTickData
+
+logger = logging.getLogger(__name__)
+
+
+class TickBufferFullError(Exception):
+    """Raised when the write-behind queue is at max depth"""
+    pass
+
+
+class TickWriteBuffer:
+    """Asyncio write-behind queue for StrikePriceTickData and SpotTickData rows"""
+
+    def __init__(
+        self,
+        flush_interval_ms: int = TICK_BUFFER_FLUSH_INTERVAL_MS,
+        max_batch: int = TICK_BUFFER_MAX_BATCH,
+        max_queue: int = TICK_BUFFER_MAX_QUEUE,
+        retry_backoff_s: float = TICK_BUFFER_RETRY_BACKOFF_S,
+        retry_max_s: float = TICK_BUFFER_RETRY_MAX_S,
+    ):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.retry_backoff_s = retry_backoff_s
+        self.retry_max_s = retry_max_s
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.flush_count = 0
+        self.flushed_rows = {"strike": 0, "spot": 0}
+        self.failed_rows = {"strike": 0, "spot": 0}     # dropped after retries ran out
+        self.retried_rows = {"strike": 0, "spot": 0}
+        self.rejected_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.last_flush_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Create the queue and start the flusher; call from the event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._batch_ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Tick write buffer started (interval={self.flush_interval * 1000:.0f}ms, "
+            f"max_batch={self.max_batch}, max_queue={self.max_queue})"
+        )
+
+    async def stop(self):
+        """Stop the flusher and write out everything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                await self._flush_once(requeue=False)
+        logger.info("Tick write buffer stopped and drained")
+
+    def enqueue(self, model, row: Dict[str, Any]):
+        """
+        Queue one row for the next bulk insert
+
+        Args:
+            model: SpotTickData or StrikePriceTickData
+            row: Column dictionary
+
+        Raises:
+            TickBufferFullError: If the queue is at max depth
+        """
+        if self._queue is None:
+            raise TickBufferFullError("Tick write buffer is not running")
+        try:
+            self._queue.put_nowait((model, row, None))
+        except asyncio.QueueFull:
+            self.rejected_rows += 1
+            raise TickBufferFullError(f"Tick write buffer full ({self.max_queue} rows)")
+
+        if self._queue.qsize() >= self.max_batch:
+            self._batch_ready.set()
+
+    def enqueue_strike(self, row: Dict[str, Any]):
+        self.enqueue(StrikePriceTickData, row)
+
+    def enqueue_spot(self, row: Dict[str, Any]):
+        self.enqueue(SpotTickData, row)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+
+            while not self._queue.empty():
+                if not await self._flush_once():
+                    # DB trouble: back off instead of spinning on the re-queued rows
+                    await asyncio.sleep(self.retry_backoff_s)
+                    break
+
+    async def _flush_once(self, requeue: bool = True) -> bool:
+        """
+        Take up to max_batch rows off the queue and insert them, one transaction per table
+
+        Args:
+            requeue: Put rows of a failed insert back on the queue to retry
+
+        Returns:
+            False if either table's insert failed
+        """
+        batches: Dict[Any, List[Tuple[Dict[str, Any], Optional[float]]]] = {StrikePriceTickData: [], SpotTickData: []}
+        taken = 0
+        while taken < self.max_batch and not self._queue.empty():
+            model, row, failed_since = self._queue.get_nowait()
+            batches[model].append((row, failed_since))
+            taken += 1
+
+        if not taken:
+            return True
+
+        started = time.perf_counter()
+        ok = True
+        try:
+            for model, items in batches.items():
+                if not items:
+                    continue
+                table = "strike" if model is StrikePriceTickData else "spot"
+                try:
+                    await asyncio.to_thread(self._write, model, [row for row, _ in items])
+                    self.flushed_rows[table] += len(items)
+                except Exception as e:
+                    ok = False
+                    logger.error(f"Tick buffer {table} flush failed for {len(items)} rows: {str(e)}")
+                    self._retry_or_drop(model, table, items, requeue)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flush_count += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.last_flush_at = time.time()
+        return ok
+
+    def _retry_or_drop(self, model, table: str, items: List[Tuple[Dict[str, Any], Optional[float]]], requeue: bool):
+        """Re-queue a failed table's rows until they have been failing for retry_max_s"""
+        now = time.monotonic()
+        dropped = 0
+        for row, failed_since in items:
+            failed_since = failed_since or now
+            if not requeue or now - failed_since >= self.retry_max_s:
+                dropped += 1
+                continue
+            try:
+                self._queue.put_nowait((model, row, failed_since))
+                self.retried_rows[table] += 1
+            except asyncio.QueueFull:
+                dropped += 1
+        if dropped:
+            self.failed_rows[table] += dropped
+            logger.error(f"Tick buffer dropped {dropped} {table} rows after failed inserts")
+
+    @staticmethod
+    def _write(model, rows: List[Dict[str, Any]]):
+        from app.db.db import SessionLocal
+        from app.services.tick_service import TickLTPService
+
+        db = SessionLocal()
+        try:
+            TickLTPService.bulk_insert_rows(db, model, rows)
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and flush latency metrics"""
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "max_batch": self.max_batch,
+            "flush_interval_ms": self.flush_interval * 1000,
+            "flush_count": self.flush_count,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "retried_rows": self.retried_rows,
+            "rejected_rows": self.rejected_rows,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "last_flush_at": self.last_flush_at,
+        }
+
+
+tick_write_buffer = TickWriteBuffer()
@@ -2,11 +2,15 @@
 Service layer for Tick Data operations
 """
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from app.models.models import SpotTickData, StrikePriceTickData, HistoricalData, TimeFrame, SymbolMaster
+from app.models.models import SpotTickData, StrikePriceTickData, StrikeLatestLTP, HistoricalData, TimeFrame, SymbolMaster
 from app.schemas.schema import TickDataInsert, StrikePriceLTPInsert, OHLCDataInsert
+from app.services.symbol_cache import symbol_master_cache, SymbolInfo
+from app.services.ltp_store import latest_ltp_store
 
 
 class TickLTPService:
@@ -123,12 +127,8 @@ class TickLTPService:
             # ✔ Create trade_date (midnight IST)
             trade_date = ist_ts.date()
 
-            # Lookup symbol
-            symbol = db.query(SymbolMaster).filter(
-                SymbolMaster.token == tick_data.token,
-                # SymbolMaster.is_active == True, # for inserting spot price for MCX proper clarifications  need 
-                # SymbolMaster.is_deleted == False
-            ).first()
+            # Lookup symbol (in-process cache; active/deleted not enforced, for inserting spot price for MCX proper clarifications need)
+            symbol = symbol_master_cache.get(tick_data.token, db)
 
             if not symbol:
                 raise Exception(f"Symbol with token '{tick_data.token}' not found or inactive")
@@ -145,6 +145,8 @@ class TickLTPService:
             db.commit()
             db.refresh(db_tick)
 
+            latest_ltp_store.update(symbol.token, tick_data.ltp, symbol=symbol.symbol, timestamp=ist_ts)
+
             return db_tick
 
         except Exception as e:
@@ -175,8 +177,16 @@ class TickLTPService:
             )
             
             db.add(db_strike_ltp)
+            TickLTPService.upsert_strike_latest_ltp(db, [{
+                "token": strike_ltp_data.token,
+                "symbol": strike_ltp_data.symbol,
+                "ltp": strike_ltp_data.ltp,
+                "created_at": ist_ts,
+            }])
             db.commit()
             db.refresh(db_strike_ltp)
+
+            latest_ltp_store.update(strike_ltp_data.token, strike_ltp_data.ltp, symbol=strike_ltp_data.symbol, timestamp=ist_ts)
             
             return db_strike_ltp
             
@@ -185,6 +195,203 @@ class TickLTPService:
             raise Exception(f"Error inserting strike price LTP data: {str(e)}")
 
     
+    @staticmethod
+    def build_strike_ltp_row(strike_ltp_data: StrikePriceLTPInsert, timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Build a strike_price_tick_data row
+
+        Stamped with the exchange timestamp when given (naive values are taken
+        as IST), otherwise with the current IST time.
+        """
+        if timestamp is None:
+            created_at = datetime.now(ZoneInfo("Asia/Kolkata"))
+        elif timestamp.tzinfo is None:
+            created_at = timestamp.replace(tzinfo=ZoneInfo("Asia/Kolkata"))
+        else:
+            created_at = timestamp.astimezone(ZoneInfo("Asia/Kolkata"))
+
+        return {
+            "token": strike_ltp_data.token,
+            "symbol": strike_ltp_data.symbol,
+            "ltp": strike_ltp_data.ltp,
+            "created_at": created_at,
+        }
+
+
+    @staticmethod
+    def build_spot_ltp_row(symbol_id: int, tick_data: TickDataInsert) -> Dict[str, Any]:
+        """
+        Build a spot_tick_data row from an ISO timestamp tick
+        """
+        ist_ts = datetime.fromisoformat(tick_data.timestamp)
+        if ist_ts.tzinfo is None:
+            ist_ts = ist_ts.replace(tzinfo=ZoneInfo("Asia/Kolkata"))
+        else:
+            ist_ts = ist_ts.astimezone(ZoneInfo("Asia/Kolkata"))
+
+        return {
+            "symbol_id": symbol_id,
+            "timestamp": ist_ts,
+            "ltp": tick_data.ltp,
+            "trade_date": ist_ts.date(),
+        }
+
+
+    @staticmethod
+    def resolve_spot_symbol(db: Session, token: str) -> SymbolInfo:
+        """
+        Resolve a spot token to its cached symbol_master entry
+
+        Raises:
+            Exception: If token not found
+        """
+        symbol = symbol_master_cache.get(token, db)
+        if not symbol:
+            raise Exception(f"Symbol with token '{token}' not found or inactive")
+        return symbol
+
+
+    @staticmethod
+    def publish_strike_ltp(row: Dict[str, Any]):
+        """Update the in-process latest-LTP store from a strike tick row"""
+        latest_ltp_store.update(row["token"], row["ltp"], symbol=row["symbol"], timestamp=row["created_at"])
+
+
+    @staticmethod
+    def publish_spot_ltp(symbol: SymbolInfo, row: Dict[str, Any]):
+        """Update the in-process latest-LTP store from a spot tick row"""
+        latest_ltp_store.update(symbol.token, row["ltp"], symbol=symbol.symbol, timestamp=row["timestamp"])
+
+
+    @staticmethod
+    def upsert_strike_latest_ltp(db: Session, rows: List[Dict[str, Any]]):
+        """
+        Upsert strike_latest_ltp from strike tick rows (caller commits)
+
+        Rows are collapsed to the newest tick per (token, symbol) first, since
+        one INSERT ... ON CONFLICT cannot update the same row twice.
+        """
+        latest: Dict[tuple, Dict[str, Any]] = {}
+        for row in rows:
+            key = (row["token"], row["symbol"])
+            if key not in latest or row["created_at"] >= latest[key]["created_at"]:
+                latest[key] = row
+
+        if not latest:
+            return
+
+        stmt = pg_insert(StrikeLatestLTP).values([
+            {
+                "token": row["token"],
+                "symbol": row["symbol"],
+                "ltp": row["ltp"],
+                "updated_at": row["created_at"],
+            }
+            for row in latest.values()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StrikeLatestLTP.token, StrikeLatestLTP.symbol],
+            set_={
+                "ltp": stmt.excluded.ltp,
+                "updated_at": stmt.excluded.updated_at,
+            },
+            where=StrikeLatestLTP.updated_at <= stmt.excluded.updated_at,
+        )
+        db.execute(stmt)
+
+
+    @staticmethod
+    def bulk_insert_rows(db: Session, model, rows: List[Dict[str, Any]]) -> int:
+        """
+        Persist rows for a tick model with a single multi-row INSERT and one commit
+
+        Strike ticks also upsert strike_latest_ltp in the same transaction.
+
+        Args:
+            db: Database session
+            model: SpotTickData or StrikePriceTickData
+            rows: Column dictionaries
+
+        Returns:
+            Number of rows inserted
+        """
+        if not rows:
+            return 0
+
+        try:
+            db.execute(insert(model).values(rows))
+            if model is StrikePriceTickData:
+                TickLTPService.upsert_strike_latest_ltp(db, rows)
+            db.commit()
+            return len(rows)
+
+        except Exception:
+            db.rollback()
+            raise
+
+
+    @staticmethod
+    def insert_strike_ltp_batch(db: Session, strike_ltp_data: List[StrikePriceLTPInsert]) -> int:
+        """
+        Insert a batch of strike price LTP ticks with a single multi-row INSERT
+
+        Args:
+            db: Database session
+            strike_ltp_data: List of strike price ticks
+
+        Returns:
+            Number of rows inserted
+        """
+        try:
+            rows = [TickLTPService.build_strike_ltp_row(tick) for tick in strike_ltp_data]
+            inserted = TickLTPService.bulk_insert_rows(db, StrikePriceTickData, rows)
+
+            for row in rows:
+                TickLTPService.publish_strike_ltp(row)
+
+            return inserted
+
+        except Exception as e:
+            raise Exception(f"Error inserting strike price LTP batch: {str(e)}")
+
+
+    @staticmethod
+    def insert_spot_ltp_batch(db: Session, tick_data: List[TickDataInsert]) -> int:
+        """
+        Insert a batch of spot ticks with cached symbol lookups and a single multi-row INSERT
+
+        Args:
+            db: Database session
+            tick_data: List of spot ticks (with token)
+
+        Returns:
+            Number of rows inserted
+
+        Raises:
+            Exception: If any token is not found or database operation fails
+        """
+        try:
+            symbols = {}
+            for tick in tick_data:
+                if tick.token not in symbols:
+                    symbols[tick.token] = symbol_master_cache.get(tick.token, db)
+
+            missing = {token for token, symbol in symbols.items() if symbol is None}
+            if missing:
+                raise Exception(f"Symbols with tokens {sorted(missing)} not found or inactive")
+
+            rows = [TickLTPService.build_spot_ltp_row(symbols[tick.token].id, tick) for tick in tick_data]
+            inserted = TickLTPService.bulk_insert_rows(db, SpotTickData, rows)
+
+            for tick, row in zip(tick_data, rows):
+                TickLTPService.publish_spot_ltp(symbols[tick.token], row)
+
+            return inserted
+
+        except Exception as e:
+            raise Exception(f"Error inserting spot LTP batch: {str(e)}")
+
+
     @staticmethod
     def format_spot_ltp_response(db_tick: SpotTickData) -> Dict[str, Any]:
         """
@@ -45,7 +45,10 @@ class TradeService:
     def create_trade(db: Session, trade_data: TradeCreate) -> Trade:
         """Create master trade, then execute orders for all active users"""
         from app.models.models import AngelOneCredentials, DhanCredentials, User, Order, OrderStatus, OrderType
-        from app.services.broker_services import place_angelone_order_standalone, place_dhan_order_standalone
+        from app.services.broker_services import submit_angelone_order_standalone, place_dhan_order_standalone
+        from app.services.broker_dispatcher import broker_dispatcher
+        from app.services.paper_trading import paper_traders
+        from contextlib import ExitStack
         import concurrent.futures
 
         try:
@@ -73,114 +76,120 @@ class TradeService:
             # For now, get all active users who are not SUPERADMIN maybe? Or just all active users.
             # Assuming logic: All active users get the trade.
             active_users = db.query(User).filter(User.is_active == True).all()
+            user_ids = [user.id for user in active_users]
 
-            broker_responses = []
-
-            # 3. Define Execution Helper (Per User)
-            def process_user_order(user):
-                order_responses = []
-                
-                # A. Fetch Credentials
-                angel_creds = db.query(AngelOneCredentials).filter(
-                    AngelOneCredentials.user_id == user.id, 
+            # A. Fetch Credentials for every user up front; broker calls run off this thread
+            # and must not share the request's session
+            angel_creds = {
+                creds.user_id: {
+                    "api_key": creds.api_key,
+                    "username": creds.username,
+                    "pwd": creds.password,
+                    "token": creds.token,
+                }
+                for creds in db.query(AngelOneCredentials).filter(
+                    AngelOneCredentials.user_id.in_(user_ids),
                     AngelOneCredentials.is_active == True
-                ).first()
-                
-                dhan_creds = db.query(DhanCredentials).filter(
-                    DhanCredentials.user_id == user.id, 
+                ).all()
+            }
+            dhan_creds = {
+                creds.user_id: {"client_id": creds.client_id, "access_token": creds.access_token}
+                for creds in db.query(DhanCredentials).filter(
+                    DhanCredentials.user_id.in_(user_ids),
                     DhanCredentials.is_active == True
-                ).first()
+                ).all()
+            }
 
-                # B. Execute Angel Order
-                if angel_creds:
-                    try:
-                        params = {
-                            "variety": "NORMAL",
-                            "tradingsymbol": trade_data.symbol,
-                            "symboltoken": str(trade_data.strike_price),
-                            "transactiontype": "BUY",
-                            "exchange": "NSE",
-                            "ordertype": "MARKET",
-                            "producttype": "INTRADAY",
-                            "duration": "DAY",
-                            "price": "0",
-                            "quantity": str(trade_data.entry_qty)
-                        }
-                        # CALL BROKER
-                        response = place_angelone_order_standalone(
-                            api_key=angel_creds.api_key,
-                            username=angel_creds.username,
-                            pwd=angel_creds.password,
-                            token=angel_creds.token,
-                            order_params=params
-                        )
-                        
-                        # CREATE ORDER RECORD
-                        angel_order = Order(
-                            user_id=user.id,
-                            trade_id=master_trade.id,
-                            symbol=trade_data.symbol,
-                            underlying=trade_data.underlying,
-                            order_type=OrderType.BUY, # Assuming Entry is BUY
-                            qty=trade_data.entry_qty,
-                            price=0, # Market Order
-                            status=OrderStatus.PLACED if response.get('status') else OrderStatus.REJECTED,
-                            broker_order_id=response.get('data', {}).get('orderid'),
-                            exchange="NSE",
-                            status_message=str(response)
-                        )
-                        db.add(angel_order)
-                        order_responses.append({"user": user.id, "broker": "AngelOne", "status": "Sent"})
-                    except Exception as ex:
-                        logger.error(f"User {user.id} Angel Exec Failed: {ex}")
-                        order_responses.append({"user": user.id, "broker": "AngelOne", "error": str(ex)})
+            angel_params = {
+                "variety": "NORMAL",
+                "tradingsymbol": trade_data.symbol,
+                "symboltoken": str(trade_data.strike_price),
+                "transactiontype": "BUY",
+                "exchange": "NSE",
+                "ordertype": "MARKET",
+                "producttype": "INTRADAY",
+                "duration": "DAY",
+                "price": "0",
+                "quantity": str(trade_data.entry_qty)
+            }
+            dhan_params = {
+                "security_id": str(trade_data.strike_price),
+                "exchange_segment": "NSE_EQ", 
+                "transaction_type": "BUY",
+                "order_type": "MARKET",
+                "product_type": "INTRA",
+                "quantity": trade_data.entry_qty,
+                "price": 0
+            }
 
-                # C. Execute Dhan Order
-                if dhan_creds:
-                    try:
-                        params = {
-                            "security_id": str(trade_data.strike_price),
-                            "exchange_segment": "NSE_EQ", 
-                            "transaction_type": "BUY",
-                            "order_type": "MARKET",
-                            "product_type": "INTRA",
-                            "quantity": trade_data.entry_qty,
-                            "price": 0
-                        }
-                        # CALL BROKER
-                        response = place_dhan_order_standalone(
-                            client_id=dhan_creds.client_id,
-                            access_token=dhan_creds.access_token,
-                            order_params=params
-                        )
-                        
-                        # CREATE ORDER RECORD
-                        dhan_order = Order(
-                            user_id=user.id,
-                            trade_id=master_trade.id,
-                            symbol=trade_data.symbol,
-                            underlying=trade_data.underlying,
-                            order_type=OrderType.BUY,
-                            qty=trade_data.entry_qty,
-                            price=0,
-                            status=OrderStatus.PLACED if response.get('status') else OrderStatus.REJECTED,
-                            broker_order_id=response.get('data', {}).get('orderId'),
-                            exchange="NSE",
-                            status_message=str(response)
-                        )
-                        db.add(dhan_order)
-                        order_responses.append({"user": user.id, "broker": "Dhan", "status": "Sent"})
-                    except Exception as ex:
-                        logger.error(f"User {user.id} Dhan Exec Failed: {ex}")
-                        order_responses.append({"user": user.id, "broker": "Dhan", "error": str(ex)})
-                
-                return order_responses
+            def submit_angel(creds, paper):
+                # Returns once the first attempt is made; retries back off on the dispatcher
+                # timer instead of this worker, and the AngelOne slot is held until they finish
+                if paper:
+                    return submit_angelone_order_standalone(order_params=angel_params, paper=True, **creds)
+                slot = ExitStack()
+                slot.enter_context(broker_dispatcher.limit("angelone"))
+                try:
+                    placed = submit_angelone_order_standalone(order_params=angel_params, **creds)
+                except BaseException:
+                    slot.close()
+                    raise
+                placed.add_done_callback(lambda _: slot.close())
+                return placed
+
+            def place_dhan(creds, paper):
+                if paper:
+                    return place_dhan_order_standalone(order_params=dhan_params, paper=True, **creds)
+                with broker_dispatcher.limit("dhan"):
+                    return place_dhan_order_standalone(order_params=dhan_params, **creds)
+
+            # 3. Define Execution Helper (Per User): both brokers at once, one outcome per user
+            def process_user_order(user_id):
+                legs = {}
+                paper = paper_traders.is_paper(user_id)
+                if user_id in angel_creds:
+                    legs["AngelOne"] = lambda: submit_angel(angel_creds[user_id], paper)
+                if user_id in dhan_creds:
+                    legs["Dhan"] = lambda: place_dhan(dhan_creds[user_id], paper)
+                results = broker_dispatcher.run_concurrently(legs)
+                # The AngelOne leg finishes with the Future of its (possibly still retrying) order
+                if "AngelOne" in results and results["AngelOne"].exception() is None:
+                    results["AngelOne"] = results["AngelOne"].result()
+                return user_id, results
 
             # 4. Execute for All Users Parallelly
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                futures = [executor.submit(process_user_order, user) for user in active_users]
-                for future in concurrent.futures.as_completed(futures):
-                    broker_responses.extend(future.result())
+            futures = [broker_dispatcher.submit(process_user_order, user_id) for user_id in user_ids]
+
+            broker_responses = []
+            order_id_keys = {"AngelOne": "orderid", "Dhan": "orderId"}
+            for future in concurrent.futures.as_completed(futures):
+                user_id, results = future.result()
+                outcome = {"user": user_id, "brokers": {}}
+                for broker, result in results.items():
+                    # An AngelOne leg may still be retrying; only this request thread waits on it
+                    if result.exception() is not None:
+                        logger.error(f"User {user_id} {broker} Exec Failed: {result.exception()}")
+                        outcome["brokers"][broker] = {"error": str(result.exception())}
+                        continue
+
+                    # CREATE ORDER RECORD
+                    response = result.result()
+                    raw = response.data or {}
+                    db.add(Order(
+                        user_id=user_id,
+                        trade_id=master_trade.id,
+                        symbol=trade_data.symbol,
+                        underlying=trade_data.underlying,
+                        order_type=OrderType.BUY, # Assuming Entry is BUY
+                        qty=trade_data.entry_qty,
+                        price=0, # Market Order
+                        status=OrderStatus.PLACED if response.success else OrderStatus.REJECTED,
+                        broker_order_id=(raw.get('data') or {}).get(order_id_keys[broker]),
+                        exchange="NSE",
+                        status_message=str(response.to_dict())
+                    ))
+                    outcome["brokers"][broker] = {"status": "Sent"}
+                broker_responses.append(outcome)
 
             db.commit() # Commit all new orders
             logger.info(f"Master Trade {master_trade.id} execution completed. Responses: {broker_responses}")
@@ -258,6 +267,7 @@ class TradeService:
         """Close master trade and execute exit orders for all participating users"""
         from app.models.models import AngelOneCredentials, DhanCredentials, Order, OrderType, OrderStatus
         from app.services.broker_services import place_angelone_order_standalone, place_dhan_order_standalone
+        from app.services.paper_trading import paper_traders
         import concurrent.futures
 
         try:
@@ -316,7 +326,8 @@ class TradeService:
                             username=angel_creds.username,
                             pwd=angel_creds.password,
                             token=angel_creds.token,
-                            order_params=params
+                            order_params=params,
+                            paper=paper_traders.is_paper(user_id)
                         )
                         
                         # CREATE EXIT ORDER RECORD
@@ -355,7 +366,8 @@ class TradeService:
                         response = place_dhan_order_standalone(
                             client_id=dhan_creds.client_id,
                             access_token=dhan_creds.access_token,
-                            order_params=params
+                            order_params=params,
+                            paper=paper_traders.is_paper(user_id)
                         )
                         
                         # CREATE EXIT ORDER RECORD
@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 from app.models.models import User
 from app.schemas.schema import UserCreate, UserUpdate, UserSchema
 from app.utils.security import SecurityUtils
+from app.services.strategy_subscriptions import strategy_subscription_index
 
 logger = logging.getLogger(__name__)
 
@@ -61,6 +62,7 @@ class UserService:
             )
             db.add(new_user)
             db.commit()
+            strategy_subscription_index.invalidate()
             db.refresh(new_user)
             logger.info(f"Created new user: {new_user.email}")
             return new_user
@@ -90,6 +92,7 @@ class UserService:
                 setattr(user, key, value)
             
             db.commit()
+            strategy_subscription_index.invalidate()
             db.refresh(user)
             logger.info(f"Updated user: {user_id}")
             return user
@@ -109,6 +112,7 @@ class UserService:
             
             db.delete(user)
             db.commit()
+            strategy_subscription_index.invalidate()
             logger.info(f"Deleted user: {user_id}")
             return True
         except Exception as e:
@@ -0,0 +1,247 @@
+"""
+Local stand-in for the Dhan and AngelOne order APIs, for load testing
+
+Answers the calls the simulated clients in app/services/broker_simulator.py
+make, with Dhan / SmartAPI shaped payloads, configurable latency, error rate
+and a per-account rate limit. Point the API (and outbox workers) at it with
+BROKER_SIMULATOR_URL:
+
+    python broker_simulator_server.py --port 8900 --latency-ms 80 --jitter-ms 40 --error-rate 0.01
+    BROKER_SIMULATOR_URL=http://127.0.0.1:8900 uvicorn app.main:app
+
+Every trader's orders then go to the simulator instead of the real brokers.
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+app = FastAPI(title="Broker Simulator")
+
+config = {
+    "latency_ms": 50.0,
+    "jitter_ms": 20.0,
+    "error_rate": 0.0,
+    "rate_limit": 25.0,     # orders per second per account, like Dhan's order API
+    "fill_price": 100.0,
+}
+
+_order_ids = itertools.count(1)
+_orders: Dict[str, Dict[str, Any]] = {}
+_buckets: Dict[str, Dict[str, float]] = {}
+_stats = defaultdict(int)
+_lock = threading.Lock()
+
+
+async def _broker_delay():
+    latency = config["latency_ms"] + random.uniform(-config["jitter_ms"], config["jitter_ms"])
+    await asyncio.sleep(max(0.0, latency) / 1000)
+
+
+def _take_token(account: str) -> bool:
+    """Token bucket per account; False when over the rate limit"""
+    rate = config["rate_limit"]
+    if rate <= 0:
+        return True
+    now = time.monotonic()
+    with _lock:
+        bucket = _buckets.setdefault(account, {"tokens": rate, "at": now})
+        bucket["tokens"] = min(rate, bucket["tokens"] + (now - bucket["at"]) * rate)
+        bucket["at"] = now
+        if bucket["tokens"] < 1:
+            return False
+        bucket["tokens"] -= 1
+        return True
+
+
+def _count(key: str):
+    with _lock:
+        _stats[key] += 1
+
+
+def _dhan_failure(code: str, error_type: str, message: str) -> Dict[str, Any]:
+    return {
+        "status": "failure",
+        "remarks": {"error_code": code, "error_type": error_type, "error_message": message},
+        "data": {"errorType": error_type, "errorCode": code, "errorMessage": message},
+    }
+
+
+def _angelone_failure(code: str, message: str) -> Dict[str, Any]:
+    return {"status": False, "message": message, "errorcode": code, "data": None}
+
+
+# ==================== Dhan ====================
+
+@app.post("/dhan/orders")
+async def dhan_place_order(request: Request):
+    body = await request.json()
+    account = request.headers.get("client-id", "")
+    await _broker_delay()
+
+    if not _take_token(account):
+        _count("dhan_rate_limited")
+        return _dhan_failure("DH-904", "Rate_Limit", "Too many requests")
+    if random.random() < config["error_rate"]:
+        _count("dhan_errors")
+        return _dhan_failure("DH-908", "Internal_Server_Error", "Simulated broker error")
+
+    order_id = str(next(_order_ids))
+    with _lock:
+        _orders[order_id] = {
+            "dhanClientId": account,
+            "orderId": order_id,
+            "orderStatus": "TRADED",
+            "transactionType": body.get("transactionType"),
+            "securityId": body.get("securityId"),
+            "quantity": body.get("quantity"),
+            "averageTradedPrice": config["fill_price"],
+        }
+    _count("dhan_orders")
+    return {"status": "success", "remarks": "", "data": {"orderId": order_id, "orderStatus": "TRANSIT"}}
+
+
+@app.get("/dhan/orders")
+async def dhan_order_list(request: Request):
+    account = request.headers.get("client-id", "")
+    await _broker_delay()
+    with _lock:
+        orders = [order for order in _orders.values() if order.get("dhanClientId") == account]
+    return {"status": "success", "remarks": "", "data": orders}
+
+
+@app.get("/dhan/orders/{order_id}")
+async def dhan_get_order(order_id: str):
+    await _broker_delay()
+    order = _orders.get(order_id)
+    if order is None:
+        return _dhan_failure("DH-907", "Data_Error", "Order not found")
+    return {"status": "success", "remarks": "", "data": [order]}
+
+
+@app.get("/dhan/fundlimit")
+async def dhan_fund_limits(request: Request):
+    await _broker_delay()
+    return {
+        "status": "success",
+        "remarks": "",
+        "data": {"dhanClientId": request.headers.get("client-id", ""), "availabelBalance": 1000000.0},
+    }
+
+
+# ==================== AngelOne ====================
+
+@app.post("/angelone/login")
+async def angelone_login(request: Request):
+    body = await request.json()
+    await _broker_delay()
+    if random.random() < config["error_rate"]:
+        _count("angelone_errors")
+        return _angelone_failure("AB1004", "Something Went Wrong, Please Try After Sometime")
+    _count("angelone_logins")
+    return {
+        "status": True,
+        "message": "SUCCESS",
+        "errorcode": "",
+        "data": {
+            "clientcode": body.get("clientcode"),
+            "jwtToken": f"Bearer {uuid.uuid4().hex}",
+            "refreshToken": uuid.uuid4().hex,
+            "feedToken": uuid.uuid4().hex,
+        },
+    }
+
+
+@app.post("/angelone/orders")
+async def angelone_place_order(request: Request):
+    body = await request.json()
+    account = request.headers.get("Authorization", "")
+    await _broker_delay()
+
+    if not _take_token(account):
+        _count("angelone_rate_limited")
+        return _angelone_failure("AB1004", "Access denied because of exceeding access rate")
+    if random.random() < config["error_rate"]:
+        _count("angelone_errors")
+        return _angelone_failure("AB2001", "Internal Error")
+
+    order_id = f"{int(time.time())}{next(_order_ids):06d}"
+    with _lock:
+        _orders[order_id] = {
+            "account": account,
+            "orderid": order_id,
+            "status": "complete",
+            "orderstatus": "complete",
+            "transactiontype": body.get("transactiontype"),
+            "tradingsymbol": body.get("tradingsymbol"),
+            "symboltoken": body.get("symboltoken"),
+            "quantity": body.get("quantity"),
+            "averageprice": config["fill_price"],
+        }
+    _count("angelone_orders")
+    return {
+        "status": True,
+        "message": "SUCCESS",
+        "errorcode": "",
+        "data": {"script": body.get("tradingsymbol"), "orderid": order_id, "uniqueorderid": str(uuid.uuid4())},
+    }
+
+
+@app.get("/angelone/orders")
+async def angelone_order_book(request: Request):
+    account = request.headers.get("Authorization", "")
+    await _broker_delay()
+    with _lock:
+        orders = [order for order in _orders.values() if order.get("account") == account]
+    return {"status": True, "message": "SUCCESS", "errorcode": "", "data": orders or None}
+
+
+# ==================== Control ====================
+
+@app.get("/stats")
+async def stats():
+    with _lock:
+        return {"config": config, "counters": dict(_stats), "accounts": len(_buckets)}
+
+
+@app.post("/reset")
+async def reset():
+    with _lock:
+        _stats.clear()
+        _orders.clear()
+        _buckets.clear()
+    return {"reset": True}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Dhan/AngelOne order API simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=config["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"], help="0..1")
+    parser.add_argument("--rate-limit", type=float, default=config["rate_limit"], help="orders/s per account; 0 = off")
+    parser.add_argument("--fill-price", type=float, default=config["fill_price"])
+    args = parser.parse_args()
+
+    config.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        fill_price=args.fill_price,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,14 @@ import requests
 import pytz
 import sys
 import signal
+import json
+import os
+import mmap
+import struct
+import threading
+import queue
+import asyncio
+import websocket
 
 # ================== CONFIG ==================
 
@@ -78,8 +86,26 @@ def get_dhan_creds(id=2):
 # ]
 
 
-CREDENTIALS =[get_dhan_creds(),get_dhan_creds()]
-current_cred_index = 0
+def get_all_dhan_creds():
+    """Fetch every active admin dhan credential; one feed connection is opened per row"""
+    try:
+        url = "http://localhost:8000/db/signals/get-all-admin-dhan-creds"
+        resp = requests.get(url, timeout=5)
+        resp.raise_for_status()
+
+        creds = []
+        for rec in resp.json():
+            creds.append({
+                'id': rec.get('id'),
+                'client_id': str(rec.get('client_id', '')).strip(),
+                'access_token': str(rec.get('access_token', '')).strip(),
+            })
+        print(f"✅ Fetched {len(creds)} admin dhan credentials")
+        return [c for c in creds if c['client_id'] and c['access_token']]
+
+    except Exception as e:
+        print(f"❌ Error fetching credentials: {e}")
+        return []
 
 
 
@@ -100,6 +126,33 @@ global_secid_symbol_mapper_dict = {}
 # Graceful shutdown flag
 shutdown_flag = False
 
+# Tick ingest channel
+INGEST_WS_URL = "ws://localhost:8000/ws/ticks/ingest"
+INGEST_BATCH_SIZE = 200          # flush when this many ticks are buffered
+INGEST_FLUSH_INTERVAL = 0.2      # or after this many seconds
+INGEST_RECONNECT_INTERVAL = 2    # wait between reconnect attempts while the API is down
+INGEST_NACK_RETRY_INTERVAL = 1   # re-send a rejected batch after this, doubling per rejection
+INGEST_NACK_RETRY_MAX = 30       # up to this many seconds between re-sends
+
+# Local spool of ticks the API has not acknowledged yet
+SPOOL_PATH = "tick_spool.bin"
+SPOOL_MAX_BYTES = 64 * 1024 * 1024   # oldest unacked batches are dropped beyond this
+SPOOL_MAX_AGE = 6 * 60 * 60          # batches older than this are not replayed
+SPOOL_REPLAY_BATCH = 2000            # ticks per frame when replaying after a restart
+
+# Instrument assignment channel; polling is only a fallback while it is down
+ASSIGN_WS_URL = "ws://localhost:8000/ws/ticks/instruments"
+
+# Subscription maintenance
+RELOAD_INTERVAL = 5              # poll for newly assigned strikes when the push channel is down
+PRUNE_INTERVAL = 60              # reconcile against live strikes and unsubscribe the rest
+
+# Feed supervisor
+MAX_INSTRUMENTS_PER_CONNECTION = 5000   # Dhan limit per market feed connection
+FEED_STALE_TIMEOUT = 60                 # restart a connection with no ticks for this long
+FEED_RETRY_INTERVAL = 30                # retry dead connections this often
+TICK_QUEUE_SIZE = 100000
+
 def signal_handler(signum, frame):
     """Handle Ctrl+C gracefully"""
     global shutdown_flag
@@ -144,34 +197,470 @@ def get_new_strike_instruments():
         return []
 
 
-def insert_spot_ltp_api(token: str, ltp: float):
-    """Insert LTP data via API"""
+def get_live_strike_instruments():
+    """
+    Fetch the strikes that should currently be subscribed.
+    Returns None when the API can't be reached, so callers never
+    unsubscribe on a failed request.
+    """
     try:
-        url = "http://localhost:8000/api/tick/insert-strike-ltp"
-        payload = {
-            "token": str(token),
-            "ltp": float(ltp),
-            "symbol": global_secid_symbol_mapper_dict.get(token, token)
-        }
-        response = requests.post(url, json=payload, timeout=3)
-        response.raise_for_status()
-        return True
+        url = "http://localhost:8000/api/tick/get-live-strike-instruments"
+        resp = requests.get(url, timeout=5)
+        resp.raise_for_status()
+
+        instruments = []
+        for rec in resp.json().get("data", []):
+            token = str(rec["token"])
+            global_secid_symbol_mapper_dict[token] = rec["symbol"]
+            instruments.append(
+                (marketfeed_dict[rec["exchange"]], token, MarketFeed.Ticker)
+            )
+        return instruments
+
     except Exception as e:
+        print(f"❌ Error fetching live instruments: {e}")
+        return None
+
+
+class InstrumentAssignmentClient(threading.Thread):
+    """
+    Listens on the API's instrument channel for newly inserted strikes.
+
+    Frames are handed to the main loop through `assignments`; the main loop
+    acks a frame only after subscribing its instruments, and the API marks
+    rows started on that ack.
+    """
+
+    def __init__(self, url):
+        super().__init__(daemon=True, name="instrument-assign")
+        self.url = url
+        self.ws = None
+        self.assignments = queue.Queue()
+        self.stopping = False
+        self.last_error_print = 0
+
+    @property
+    def connected(self):
+        return self.ws is not None
+
+    def run(self):
+        while not self.stopping:
+            try:
+                ws = websocket.create_connection(self.url, timeout=5)
+                ws.settimeout(None)
+                self.ws = ws
+                print(f"✅ Instrument channel connected: {self.url}")
+                while not self.stopping:
+                    message = json.loads(ws.recv())
+                    if message.get("type") != "instruments":
+                        continue
+                    instruments = []
+                    for rec in message.get("instruments", []):
+                        token = str(rec["token"])
+                        global_secid_symbol_mapper_dict[token] = rec["symbol"]
+                        instruments.append(
+                            (marketfeed_dict[rec["exchange"]], token, MarketFeed.Ticker)
+                        )
+                    self.assignments.put((message.get("seq"), instruments))
+            except Exception as e:
+                if time.time() - self.last_error_print > 60:
+                    print(f"⚠️ Instrument channel error: {e} - falling back to polling")
+                    self.last_error_print = time.time()
+            finally:
+                ws, self.ws = self.ws, None
+                if ws is not None:
+                    try:
+                        ws.close()
+                    except Exception:
+                        pass
+            time.sleep(INGEST_RECONNECT_INTERVAL)
+
+    def take(self):
+        """Next (seq, instruments) frame, or None"""
+        try:
+            return self.assignments.get_nowait()
+        except queue.Empty:
+            return None
+
+    def ack(self, seq):
+        ws = self.ws
+        if ws is None:
+            return
+        try:
+            ws.send(json.dumps({"type": "ack", "seq": seq}))
+        except Exception as e:
+            print(f"⚠️ Instrument ack error: {e}")
+
+    def stop(self):
+        self.stopping = True
+        ws = self.ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+
+class TickSpool:
+    """
+    Append-only, memory-mapped file of tick batches not yet acked by the API.
+
+    Layout: a fixed header (magic, version, write offset, acked seq) followed
+    by records of (seq, created_at, length, json payload). The write offset
+    is advanced only after a record is fully written, so a crash mid-append
+    leaves the previous state intact. Writes land in the page cache through
+    the mapping and survive a process crash without an msync per batch.
+    """
+
+    HEADER = struct.Struct("<4sIQQ")     # magic, version, write_offset, acked_seq
+    RECORD = struct.Struct("<QdI")       # seq, created_at, payload length
+    MAGIC = b"TSPL"
+    VERSION = 1
+
+    def __init__(self, path=SPOOL_PATH, max_bytes=SPOOL_MAX_BYTES, max_age=SPOOL_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.dropped_batches = 0
+
+        exists = os.path.exists(path)
+        self.file = open(path, "r+b" if exists else "w+b")
+        if os.path.getsize(path) < max_bytes:
+            self.file.truncate(max_bytes)
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        self.capacity = len(self.mm)
+
+        magic, version, write_offset, acked_seq = self.HEADER.unpack_from(self.mm, 0)
+        if magic != self.MAGIC or version != self.VERSION or not (self.HEADER.size <= write_offset <= self.capacity):
+            write_offset, acked_seq = self.HEADER.size, 0
+            self._write_header(write_offset, acked_seq)
+        self.write_offset = write_offset
+        self.acked_seq = acked_seq
+
+    def _write_header(self, write_offset, acked_seq):
+        self.HEADER.pack_into(self.mm, 0, self.MAGIC, self.VERSION, write_offset, acked_seq)
+        self.write_offset = write_offset
+        self.acked_seq = acked_seq
+
+    def _records(self):
+        offset = self.HEADER.size
+        while offset + self.RECORD.size <= self.write_offset:
+            seq, created_at, length = self.RECORD.unpack_from(self.mm, offset)
+            start = offset + self.RECORD.size
+            if start + length > self.write_offset:
+                break
+            yield seq, created_at, bytes(self.mm[start:start + length])
+            offset = start + length
+
+    def _live_records(self):
+        """Unacked, unexpired records in append order"""
+        cutoff = time.time() - self.max_age
+        return [
+            (seq, created_at, payload)
+            for seq, created_at, payload in self._records()
+            if seq > self.acked_seq and created_at >= cutoff
+        ]
+
+    def load(self):
+        """Unacked batches as [(seq, ticks)], oldest first"""
+        return [(seq, json.loads(payload)) for seq, _, payload in self._live_records()]
+
+    def max_seq(self):
+        return max([self.acked_seq] + [seq for seq, _, _ in self._records()])
+
+    def append(self, seq, ticks):
+        """
+        Append one batch
+
+        Returns:
+            Seqs of older batches dropped to make room (normally empty)
+        """
+        payload = json.dumps(ticks, separators=(",", ":")).encode()
+        size = self.RECORD.size + len(payload)
+        if size > self.capacity - self.HEADER.size:
+            print(f"⚠️ Tick batch {seq} larger than the spool, kept in memory only")
+            return []
+
+        dropped = []
+        if self.write_offset + size > self.capacity:
+            dropped = self._compact(size)
+
+        offset = self.write_offset
+        self.RECORD.pack_into(self.mm, offset, seq, time.time(), len(payload))
+        self.mm[offset + self.RECORD.size:offset + size] = payload
+        self._write_header(offset + size, self.acked_seq)
+        return dropped
+
+    def _compact(self, needed):
+        """
+        Rewrite only live records from the start. If that is not enough,
+        drop the oldest until a quarter of the spool is free, so a full
+        spool is not compacted on every append.
+        """
+        live = self._live_records()
+        free = self.capacity - self.HEADER.size
+        used = sum(self.RECORD.size + len(p) for _, _, p in live)
+        dropped = []
+        if used + needed > free:
+            while live and used + needed > free * 3 // 4:
+                seq, _, payload = live.pop(0)
+                used -= self.RECORD.size + len(payload)
+                dropped.append(seq)
+
+        offset = self.HEADER.size
+        for seq, created_at, payload in live:
+            self.RECORD.pack_into(self.mm, offset, seq, created_at, len(payload))
+            self.mm[offset + self.RECORD.size:offset + self.RECORD.size + len(payload)] = payload
+            offset += self.RECORD.size + len(payload)
+        self._write_header(offset, self.acked_seq)
+
+        if dropped:
+            self.dropped_batches += len(dropped)
+            print(f"⚠️ Tick spool full: dropped {len(dropped)} oldest batches ({self.dropped_batches} so far)")
+        return dropped
+
+    def mark_acked(self, seq, empty=False):
+        """Everything up to seq is stored by the API; an empty spool rewinds to the start"""
+        acked_seq = max(self.acked_seq, seq)
+        self._write_header(self.HEADER.size if empty else self.write_offset, acked_seq)
+
+    def reset(self, acked_seq):
+        self._write_header(self.HEADER.size, acked_seq)
+
+    def close(self):
+        try:
+            self.mm.flush()
+            self.mm.close()
+            self.file.close()
+        except Exception:
+            pass
+
+
+class TickIngestClient:
+    """
+    One long-lived WebSocket to the API's /ws/ticks/ingest channel.
+
+    Ticks are buffered and sent as numbered batches; a batch stays in
+    `pending` until the API acks it, and unacked batches are re-sent in
+    order after a reconnect. A batch the API nacks (e.g. its DB is down)
+    is re-sent with backoff on the same connection. With a spool, pending
+    batches are also on disk, so ticks the API never acked are replayed
+    after a feed restart. Each tick carries its symbol, so replayed ticks
+    are stored under it even before any instruments are assigned again.
+    """
+
+    def __init__(self, url, batch_size=INGEST_BATCH_SIZE, flush_interval=INGEST_FLUSH_INTERVAL, spool=None):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool = spool
+
+        self.ws = None
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.pending = {}            # seq -> ticks, until acked
+        self.nacked = {}             # seq -> (retry_at, rejections), until acked
+        self.seq = 0
+        self.acked_seq = 0
+        self.last_flush = time.time()
+        self.last_error_print = 0
+        self.next_connect_at = 0
+
+        if self.spool is not None:
+            self._restore_from_spool()
+
+    def _restore_from_spool(self):
+        """Load unacked batches left by a previous run, re-chunked into large replay frames"""
+        batches = self.spool.load()
+        self.seq = self.acked_seq = self.spool.max_seq()
+        if not batches:
+            self.spool.reset(self.seq)
+            return
+
+        ticks = [tick for _, batch in batches for tick in batch]
+        self.spool.reset(self.seq)
+        for i in range(0, len(ticks), SPOOL_REPLAY_BATCH):
+            self.seq += 1
+            chunk = ticks[i:i + SPOOL_REPLAY_BATCH]
+            self.pending[self.seq] = chunk
+            for dropped in self.spool.append(self.seq, chunk):
+                self.pending.pop(dropped, None)
+        print(f"📼 Restored {len(ticks)} unacked ticks from spool in {len(self.pending)} batches")
+
+    # ---------- connection ----------
+
+    def connect(self):
+        if self.ws is not None:
+            return True
+        if time.time() < self.next_connect_at:
+            return False
+        self.next_connect_at = time.time() + INGEST_RECONNECT_INTERVAL
+        try:
+            ws = websocket.create_connection(self.url, timeout=5)
+            ws.settimeout(None)
+        except Exception as e:
+            self._log_error(f"⚠️ Ingest WS connect error: {e}")
+            return False
+
+        self.ws = ws
+        with self.lock:
+            self.nacked = {}
+        threading.Thread(target=self._read_acks, args=(ws,), daemon=True).start()
+        print(f"✅ Ingest WS connected: {self.url}")
+
+        # Re-send everything the API has not acknowledged yet, in order
+        with self.lock:
+            unacked = sorted(self.pending.items())
+        for seq, ticks in unacked:
+            if not self._send_batch(seq, ticks):
+                break
+        return self.ws is not None
+
+    def close(self):
+        ws, self.ws = self.ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self.spool is not None:
+            with self.lock:
+                spool, self.spool = self.spool, None
+                spool.close()
+
+    def _drop_connection(self, ws):
+        if self.ws is ws:
+            self.ws = None
+        try:
+            ws.close()
+        except Exception:
+            pass
+
+    def _read_acks(self, ws):
+        while True:
+            try:
+                message = json.loads(ws.recv())
+            except Exception:
+                self._drop_connection(ws)
+                return
+
+            if message.get("type") == "ack":
+                with self.lock:
+                    self.pending.pop(message.get("seq"), None)
+                    self.nacked.pop(message.get("seq"), None)
+                    self.acked_seq = max(self.acked_seq, message.get("seq") or 0)
+                    if self.spool is not None:
+                        # Only advance past batches acked without gaps
+                        acked_through = min(self.pending) - 1 if self.pending else self.seq
+                        self.spool.mark_acked(acked_through, empty=not self.pending)
+            elif message.get("type") == "nack":
+                seq = message.get("seq")
+                self._log_error(f"⚠️ Ingest batch {seq} rejected: {message.get('error')}")
+                with self.lock:
+                    if seq in self.pending:
+                        # Re-sent from the main loop (resend_nacked) once the backoff has passed
+                        _, rejections = self.nacked.get(seq, (0, 0))
+                        delay = min(INGEST_NACK_RETRY_MAX, INGEST_NACK_RETRY_INTERVAL * 2 ** rejections)
+                        self.nacked[seq] = (time.time() + delay, rejections + 1)
+
+    # ---------- sending ----------
+
+    def resend_nacked(self):
+        """Re-send rejected batches whose backoff has passed, oldest first"""
+        if self.ws is None or not self.nacked:
+            return
+        now = time.time()
+        with self.lock:
+            due = sorted(seq for seq, (retry_at, _) in self.nacked.items() if retry_at <= now)
+            batches = []
+            for seq in due:
+                retry_at, rejections = self.nacked[seq]
+                # Wait for the API's answer before the next re-send
+                self.nacked[seq] = (float("inf"), rejections)
+                if seq in self.pending:
+                    batches.append((seq, self.pending[seq]))
+                else:
+                    self.nacked.pop(seq)
+        for seq, ticks in batches:
+            if not self._send_batch(seq, ticks):
+                break
+
+    def _send_batch(self, seq, ticks):
+        ws = self.ws
+        if ws is None:
+            return False
+        try:
+            ws.send(json.dumps({"type": "ticks", "seq": seq, "ticks": ticks}))
+            return True
+        except Exception as e:
+            self._log_error(f"⚠️ Ingest WS send error: {e}")
+            self._drop_connection(ws)
+            return False
+
+    def add(self, token, ltp, exchange_ts=None):
+        """Buffer one tick; flushes on batch size or interval"""
+        token = str(token)
+        self.buffer.append([token, float(ltp), exchange_ts, global_secid_symbol_mapper_dict.get(token)])
+        if len(self.buffer) >= self.batch_size or time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush_if_due(self):
+        if time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+        self.resend_nacked()
+
+    def flush(self):
+        self.last_flush = time.time()
+        if self.buffer:
+            ticks, self.buffer = self.buffer, []
+            with self.lock:
+                self.seq += 1
+                seq = self.seq
+                self.pending[seq] = ticks
+                if self.spool is not None:
+                    # Ticks the spool had to give up are not replayed from memory either
+                    for dropped in self.spool.append(seq, ticks):
+                        self.pending.pop(dropped, None)
+            if self.ws is not None:
+                self._send_batch(seq, ticks)
+
+        if self.ws is None and self.pending:
+            self.connect()
+
+    def _log_error(self, msg):
         # Don't spam logs with errors
-        if hasattr(insert_spot_ltp_api, 'last_error_print'):
-            if time.time() - insert_spot_ltp_api.last_error_print > 60:
-                print(f"⚠️ LTP insert error: {e}")
-                insert_spot_ltp_api.last_error_print = time.time()
-        else:
-            insert_spot_ltp_api.last_error_print = time.time()
+        if time.time() - self.last_error_print > 60:
+            print(msg)
+            self.last_error_print = time.time()
+
+
+ingest_client = TickIngestClient(INGEST_WS_URL, spool=TickSpool(SPOOL_PATH))
+
+
+def exchange_timestamp(response):
+    """Exchange time of a Ticker packet as an IST ISO string (None if absent)"""
+    ltt = response.get('LTT')
+    if not ltt:
+        return None
+    try:
+        t = datetime.strptime(ltt, "%H:%M:%S").time()
+        return ist.localize(datetime.combine(datetime.now(ist).date(), t)).isoformat()
+    except (ValueError, TypeError):
+        return None
+
+
+def insert_spot_ltp_api(token: str, ltp: float, exchange_ts=None):
+    """Queue LTP data on the long-lived ingest WebSocket"""
+    try:
+        ingest_client.add(token, ltp, exchange_ts)
+        return True
+    except Exception as e:
+        ingest_client._log_error(f"⚠️ LTP insert error: {e}")
         return False
 
 # ================== WS HELPERS ==================
 
-def start_ws(instruments, cred_index=0):
+def start_ws(instruments, cred):
     """Start WebSocket connection with specific credentials"""
-    cred = CREDENTIALS[cred_index]
-    print('cred',cred)
     client_id = cred['client_id']
     access_token = cred['access_token']
     
@@ -199,10 +688,239 @@ def stop_ws(ws):
     except Exception as e:
         print(f"⚠️ Disconnect error: {e}")
 
+
+class FeedConnection(threading.Thread):
+    """
+    One MarketFeed connection on its own thread, bound to one admin credential.
+
+    MarketFeed is not thread-safe, so subscribe/unsubscribe requests are
+    queued and applied by the owning thread between packets. Every packet
+    is put on the supervisor's shared tick queue.
+    """
+
+    def __init__(self, index, cred, instruments, tick_queue):
+        super().__init__(daemon=True, name=f"feed-{index}")
+        self.index = index
+        self.cred = cred
+        self.instruments = dict(instruments)    # token -> (exchange, token, sub_type)
+        self.tick_queue = tick_queue
+        self.ops = queue.Queue()
+        self.alive = True
+        self.stopping = False
+        self.ws = None
+        self.last_tick_time = time.time()
+        self.tick_count = 0
+
+    @property
+    def load(self):
+        return len(self.instruments)
+
+    def subscribe(self, instruments):
+        for inst in instruments:
+            self.instruments[inst[1]] = inst
+        self.ops.put(("subscribe", instruments))
+
+    def unsubscribe(self, instruments):
+        for inst in instruments:
+            self.instruments.pop(inst[1], None)
+        self.ops.put(("unsubscribe", instruments))
+
+    def stop(self):
+        self.stopping = True
+
+    def _apply_ops(self):
+        while True:
+            try:
+                op, instruments = self.ops.get_nowait()
+            except queue.Empty:
+                return
+            if op == "subscribe":
+                self.ws.subscribe_symbols(instruments)
+            else:
+                self.ws.unsubscribe_symbols(instruments)
+
+    def run(self):
+        # MarketFeed drives its socket through the thread's event loop
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        try:
+            self.ws = start_ws(list(self.instruments.values()), self.cred)
+            self.last_tick_time = time.time()
+            while not self.stopping:
+                self._apply_ops()
+                self.ws.run_forever()
+                response = self.ws.get_data()
+                if response:
+                    self.last_tick_time = time.time()
+                    self.tick_count += 1
+                    try:
+                        self.tick_queue.put_nowait(response)
+                    except queue.Full:
+                        pass
+        except Exception as e:
+            print(f"❌ Feed {self.index} (Client ID: {self.cred['client_id']}) died: {e}")
+        finally:
+            self.alive = False
+            if self.ws is not None:
+                stop_ws(self.ws)
+
+
+class FeedSupervisor:
+    """
+    Spreads subscriptions over one FeedConnection per admin credential and
+    merges every connection's ticks into a single queue.
+
+    New instruments go to the least-loaded live connection with room under
+    MAX_INSTRUMENTS_PER_CONNECTION. When a connection dies or goes stale it
+    is restarted with the same instruments; if that fails, its instruments
+    are moved onto the surviving connections.
+    """
+
+    def __init__(self, creds, max_per_connection=MAX_INSTRUMENTS_PER_CONNECTION):
+        self.creds = creds
+        self.max_per_connection = max_per_connection
+        self.ticks = queue.Queue(maxsize=TICK_QUEUE_SIZE)
+        self.connections = {}            # index -> FeedConnection
+        self.assignments = {}            # token -> connection index
+        self.unassigned = {}             # token -> instrument, waiting for capacity
+        self.last_retry = {}             # index -> last restart attempt
+
+    # ---------- connections ----------
+
+    def start(self, instruments):
+        for index, cred in enumerate(self.creds):
+            self._start_connection(index, {})
+        self.subscribe(instruments)
+
+    def _start_connection(self, index, instruments):
+        conn = FeedConnection(index, self.creds[index], instruments, self.ticks)
+        self.connections[index] = conn
+        self.last_retry[index] = time.time()
+        for token in instruments:
+            self.assignments[token] = index
+        conn.start()
+        return conn
+
+    def live_connections(self):
+        return [c for c in self.connections.values() if c.alive and not c.stopping]
+
+    def check_health(self):
+        """Restart dead or stale connections; move their instruments if they can't come back"""
+        now = time.time()
+        for index, conn in list(self.connections.items()):
+            if conn.alive and conn.load and now - conn.last_tick_time > FEED_STALE_TIMEOUT:
+                print(f"⚠️ Feed {index}: no ticks for {FEED_STALE_TIMEOUT}s - restarting")
+                conn.stop()
+                conn.alive = False
+
+            if conn.alive:
+                continue
+
+            orphaned = conn.instruments
+            conn.instruments = {}
+            for token in orphaned:
+                self.assignments.pop(token, None)
+
+            if now - self.last_retry.get(index, 0) >= FEED_RETRY_INTERVAL:
+                print(f"🔄 Restarting feed {index} with {len(orphaned)} instruments")
+                self._start_connection(index, orphaned)
+            elif orphaned:
+                # Don't leave instruments unwatched until the retry window opens
+                print(f"♻ Moving {len(orphaned)} instruments off dead feed {index}")
+                self.subscribe(list(orphaned.values()))
+
+        if self.unassigned:
+            self.subscribe(list(self.unassigned.values()))
+
+    def stop(self):
+        # Each connection disconnects its own feed on the way out
+        for conn in self.connections.values():
+            conn.stop()
+
+    # ---------- subscriptions ----------
+
+    @property
+    def subscriptions(self):
+        subs = dict(self.unassigned)
+        for conn in self.connections.values():
+            subs.update(conn.instruments)
+        return subs
+
+    def subscribe(self, instruments):
+        """Assign instruments to connections; returns the ones newly placed"""
+        placed = []
+        by_conn = {}
+        for inst in instruments:
+            token = inst[1]
+            if token in self.assignments:
+                continue
+            candidates = [
+                c for c in self.live_connections()
+                if c.load + len(by_conn.get(c.index, [])) < self.max_per_connection
+            ]
+            if not candidates:
+                self.unassigned[token] = inst
+                continue
+            conn = min(candidates, key=lambda c: c.load + len(by_conn.get(c.index, [])))
+            by_conn.setdefault(conn.index, []).append(inst)
+            self.assignments[token] = conn.index
+            self.unassigned.pop(token, None)
+            placed.append(inst)
+
+        for index, insts in by_conn.items():
+            self.connections[index].subscribe(insts)
+            for inst in insts:
+                symbol = global_secid_symbol_mapper_dict.get(inst[1], inst[1])
+                print(f"➕ Subscribed {symbol} ({inst[1]}) on feed {index}")
+
+        if self.unassigned:
+            print(f"⚠️ {len(self.unassigned)} instruments waiting for feed capacity")
+        return placed
+
+    def unsubscribe(self, tokens):
+        """Drop tokens from whichever connection holds them"""
+        removed = []
+        by_conn = {}
+        for token in tokens:
+            if self.unassigned.pop(token, None) is not None:
+                removed.append(token)
+                continue
+            index = self.assignments.pop(token, None)
+            if index is None:
+                continue
+            conn = self.connections[index]
+            if token in conn.instruments:
+                by_conn.setdefault(index, []).append(conn.instruments[token])
+            removed.append(token)
+
+        for index, insts in by_conn.items():
+            self.connections[index].unsubscribe(insts)
+            for inst in insts:
+                symbol = global_secid_symbol_mapper_dict.get(inst[1], inst[1])
+                print(f"➖ Unsubscribed {symbol} ({inst[1]}) from feed {index}")
+        return removed
+
+    # ---------- ticks ----------
+
+    def get_tick(self, timeout=0.1):
+        try:
+            return self.ticks.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stats(self):
+        return {
+            index: {
+                "alive": conn.alive,
+                "instruments": conn.load,
+                "ticks": conn.tick_count,
+            }
+            for index, conn in self.connections.items()
+        }
+
 # ================== MAIN LOOP ==================
 
 def main():
-    global shutdown_flag, current_cred_index
+    global shutdown_flag
     
     # Register signal handler
     signal.signal(signal.SIGINT, signal_handler)
@@ -210,19 +928,29 @@ def main():
     print("=" * 70)
     print("🚀 DHAN MARKET FEED STARTING")
     print("=" * 70)
+
+    creds = get_all_dhan_creds()
+    if not creds:
+        # Fall back to the single default credential
+        creds = [get_dhan_creds()]
+    print(f"🔌 Opening {len(creds)} feed connections")
     
-    # Start with default instruments
-    instruments = [
+    # Default instruments stay subscribed for the life of the process
+    base_instruments = [
         (MarketFeed.IDX, "25", MarketFeed.Ticker),
     ]
-    
-    ws = start_ws(instruments, current_cred_index)
-    known_tokens = {i[1] for i in instruments}
+    base_tokens = {i[1] for i in base_instruments}
+
+    supervisor = FeedSupervisor(creds)
+    supervisor.start(base_instruments)
+    ingest_client.connect()
+    assign_client = InstrumentAssignmentClient(ASSIGN_WS_URL)
+    assign_client.start()
     
     last_reload_check = 0
-    reload_interval = 5  # Check every 5 seconds
+    last_prune_check = time.time()
+    last_health_check = time.time()
     tick_count = 0
-    last_tick_time = time.time()
     
     while not shutdown_flag:
         try:
@@ -241,59 +969,60 @@ def main():
                     time.sleep(5)
                 continue
             
-            # ⏱ Check for new instruments every X seconds
+            # 📥 Strikes pushed by the API as soon as they are inserted
             current_time = time.time()
-            if current_time - last_reload_check > reload_interval:
+            assignment = assign_client.take()
+            while assignment is not None:
+                seq, new_instruments = assignment
+                if supervisor.subscribe(new_instruments):
+                    print(f"📋 Subscribed to {len(supervisor.subscriptions)} instruments")
+                assign_client.ack(seq)
+                assignment = assign_client.take()
+
+            # ⏱ Poll for new instruments only while the push channel is down
+            if not assign_client.connected and current_time - last_reload_check > RELOAD_INTERVAL:
                 new_instruments = get_new_strike_instruments()
-                new_tokens = {i[1] for i in new_instruments}
-                
-                # Check if we have NEW tokens (not subset of known tokens)
-                if new_tokens and not new_tokens.issubset(known_tokens):
-                    print(f"\n♻ New instruments detected → Restarting WS")
-                    known_tokens.update(new_tokens)
-                    
-                    # Combine old and new instruments, remove duplicates
-                    all_instruments = instruments + new_instruments
-                    unique_instruments = []
-                    seen = set()
-                    for inst in all_instruments:
-                        key = (inst[0], inst[1])
-                        if key not in seen:
-                            seen.add(key)
-                            unique_instruments.append(inst)
-                    
-                    instruments = unique_instruments
-                    stop_ws(ws)
-                    time.sleep(1)
-                    ws = start_ws(instruments, current_cred_index)
-                    tick_count = 0
-                
+                if supervisor.subscribe(new_instruments):
+                    print(f"📋 Subscribed to {len(supervisor.subscriptions)} instruments")
                 last_reload_check = current_time
+
+            # 🧹 Unsubscribe strikes that were exited or belong to a previous day
+            if current_time - last_prune_check > PRUNE_INTERVAL:
+                live_instruments = get_live_strike_instruments()
+                if live_instruments is not None:
+                    live_tokens = {i[1] for i in live_instruments} | base_tokens
+                    stale_tokens = [t for t in supervisor.subscriptions if t not in live_tokens]
+                    if supervisor.unsubscribe(stale_tokens):
+                        print(f"📋 Subscribed to {len(supervisor.subscriptions)} instruments")
+                last_prune_check = current_time
+
+            # 🩺 Restart dead feeds and rebalance their instruments
+            if current_time - last_health_check > 5:
+                supervisor.check_health()
+                last_health_check = current_time
             
-            # Process WebSocket data
-            ws.run_forever()
-            response = ws.get_data()
+            # Merged tick stream from every connection
+            response = supervisor.get_tick(timeout=0.1)
             
             if response:
                 tick_count += 1
-                last_tick_time = current_time
                 
                 if tick_count % 100 == 0:
                     now_time = datetime.now(ist).strftime("%H:%M:%S")
-                    print(f"📈 [{now_time}] Processed {tick_count} ticks")
+                    print(f"📈 [{now_time}] Processed {tick_count} ticks {supervisor.stats()}")
             
+            # Push out a partially filled batch on quiet instruments
+            ingest_client.flush_if_due()
+
             if not response or 'LTP' not in response or 'security_id' not in response:
-                # Check for connection timeout (no ticks for 60 seconds)
-                if current_time - last_tick_time > 60:
-                    print("⚠️ No ticks received for 60 seconds - forcing refresh...")
-                    raise Exception("Connection timeout - no ticks received")
                 continue
 
             # Process the tick
             try:
                 insert_spot_ltp_api(
                     token=str(response['security_id']),
-                    ltp=response['LTP']
+                    ltp=response['LTP'],
+                    exchange_ts=exchange_timestamp(response)
                 )
             except Exception as e:
                 print(f"Insert error: {e}")
@@ -303,31 +1032,15 @@ def main():
             shutdown_flag = True
         except Exception as e:
             print(f"❌ Error encountered: {e}")
-            print("🔄 Switching credentials and restarting WS...")
-            
-            # Rotate credentials
-            current_cred_index = (current_cred_index + 1) % len(CREDENTIALS)
-            
-            try:
-                stop_ws(ws)
-            except:
-                pass
-                
-            time.sleep(5)  # Wait before retry
-            try:
-                ws = start_ws(instruments, current_cred_index)
-                last_tick_time = time.time() # Reset timeout
-            except Exception as start_err:
-                print(f"❌ Failed to restart WS: {start_err}")
-                time.sleep(10)
+            time.sleep(1)
 
     # Cleanup
-    try:
-        stop_ws(ws)
-    except:
-        pass
+    assign_client.stop()
+    supervisor.stop()
+    ingest_client.flush()
+    ingest_client.close()
     print("\n✅ Program ended gracefully")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
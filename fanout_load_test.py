@@ -0,0 +1,273 @@
+"""
+Fanout load test: N synthetic traders x K signals against the broker simulator
+
+Seeds loadtest traders with simulator credentials, fires entry/exit signals at
+the v3 endpoints and reports per-trader order latency from the stage traces
+(signal_latency_traces) plus overall throughput. Every subscriber of the
+strategy (every TRADER with STRATEGY_SUBSCRIPTIONS_ENABLED=false) gets orders,
+so run it against a database used only for testing, with the API started as:
+
+    python broker_simulator_server.py --latency-ms 80
+    BROKER_SIMULATOR_URL=http://127.0.0.1:8900 uvicorn app.main:app
+
+    python fanout_load_test.py seed --traders 500 --angelone
+    python fanout_load_test.py run --signals 20 --concurrency 4 --token 13 \\
+        --strike-token 35001 --symbol NIFTY25NOV25000CE
+    python fanout_load_test.py cleanup
+
+The strike token must be an active SymbolMaster row.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+import pyotp
+from sqlalchemy import func
+
+from app.constants.const import STRATEGY_SUBSCRIPTIONS_ENABLED
+from app.db.db import SessionLocal
+from app.models.models import (
+    AngelOneCredentials, DhanCredentials, SignalLatencyTrace, User, UserRole, UserStrategySubscription,
+)
+from app.utils.security import SecurityUtils
+
+EMAIL_DOMAIN = "loadtest.local"
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    values = sorted(values)
+
+    def pick(p: float) -> float:
+        return round(values[min(len(values) - 1, int(p * len(values)))], 3)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(values[-1], 3)}
+
+
+# ==================== Seed / cleanup ====================
+
+def seed(traders: int, angelone: bool, strategy_code: str):
+    db = SessionLocal()
+    try:
+        existing = db.query(func.count(User.id)).filter(User.email.like(f"%@{EMAIL_DOMAIN}")).scalar()
+        password_hash = SecurityUtils.hash_password(uuid.uuid4().hex)
+        for i in range(existing, existing + traders):
+            email = f"loadtest_{i}@{EMAIL_DOMAIN}"
+            user = User(
+                email=email,
+                username=f"loadtest_{i}",
+                name=f"Load Test {i}",
+                password_hash=password_hash,
+                role=UserRole.TRADER,
+                is_active=True,
+            )
+            user.dhan_credentials = DhanCredentials(
+                email=email, client_id=f"SIM{i:07d}", access_token=uuid.uuid4().hex,
+            )
+            if angelone:
+                user.angel_credentials = AngelOneCredentials(
+                    email=email, api_key=uuid.uuid4().hex, username=f"SIMA{i:06d}",
+                    password="0000", token=pyotp.random_base32(), client_id=f"SIMA{i:06d}",
+                )
+            user.strategy_subscriptions = [UserStrategySubscription(strategy_code=strategy_code, qty_multiplier=1)]
+            db.add(user)
+        db.commit()
+        print(f"Seeded {traders} traders subscribed to {strategy_code} ({existing + traders} loadtest traders in total)")
+    finally:
+        db.close()
+
+
+def cleanup():
+    db = SessionLocal()
+    try:
+        users = db.query(User).filter(User.email.like(f"%@{EMAIL_DOMAIN}")).all()
+        for user in users:
+            db.delete(user)
+        db.commit()
+        print(f"Removed {len(users)} loadtest traders")
+    finally:
+        db.close()
+
+
+# ==================== Run ====================
+
+def _signal_body(args, unique_id: str, signal: str) -> Dict[str, Any]:
+    return {
+        "token": args.token,
+        "signal": signal,
+        "unique_id": unique_id,
+        "strategy_code": args.strategy_code,
+        "stop_loss": 0,
+        "target": 0,
+        "description": "fanout load test",
+        "strike_data": {
+            "token": args.strike_token,
+            "exchange": args.exchange,
+            "index_name": args.index_name,
+            "DOE": args.expiry,
+            "strike_price": args.strike_price,
+            "position": args.position,
+            "symbol": args.symbol,
+            "lot_qty": args.lot_qty,
+        },
+    }
+
+
+async def _fire_signals(args) -> Dict[str, Any]:
+    limiter = asyncio.Semaphore(args.concurrency)
+    http_ms: List[float] = []
+    signal_log_ids: List[int] = []
+    errors: List[str] = []
+
+    async with httpx.AsyncClient(base_url=args.api, timeout=120.0) as client:
+        async def post(path: str, body: Dict[str, Any]):
+            async with limiter:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(path, json=body)
+                    response.raise_for_status()
+                    http_ms.append((time.perf_counter() - started) * 1000)
+                    data = response.json().get("data") or {}
+                    if data.get("id") is not None:
+                        signal_log_ids.append(data["id"])
+                except Exception as e:
+                    errors.append(f"{path}: {str(e)}")
+
+        async def one_trade(n: int):
+            unique_id = f"loadtest-{uuid.uuid4().hex[:12]}-{n}"
+            await post("/db/signals/entry/v3", _signal_body(args, unique_id, "BUY_ENTRY"))
+            await asyncio.sleep(args.hold)
+            await post("/db/signals/exit/v3", _signal_body(args, unique_id, "BUY_EXIT"))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_trade(n) for n in range(args.signals)))
+        elapsed = time.perf_counter() - started
+
+    return {"http_ms": http_ms, "signal_log_ids": signal_log_ids, "errors": errors, "elapsed_s": elapsed}
+
+
+def _collect_traces(signal_log_ids: List[int], expected_orders: int, settle: float) -> List[SignalLatencyTrace]:
+    """Wait up to `settle` seconds for every trader's db_persist stage to be flushed"""
+    deadline = time.monotonic() + settle
+    db = SessionLocal()
+    try:
+        while True:
+            rows = (
+                db.query(SignalLatencyTrace)
+                .filter(SignalLatencyTrace.signal_log_id.in_(signal_log_ids))
+                .filter(SignalLatencyTrace.user_id.isnot(None))
+                .all()
+            )
+            persisted = sum(1 for row in rows if row.stage == "db_persist")
+            if persisted >= expected_orders or time.monotonic() >= deadline:
+                return rows
+            db.expire_all()
+            time.sleep(1.0)
+    finally:
+        db.close()
+
+
+def run(args):
+    db = SessionLocal()
+    try:
+        traders = db.query(func.count(User.id)).filter(User.role == UserRole.TRADER)
+        if STRATEGY_SUBSCRIPTIONS_ENABLED:
+            # Only the strategy's subscribers get orders
+            traders = traders.join(UserStrategySubscription, UserStrategySubscription.user_id == User.id).filter(
+                UserStrategySubscription.strategy_code == args.strategy_code,
+                UserStrategySubscription.is_active == True,
+            )
+        traders = traders.scalar()
+    finally:
+        db.close()
+
+    outcome = asyncio.run(_fire_signals(args))
+    signal_log_ids = outcome["signal_log_ids"]
+    rows = _collect_traces(signal_log_ids, len(signal_log_ids) * traders, args.settle) if signal_log_ids else []
+
+    broker_call: List[float] = []
+    persisted: List[float] = []
+    per_trader: Dict[int, List[float]] = {}
+    last_persist = 0.0
+    for row in rows:
+        if row.stage == "broker_call_end":
+            broker_call.append(row.elapsed_ms)
+        elif row.stage == "db_persist":
+            persisted.append(row.elapsed_ms)
+            per_trader.setdefault(row.user_id, []).append(row.elapsed_ms)
+            last_persist = max(last_persist, row.recorded_at.timestamp())
+
+    first_receipt = min((row.recorded_at.timestamp() - row.elapsed_ms / 1000 for row in rows), default=None)
+    order_window = (last_persist - first_receipt) if first_receipt and last_persist else None
+    trader_medians = [statistics.median(values) for values in per_trader.values()]
+
+    report = {
+        "traders": traders,
+        "signals_sent": len(outcome["http_ms"]),
+        "signal_errors": len(outcome["errors"]),
+        "orders_persisted": len(persisted),
+        "orders_expected": len(signal_log_ids) * traders,
+        "http_ms": _percentiles(outcome["http_ms"]),
+        "broker_call_end_ms": _percentiles(broker_call),
+        "db_persist_ms": _percentiles(persisted),
+        "per_trader_median_db_persist_ms": _percentiles(trader_medians),
+        "signals_per_s": round(len(outcome["http_ms"]) / outcome["elapsed_s"], 2) if outcome["elapsed_s"] else None,
+        "orders_per_s": round(len(persisted) / order_window, 2) if order_window else None,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        print(f"{key:32} {value}")
+    for error in outcome["errors"][:10]:
+        print(f"  error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Signal fanout load test against the broker simulator")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = sub.add_parser("seed", help="Create loadtest traders with simulator credentials")
+    seed_parser.add_argument("--traders", type=int, required=True)
+    seed_parser.add_argument("--angelone", action="store_true", help="Also give each trader AngelOne credentials")
+    seed_parser.add_argument("--strategy-code", default="LOADTEST", help="Strategy to subscribe the traders to")
+
+    sub.add_parser("cleanup", help="Delete every loadtest trader")
+
+    run_parser = sub.add_parser("run", help="Fire entry/exit signals and report fanout latency")
+    run_parser.add_argument("--api", default="http://localhost:8000")
+    run_parser.add_argument("--signals", type=int, default=10, help="Entry/exit pairs to send")
+    run_parser.add_argument("--concurrency", type=int, default=4, help="Signals in flight at once")
+    run_parser.add_argument("--hold", type=float, default=1.0, help="Seconds between a pair's entry and exit")
+    run_parser.add_argument("--settle", type=float, default=60.0, help="Seconds to wait for order writes")
+    run_parser.add_argument("--token", default="13")
+    run_parser.add_argument("--strike-token", required=True)
+    run_parser.add_argument("--symbol", required=True)
+    run_parser.add_argument("--strategy-code", default="LOADTEST")
+    run_parser.add_argument("--exchange", default="NFO")
+    run_parser.add_argument("--index-name", default="NIFTY")
+    run_parser.add_argument("--expiry", default="")
+    run_parser.add_argument("--strike-price", type=float, default=0)
+    run_parser.add_argument("--position", default="CE")
+    run_parser.add_argument("--lot-qty", type=int, default=75)
+    run_parser.add_argument("--json", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "seed":
+        seed(args.traders, args.angelone, args.strategy_code)
+    elif args.command == "cleanup":
+        cleanup()
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Order reconciler worker: replaces estimated order prices with broker fills
+
+Run one next to the API and outbox workers:
+
+    python order_reconciler_worker.py
+
+Every ORDER_RECONCILE_INTERVAL_S it fetches the order book of each broker
+account with pending orders (one call per account, not per order), updates
+broker_orders from it and writes filled prices to the orders rows.
+"""
+
+import logging
+import signal
+import threading
+import time
+
+from app.constants.const import ORDER_RECONCILE_INTERVAL_S
+from app.services.order_reconciliation import order_reconciler
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+logger = logging.getLogger("order_reconciler_worker")
+
+stop_event = threading.Event()
+
+
+def run():
+    logger.info("Order reconciler worker started")
+    while not stop_event.is_set():
+        started = time.monotonic()
+        try:
+            result = order_reconciler.run_once()
+            if result["accounts"] or result["corrected"]:
+                logger.info(f"Reconciled: {result}")
+        except Exception as e:
+            logger.error(f"Order reconciliation failed: {str(e)}")
+        stop_event.wait(max(0.0, ORDER_RECONCILE_INTERVAL_S - (time.monotonic() - started)))
+    logger.info("Order reconciler worker stopped")
+
+
+def main():
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+    run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Signal outbox worker: places broker orders for signals written by the API
+
+Run one or more alongside the API (SIGNAL_DISPATCH_MODE=outbox):
+
+    python signal_outbox_worker.py
+
+Workers claim rows with FOR UPDATE SKIP LOCKED, so they never share a
+signal; a worker that dies mid-signal loses its lease after
+SIGNAL_OUTBOX_LEASE_S and another worker finishes the remaining traders.
+"""
+
+import logging
+import signal
+import threading
+
+from app.constants.const import SIGNAL_OUTBOX_POLL_S
+from app.db.db import SessionLocal
+from app.services.broker_dispatcher import broker_dispatcher
+from app.services.latency_trace import latency_trace_buffer
+from app.services.order_reconciliation import broker_order_ledger
+from app.services.scrip_master import scrip_master_index
+from app.services.signal_outbox import SignalOutboxService, default_worker_id
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+logger = logging.getLogger("signal_outbox_worker")
+
+stop_event = threading.Event()
+
+
+def run(worker_id: str):
+    logger.info(f"Signal outbox worker {worker_id} started")
+    while not stop_event.is_set():
+        db = SessionLocal()
+        try:
+            claimed = SignalOutboxService.claim(db, worker_id)
+            processed = 0
+            for outbox_id in claimed:
+                try:
+                    if SignalOutboxService.process(db, outbox_id) is not None:
+                        processed += 1
+                except Exception as e:
+                    processed += 1
+                    logger.error(f"Signal outbox {outbox_id} failed: {str(e)}")
+                    SignalOutboxService.record_failure(db, outbox_id, str(e))
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Signal outbox poll failed: {str(e)}")
+            processed = 0
+        finally:
+            db.close()
+
+        # Nothing claimed, or only exits deferred behind their entries
+        if not processed:
+            stop_event.wait(SIGNAL_OUTBOX_POLL_S)
+
+    # Let order writes and fill callbacks already queued finish
+    broker_dispatcher.drain()
+    latency_trace_buffer.stop()
+    broker_order_ledger.stop()
+    logger.info(f"Signal outbox worker {worker_id} stopped")
+
+
+def main():
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+    scrip_master_index.load()
+    run(default_worker_id())
+
+
+if __name__ == "__main__":
+    main()